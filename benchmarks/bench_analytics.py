@@ -0,0 +1,102 @@
+"""
+Cross-asset analytics benchmark.
+
+Fills a symbol table database with hourly prices for a number of coins, then computes returns,
+24 hour realised volatility, drawdowns, the correlation matrix and beta against BTC two ways:
+a loop over the symbols with pandas (table_to_df per symbol, then pairwise correlations of the
+joined returns), and a range query aligned into a PriceMatrix with the vectorised measures.
+Reports the seconds taken to read the data and to compute the measures for each.
+
+Usage:
+python3 benchmarks/bench_analytics.py [--coins 100] [--hours 2160]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dbops.sqhelper import SQHelper
+from cmclogger.analytics.pricematrix import makePriceMatrix
+from cmclogger.dataparser.layout import SymbolTableLayout, makeDataBaseTableColumns
+from cmclogger.dataparser.reader import Reader
+import cmclogger.settings as settings
+
+
+def fill(database, coins, hours):
+    columns = sorted(makeDataBaseTableColumns().keys())
+    prices = 100 * np.exp(np.cumsum(np.random.RandomState(0).normal(0, 0.01, (hours, coins)), axis=0))
+    symbols = ['BTC'] + ['C{}'.format(coin) for coin in range(1, coins)]
+    for coin, symbol in enumerate(symbols):
+        database.create_table(symbol, makeDataBaseTableColumns())
+        values = []
+        for hour in range(hours):
+            row = dict.fromkeys(columns, 0)
+            row['timestamp'] = 1585000800 + hour * 3600
+            row[settings.CMC_data_symbol] = symbol
+            row[settings.CMC_data_quote_price] = prices[hour, coin]
+            values.append(tuple(row[column] for column in columns))
+        database.con.executemany("INSERT INTO {}({}) VALUES ({})".format(
+            symbol, ",".join(columns), ",".join(["?"] * len(columns))), values)
+    database.con.commit()
+    return symbols
+
+
+def per_symbol(database, symbols):
+    start = time.perf_counter()
+    frames = {symbol: database.table_to_df(symbol).set_index('timestamp') for symbol in symbols}
+    read = time.perf_counter() - start
+    returns = dict()
+    for symbol, frame in frames.items():
+        price = frame[settings.CMC_data_quote_price]
+        returns[symbol] = price.pct_change()
+        np.log(price).diff().rolling(24).std()
+        price / price.cummax() - 1
+    correlation = pd.DataFrame(index=symbols, columns=symbols, dtype=float)
+    beta = dict()
+    for first in symbols:
+        for second in symbols:
+            joined = pd.concat([returns[first], returns[second]], axis=1, join='inner').dropna()
+            correlation.loc[first, second] = joined.iloc[:, 0].corr(joined.iloc[:, 1])
+        joined = pd.concat([returns[first], returns['BTC']], axis=1, join='inner').dropna()
+        beta[first] = joined.iloc[:, 0].cov(joined.iloc[:, 1]) / joined.iloc[:, 1].var()
+    return read, time.perf_counter() - start - read
+
+
+def vectorised(reader):
+    start = time.perf_counter()
+    matrix = makePriceMatrix(reader.getRange(columns=[settings.CMC_data_quote_price]))
+    read = time.perf_counter() - start
+    matrix.returns()
+    matrix.volatility(24)
+    matrix.drawdowns()
+    matrix.correlation()
+    matrix.beta()
+    return read, time.perf_counter() - start - read
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--coins', type=int, default=100)
+    parser.add_argument('--hours', type=int, default=2160)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = SQHelper(os.path.join(directory, 'bench.db'))
+        symbols = fill(database, args.coins, args.hours)
+        reader = Reader(None, database, None, SymbolTableLayout(database))
+        print("{} coins x {} hourly rows".format(args.coins, args.hours))
+        print("{:>12} {:>10} {:>12}".format('method', 'read (s)', 'compute (s)'))
+        for name, run in [('per symbol', lambda: per_symbol(database, symbols)), ('vectorised', lambda: vectorised(reader))]:
+            read, compute = run()
+            print("{:>12} {:>10.2f} {:>12.2f}".format(name, read, compute))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrent read / ingest benchmark.
+
+A writer thread stores a batch of coins at a fixed interval (the daemon) while reader threads,
+each with their own connection, repeatedly scan the whole quotes table (CLI queries and
+to_excel). Reports the time each batch took to commit and the batches which failed with
+'database is locked' after busy_timeout, for the rollback journal and WAL. In rollback journal
+mode the writer waits for readers to finish, in WAL mode it does not.
+
+Usage:
+python3 benchmarks/bench_concurrent_access.py [--rows 50000] [--coins 200] [--batches 20] [--readers 2]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cmclogger.dataparser.database import Database
+from cmclogger.dataparser.layout import QuotesTableLayout
+import cmclogger.settings as settings
+
+
+def make_row(layout, coin, timestamp):
+    row = dict.fromkeys(layout.columns(), 0)
+    row['timestamp'] = timestamp
+    row[settings.CMC_data_id] = coin
+    row[settings.CMC_data_symbol] = 'C{}'.format(coin)
+    row[settings.CMC_data_quote_price] = float(coin)
+    return tuple(row[column] for column in layout.columns())
+
+
+def fill(database, layout, rows, coins):
+    layout.prepare([])
+    statement = layout.insertStatement(settings.database_quotes_table_name)
+    database.con.executemany(statement, (make_row(layout, i % coins, 1585000000 + (i // coins) * 300) for i in range(rows)))
+    database.con.commit()
+
+
+def reader(fileName, journalMode, stop, scans):
+    database = Database(fileName, journalMode)
+    # Each scan holds its read lock for the whole query, like a CLI query formatting its output
+    while not stop.is_set():
+        database.con.execute("BEGIN")
+        database.con.execute("SELECT * FROM {}".format(settings.database_quotes_table_name)).fetchall()
+        database.con.rollback()
+        scans.append(1)
+
+
+def run(fileName, journalMode, args):
+    database = Database(fileName, journalMode, busyTimeoutMs=args.busy_timeout)
+    layout = QuotesTableLayout(database)
+    fill(database, layout, args.rows, args.coins)
+    statement = layout.insertStatement(settings.database_quotes_table_name)
+
+    stop = threading.Event()
+    scans = []
+    readers = [threading.Thread(target=reader, args=(fileName, journalMode, stop, scans)) for _ in range(args.readers)]
+    for thread in readers:
+        thread.start()
+    latencies = []
+    failed = 0
+    timestamp = 1585000000 + (args.rows // args.coins + 1) * 300
+    for batch in range(args.batches):
+        start = time.perf_counter()
+        try:
+            database.con.executemany(statement, [make_row(layout, coin, timestamp + batch * 300) for coin in range(args.coins)])
+            database.con.commit()
+        except sqlite3.OperationalError:
+            database.con.rollback()
+            failed = failed + 1
+        latencies.append(1000 * (time.perf_counter() - start))
+        time.sleep(args.interval)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    database.con.close()
+    latencies.sort()
+    return latencies, failed, len(scans)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--coins', type=int, default=200)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--interval', type=float, default=0.02)
+    parser.add_argument('--busy-timeout', type=int, default=1000)
+    args = parser.parse_args()
+
+    print("{:>10} {:>12} {:>12} {:>12} {:>8} {:>8}".format('journal', 'p50 (ms)', 'p99 (ms)', 'max (ms)', 'failed', 'scans'))
+    for journalMode in ['delete', 'wal']:
+        with tempfile.TemporaryDirectory() as directory:
+            latencies, failed, scans = run(os.path.join(directory, 'bench.db'), journalMode, args)
+        p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+        print("{:>10} {:>12.1f} {:>12.1f} {:>12.1f} {:>8} {:>8}".format(
+            journalMode, statistics.median(latencies), p99, latencies[-1], failed, scans))
+
+
+if __name__ == '__main__':
+    main()
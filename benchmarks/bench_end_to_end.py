@@ -0,0 +1,152 @@
+"""
+End-to-end throughput benchmark.
+
+Runs the logger against the local mock listings server (mock_cmc_server.py), so the whole path
+is exercised: HTTP requests, decoding, extraction, storage and the status file. The fetch mode
+calls CMCLogger.fetch_and_store_data back to back. The daemon mode runs start_daemon with every
+job due straight away, so the scheduler loop, maintenance and retries are included. Each mode
+runs in its own process against a fresh working directory, and reports calls and rows stored per
+second, the p50 / p99 time of a call and store cycle and the peak RSS of the process.
+
+Usage:
+python3 benchmarks/bench_end_to_end.py [--coins 1000] [--calls 20] [--page-size 0] [--latency-ms 0]
+                                       [--error-rate 0] [--rate-limit-rate 0] [--watchlist 1,50,C120]
+                                       [--modes fetch daemon]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mock_cmc_server import MockCMCServer, listings_path, quotes_path
+import cmclogger.settings as settings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def write_config(directory, args):
+    with open(os.path.join(directory, settings.input_configuation_filename), 'w') as f:
+        f.write("[{}]\n{} = bench-key\n{} = 1\n{} = {}\n{} = {}\n{} = {}\n\n[{}]\n{} = {}\n".format(
+            settings.API_section_name, settings.API_option_private_key, settings.API_option_start_index,
+            settings.API_option_end_index, args.coins, settings.API_option_page_size, args.page_size,
+            settings.API_option_watchlist, args.watchlist,
+            settings.database_section_name, settings.database_option_layout, settings.database_layout_quotes))
+
+
+def count_written_rows(written):
+    # Rows of calls made in the same second share a timestamp and replace each other in the table,
+    # so the rows passed to the publisher are counted instead of those left in the table
+    from cmclogger.dataparser.publisher import Publisher
+    write_data = Publisher.writeData
+
+    def counting_write_data(self, data, timestamp=None):
+        written.append(len(data))
+        return write_data(self, data, timestamp)
+
+    Publisher.writeData = counting_write_data
+
+
+def run_fetch(logger, calls):
+    cycles = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        logger.fetch_and_store_data()
+        cycles.append(time.perf_counter() - start)
+    return cycles
+
+
+def run_daemon(logger, calls):
+    import cmclogger.cmclogger
+    from cmclogger.api.scheduler import Scheduler
+    cycles = []
+
+    class BenchScheduler(Scheduler):
+        # Every job is due again straight away, the logger is stopped after enough cycles
+        def __init__(self, clock=time.monotonic, intervalFor=None):
+            Scheduler.__init__(self, clock, lambda interval: 1e-6)
+
+        def runDue(self):
+            start = time.perf_counter()
+            ran = Scheduler.runDue(self)
+            if len(ran) > 0:
+                cycles.append(time.perf_counter() - start)
+            if len(cycles) >= calls:
+                logger.stop_daemon()
+            return ran
+
+    cmclogger.cmclogger.Scheduler = BenchScheduler
+    logger.start_daemon(force_start=True)
+    return cycles
+
+
+def run_mode(args):
+    from cmclogger.cmclogger import CMCLogger
+    settings.getLatest_Url = args.url
+    settings.quotes_Url = args.url.replace(listings_path, quotes_path)
+    written = []
+    count_written_rows(written)
+    with tempfile.TemporaryDirectory() as directory:
+        write_config(directory, args)
+        logger = CMCLogger(directory, logging.CRITICAL)
+        start = time.perf_counter()
+        cycles = run_fetch(logger, args.calls) if args.run == 'fetch' else run_daemon(logger, args.calls)
+        elapsed = time.perf_counter() - start
+        successful = logger.get_status_file().get_value(settings.status_file_current_session_section_name,
+                                                        settings.status_file_option_successful_calls)
+    print(json.dumps({'mode': args.run, 'calls': len(cycles), 'successful': successful, 'elapsed': elapsed, 'rows': sum(written),
+                      'p50': percentile(cycles, 0.5), 'p99': percentile(cycles, 0.99),
+                      'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--coins', type=int, default=1000)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0)
+    parser.add_argument('--watchlist', default='', help="Comma separated ids or symbols (Cn) to fetch through quotes instead")
+    parser.add_argument('--modes', nargs='+', choices=['fetch', 'daemon'], default=['fetch', 'daemon'])
+    parser.add_argument('--run', choices=['fetch', 'daemon'], help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        run_mode(args)
+        return
+
+    # The server runs in this process, so the memory of each logger process is measured on its own
+    server = MockCMCServer(args.coins, args.latency_ms / 1000, args.error_rate, args.rate_limit_rate)
+    url = server.start()
+    print("{:>8} {:>6} {:>6} {:>9} {:>10} {:>9} {:>9} {:>9}".format(
+        'mode', 'calls', 'ok', 'calls/s', 'rows/s', 'p50 (ms)', 'p99 (ms)', 'RSS (MB)'))
+    try:
+        for mode in args.modes:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, '--url', url,
+                                     '--coins', str(args.coins), '--calls', str(args.calls), '--page-size', str(args.page_size),
+                                     '--watchlist', args.watchlist],
+                                    check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print("{:>8} {:>6} {:>6} {:>9.1f} {:>10.0f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                result['mode'], result['calls'], result['successful'], result['calls'] / result['elapsed'],
+                result['rows'] / result['elapsed'], 1000 * result['p50'], 1000 * result['p99'], result['rss']))
+    finally:
+        server.stop()
+    print("Server responses by HTTP status: {}".format(dict(sorted(server.counts.items()))))
+
+
+if __name__ == '__main__':
+    main()
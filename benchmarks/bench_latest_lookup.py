@@ -0,0 +1,64 @@
+"""
+Latest entry lookup benchmark.
+
+Times SQHelper.get_last_time_entry (used by 'CMCLogger -q SYMBOL') against symbol tables of
+increasing size, with and without the timestamp index maintained by the symbol table layout.
+Without the index every lookup scans (and sorts) the whole table, with it the lookup time
+stays flat regardless of the table size.
+
+Usage:
+python3 benchmarks/bench_latest_lookup.py [--rows 1000 10000 100000] [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dbops.sqhelper import SQHelper
+from cmclogger.dataparser.layout import SymbolTableLayout, makeDataBaseTableColumns
+
+
+def fill_table(database, table, rows):
+    database.create_table(table, makeDataBaseTableColumns())
+    columns = sorted(makeDataBaseTableColumns().keys())
+    values = []
+    for i in range(rows):
+        row = dict.fromkeys(columns, 0)
+        row['timestamp'] = 1585000000 + i * 300
+        row['symbol'] = table
+        row['price'] = float(i)
+        values.append(tuple(row[column] for column in columns))
+    database.con.executemany("INSERT INTO {} VALUES ({})".format(table, ",".join(["?"] * len(columns))), values)
+    database.con.commit()
+
+
+def time_lookup(database, table, repeat):
+    seconds = timeit.timeit(lambda: database.get_last_time_entry(table), number=repeat)
+    return 1e6 * seconds / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = SQHelper(os.path.join(directory, 'bench.db'))
+        for rows in args.rows:
+            fill_table(database, 'T{}'.format(rows), rows)
+
+        print("{:>10} {:>18} {:>18}".format('rows', 'no index (us)', 'indexed (us)'))
+        unindexed = [time_lookup(database, 'T{}'.format(rows), args.repeat) for rows in args.rows]
+        SymbolTableLayout(database).createTimestampIndexes()
+        indexed = [time_lookup(database, 'T{}'.format(rows), args.repeat) for rows in args.rows]
+        for rows, before, after in zip(args.rows, unindexed, indexed):
+            print("{:>10} {:>18.1f} {:>18.1f}".format(rows, before, after))
+
+
+if __name__ == '__main__':
+    main()
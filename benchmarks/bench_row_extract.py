@@ -0,0 +1,108 @@
+"""
+Entry validation and flattening benchmark.
+
+Times the per coin cost of turning an API data entry into a stored row. The two pass path is
+the one used before the entry schema: the API wrapper looked up every required key and threw
+the values away, then the publisher copied the entry, looked the same keys up again to flatten
+the quote and dropped the unused fields. The one pass path is RowExtractor.extract, which checks
+and flattens the entry with itemgetter lookups over the schema.
+
+Usage:
+python3 benchmarks/bench_row_extract.py [--coins 5000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cmclogger.dataparser.schema import RowExtractor
+from cmclogger.dataparser.isotime import isoToUnixTime
+import cmclogger.settings as settings
+
+
+def make_entry(rank):
+    return {"id": rank, "name": "Coin {}".format(rank), "symbol": "C{}".format(rank), "slug": "coin-{}".format(rank),
+            "num_market_pairs": 10, "date_added": "2013-04-28T00:00:00.000Z", "tags": ["mineable"],
+            "max_supply": 21000000, "circulating_supply": 18282325, "total_supply": 18282325, "platform": None,
+            "cmc_rank": rank, "last_updated": "2020-03-22T21:41:39.000Z",
+            "quote": {"AUD": {"price": 10349.875293052113, "volume_24h": 68924929543.68837, "percent_change_1h": 2.03454894,
+                              "percent_change_24h": -3.98809565, "percent_change_7d": 19.18056641,
+                              "market_cap": 189219783817.04898, "last_updated": "2020-03-22T21:42:00.000Z"}}}
+
+
+def check_keys(entry, currency):
+    dummy = entry[settings.CMC_data_id]
+    dummy = entry[settings.CMC_data_name]
+    dummy = entry[settings.CMC_data_symbol]
+    dummy = entry[settings.CMC_data_slug]
+    dummy = entry[settings.CMC_data_cmc_rank]
+    dummy = entry[settings.CMC_data_num_market_pairs]
+    dummy = entry[settings.CMC_data_circulating_suuply]
+    dummy = entry[settings.CMC_data_total_supply]
+    dummy = entry[settings.CMC_data_max_supply]
+    dummy = entry[settings.CMC_data_last_updated]
+    dummy = entry[settings.CMC_data_data_added]
+    dummy = entry[settings.CMC_data_tags]
+    dummy = entry[settings.CMC_data_platform]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_quote_price]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_quote_volume_24h]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_quote_market_cap]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_percent_change_1h]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_percent_change_24h]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_percent_change_7d]
+    dummy = entry[settings.CMC_data_quote][currency][settings.CMC_data_last_updated]
+
+
+def flatten(entry, timestamp):
+    row = dict(entry)
+    currencyEntry = next(iter(row[settings.CMC_data_quote]))
+    quote = row.pop(settings.CMC_data_quote)[currencyEntry]
+    row[settings.CMC_data_quote_price] = quote[settings.CMC_data_quote_price]
+    row[settings.CMC_data_quote_volume_24h] = quote[settings.CMC_data_quote_volume_24h]
+    row[settings.CMC_data_quote_market_cap] = quote[settings.CMC_data_quote_market_cap]
+    row[settings.CMC_data_percent_change_1h] = quote[settings.CMC_data_percent_change_1h]
+    row[settings.CMC_data_percent_change_24h] = quote[settings.CMC_data_percent_change_24h]
+    row[settings.CMC_data_percent_change_7d] = quote[settings.CMC_data_percent_change_7d]
+    row.pop(settings.CMC_data_tags)
+    row.pop(settings.CMC_data_platform)
+    row['timestamp'] = timestamp
+    row[settings.CMC_data_data_added] = isoToUnixTime(row[settings.CMC_data_data_added])
+    row[settings.CMC_data_last_updated] = isoToUnixTime(row[settings.CMC_data_last_updated])
+    return row
+
+
+def two_pass(data):
+    for entry in data:
+        check_keys(entry, 'AUD')
+    return [flatten(entry, 1585000000) for entry in data]
+
+
+def one_pass(data, extractor):
+    return [extractor.extract(entry, 1585000000)[0] for entry in data]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--coins', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = [make_entry(rank) for rank in range(1, args.coins + 1)]
+    extractor = RowExtractor('AUD')
+    assert two_pass(data[:1])[0] == one_pass(data[:1], extractor)[0]
+    paths = [('two pass', lambda: two_pass(data)), ('one pass', lambda: one_pass(data, extractor))]
+    best = dict()
+    # Alternate the paths so both see the same machine load
+    for _ in range(args.repeat):
+        for name, run in paths:
+            best[name] = min(best.get(name, float('inf')), timeit.timeit(run, number=1))
+    print("{:>10} {:>16}".format('path', 'per coin (us)'))
+    for name, run in paths:
+        print("{:>10} {:>16.2f}".format(name, 1e6 * best[name] / args.coins))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Listings response decoding benchmark.
+
+Decodes a listings/latest response for an increasing number of coins read from disk, the way
+the daemon receives it, and reports the peak memory and time taken to turn it into stored rows.
+The buffered path reads the whole body, parses it with json.loads and then flattens every entry.
+The streamed path reads the body in chunks and flattens each entry into StagedData as soon as
+it has been decoded, so the parsed response is never held in memory as a whole.
+
+Usage:
+python3 benchmarks/bench_stream_decode.py [--coins 500 5000] [--chunk-size 65536]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cmclogger.api.streamjson import iterMembers
+from cmclogger.dataparser.publisher import StagedData
+from cmclogger.dataparser.schema import RowExtractor
+import cmclogger.settings as settings
+
+extractor = RowExtractor('AUD')
+
+
+def make_entry(rank):
+    return {"id": rank, "name": "Coin {}".format(rank), "symbol": "C{}".format(rank), "slug": "coin-{}".format(rank),
+            "num_market_pairs": 10, "date_added": "2013-04-28T00:00:00.000Z", "tags": ["mineable", "pow"],
+            "max_supply": 21000000, "circulating_supply": 18282325, "total_supply": 18282325,
+            "platform": {"id": 1027, "name": "Ethereum", "symbol": "ETH", "slug": "ethereum", "token_address": "0x" + "0" * 40},
+            "cmc_rank": rank, "last_updated": "2020-03-22T21:41:39.000Z",
+            "quote": {"AUD": {"price": 10349.875293052113, "volume_24h": 68924929543.68837, "percent_change_1h": 2.03454894,
+                              "percent_change_24h": -3.98809565, "percent_change_7d": 19.18056641,
+                              "market_cap": 189219783817.04898, "last_updated": "2020-03-22T21:42:00.000Z"}}}
+
+
+def write_response(fileName, coins):
+    status = {"timestamp": "2020-03-22T21:42:32.862Z", "error_code": 0, "error_message": None, "elapsed": 11, "credit_count": 1, "notice": None}
+    with open(fileName, 'w') as f:
+        json.dump({"status": status, "data": [make_entry(rank) for rank in range(1, coins + 1)]}, f)
+
+
+def buffered(fileName, chunkSize):
+    with open(fileName, 'rb') as f:
+        response = json.loads(f.read().decode('utf-8'))
+    return [extractor.extract(entry, 1585000000)[0] for entry in response['data']]
+
+
+def streamed(fileName, chunkSize):
+    stage = StagedData(1585000000)
+    with open(fileName, 'rb') as f:
+        for key, value in iterMembers(iter(lambda: f.read(chunkSize), b''), 'data'):
+            if key == 'data':
+                stage.append(extractor.extract(value, stage.timestamp)[0])
+    return stage
+
+
+def measure(decode, fileName, chunkSize):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = decode(fileName, chunkSize)
+    elapsed = time.perf_counter() - start
+    # The rows are kept by both paths, the difference is what is held while decoding
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return len(rows), peak / (1024 * 1024), 1000 * elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--coins', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--chunk-size', type=int, default=settings.getLatest_stream_chunk_size)
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>10} {:>14} {:>10}".format('coins', 'body (MB)', 'path', 'peak (MB)', 'time (ms)'))
+    with tempfile.TemporaryDirectory() as directory:
+        for coins in args.coins:
+            fileName = os.path.join(directory, 'response.json')
+            write_response(fileName, coins)
+            size = os.path.getsize(fileName) / (1024 * 1024)
+            for name, decode in [('buffered', buffered), ('streamed', streamed)]:
+                rows, peak, elapsed = measure(decode, fileName, args.chunk_size)
+                assert rows == coins
+                print("{:>8} {:>10.1f} {:>10} {:>14.1f} {:>10.1f}".format(coins, size, name, peak, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Local stand-in for the Coin Market Cap listings/latest and quotes/latest endpoints.
+
+Serves synthetic listings and quotes responses over HTTP, for load testing the logger without using API
+credits. Every response has fresh prices and last_updated times, so nothing is suppressed by
+change_only. Requests without an API key are answered with HTTP 401, and a configurable fraction
+of requests are answered with HTTP 429 (rate limited) or 500 (server error) instead of data.
+
+Point the logger at it by setting cmclogger.settings.getLatest_Url to the printed URL, and
+settings.quotes_Url to the same URL ending in quotes/latest. Coin n has id n and symbol Cn.
+
+Usage:
+python3 benchmarks/mock_cmc_server.py [--port 8000] [--coins 5000] [--latency-ms 0]
+                                      [--error-rate 0] [--rate-limit-rate 0] [--seed 0]
+"""
+
+import argparse
+import datetime
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+listings_path = '/v1/cryptocurrency/listings/latest'
+quotes_path = '/v1/cryptocurrency/quotes/latest'
+
+
+class MockCMCServer():
+    """ Serves synthetic listings responses from a background thread.
+
+    Parameters:
+    coins (int): Number of coins ranked, requests beyond the last rank return fewer entries.
+    latency (float): Seconds each request takes before it is answered.
+    error_rate (float): Fraction of requests answered with HTTP 500.
+    rate_limit_rate (float): Fraction of requests answered with HTTP 429.
+    port (int): Port to listen on, 0 picks a free port.
+    seed (int): Seed of the random prices and failures.
+    """
+
+    def __init__(self, coins=5000, latency=0, error_rate=0, rate_limit_rate=0, port=0, seed=0):
+        self.coins = coins
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = dict()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        """ Start serving, returns the URL of the listings endpoint."""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path=listings_path):
+        return 'http://127.0.0.1:{}{}'.format(self.server.server_address[1], path)
+
+    def respond(self, path, headers):
+        """ (HTTP status code, body) of the response to a request."""
+        url = urlparse(path)
+        if url.path not in [listings_path, quotes_path]:
+            return 404, make_status(404, 'Not found', 0)
+        if headers.get('X-CMC_PRO_API_KEY', '') == '':
+            return 401, make_status(1002, 'API key missing.', 0)
+        with self.lock:
+            draw = self.random.random()
+            seed = self.random.random()
+        if draw < self.rate_limit_rate:
+            return 429, make_status(1008, "You've exceeded your API Key's HTTP request rate limit.", 0)
+        if draw < self.rate_limit_rate + self.error_rate:
+            return 500, make_status(500, 'Internal server error', 0)
+        query = parse_qs(url.query)
+        if url.path == quotes_path:
+            return self.quotes(query, random.Random(seed))
+        start = int(query.get('start', ['1'])[0])
+        limit = int(query.get('limit', ['100'])[0])
+        convert = query.get('convert', ['USD'])[0]
+        ranks = range(start, min(start + limit, self.coins + 1))
+        prices = random.Random(seed)
+        data = [make_entry(rank, convert, prices) for rank in ranks]
+        return 200, {'status': make_status(0, None, math.ceil(max(len(data), 1) / 200))['status'], 'data': data}
+
+    def quotes(self, query, prices):
+        convert = query.get('convert', ['USD'])[0]
+        key = 'id' if 'id' in query else 'symbol'
+        items = query.get(key, [''])[0].split(',')
+        ranks = [int(item) if key == 'id' else int(item[1:]) if item[1:].isdigit() else 0 for item in items]
+        if any(rank < 1 or rank > self.coins for rank in ranks):
+            return 400, make_status(400, 'Invalid value for "{}"'.format(key), 0)
+        data = {item: make_entry(rank, convert, prices) for item, rank in zip(items, ranks)}
+        return 200, {'status': make_status(0, None, math.ceil(len(data) / 100))['status'], 'data': data}
+
+    def count(self, status_code):
+        with self.lock:
+            self.counts[status_code] = self.counts.get(status_code, 0) + 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                status_code, body = server.respond(self.path, self.headers)
+                server.count(status_code)
+                content = json.dumps(body).encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def make_status(error_code, message, credits):
+    return {'status': {'timestamp': now_iso(), 'error_code': error_code, 'error_message': message,
+                       'elapsed': 10, 'credit_count': credits, 'notice': None}}
+
+
+def make_entry(rank, convert, prices):
+    price = 10000.0 / rank * (1 + (prices.random() - 0.5) / 50)
+    updated = now_iso()
+    return {"id": rank, "name": "Coin {}".format(rank), "symbol": "C{}".format(rank), "slug": "coin-{}".format(rank),
+            "num_market_pairs": 10, "date_added": "2013-04-28T00:00:00.000Z", "tags": ["mineable"],
+            "max_supply": 21000000, "circulating_supply": 18282325, "total_supply": 18282325, "platform": None,
+            "cmc_rank": rank, "last_updated": updated,
+            "quote": {convert: {"price": price, "volume_24h": price * 1e6, "percent_change_1h": prices.random() - 0.5,
+                                "percent_change_24h": prices.random() * 4 - 2, "percent_change_7d": prices.random() * 10 - 5,
+                                "market_cap": price * 18282325, "last_updated": updated}}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--coins', type=int, default=5000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockCMCServer(args.coins, args.latency_ms / 1000, args.error_rate, args.rate_limit_rate, args.port, args.seed)
+    print("Serving listings at {}".format(server.url()))
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import numpy as np
+
+# Every function takes and returns (timestamp x coin) arrays of floats, NaN marks a missing value.
+# Missing values are left out of sums and counts instead of being filled, so coins listed at
+# different times can be compared over the rows they share.
+
+
+def forwardFill(values):
+    """ Fill gaps with the last value before them, values before the first or after the last of a column stay NaN."""
+    if values.size == 0:
+        return values.copy()
+    rows = np.arange(values.shape[0])[:,None]
+    valid = ~np.isnan(values)
+    last = np.where(valid,rows,0)
+    np.maximum.accumulate(last,axis=0,out=last)
+    filled = values[last,np.arange(values.shape[1])]
+    # Rows after the last value of a column (the coin is no longer logged) aren't filled
+    final = np.where(valid.any(axis=0),values.shape[0] - 1 - np.argmax(valid[::-1],axis=0),-1)
+    filled[rows > final] = np.nan
+    return filled
+
+
+def simpleReturns(prices,periods=1):
+    """ Return over the last periods rows, the first periods rows are NaN.
+
+    Returns from or to a zero price aren't finite, they are NaN like a missing price.
+    """
+    returns = np.full(prices.shape,np.nan)
+    if periods < len(prices):
+        with np.errstate(divide='ignore',invalid='ignore'):
+            returns[periods:] = prices[periods:] / prices[:-periods] - 1
+        returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+def logReturns(prices,periods=1):
+    """ Logarithmic return over the last periods rows, the first periods rows are NaN.
+
+    Returns from or to a zero price aren't finite, they are NaN like a missing price.
+    """
+    returns = np.full(prices.shape,np.nan)
+    if periods < len(prices):
+        with np.errstate(divide='ignore',invalid='ignore'):
+            returns[periods:] = np.log(prices[periods:] / prices[:-periods])
+        returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+def rollingSum(values,window):
+    """ (sum, count) of the values present in each trailing window of rows."""
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.where(present,values,0),axis=0)
+    counts = np.cumsum(present,axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return sums,counts
+
+
+def rollingVolatility(returns,window,minPeriods=None):
+    """ Sample standard deviation of the returns in each trailing window of rows.
+
+    Windows with fewer than minPeriods returns (window by default) are NaN.
+    """
+    minPeriods = window if minPeriods is None else max(minPeriods,2)
+    # Centred on the column means, so the sums of squares don't lose precision
+    present = ~np.isnan(returns)
+    centred = returns - np.where(present,returns,0).sum(axis=0) / np.maximum(present.sum(axis=0),1)
+    sums,counts = rollingSum(centred,window)
+    squares,_ = rollingSum(centred * centred,window)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        variance = (squares - sums * sums / counts) / (counts - 1)
+    variance[counts < minPeriods] = np.nan
+    return np.sqrt(np.maximum(variance,0))
+
+
+def drawdowns(prices):
+    """ Fall of each price from the highest price before it, 0 at a new high and -0.5 at half of it."""
+    peaks = np.fmax.accumulate(prices,axis=0) if prices.size > 0 else prices
+    return prices / peaks - 1
+
+
+def pairwiseMoments(returns):
+    """ Sums over the rows where both coins of each pair have a return.
+
+    Returns:
+    (count, sum of x, sum of x squared, sum of x * y), each a (coin x coin) array where
+    entry [i, j] sums coin i over the rows shared with coin j.
+    """
+    present = (~np.isnan(returns)).astype(float)
+    values = np.where(present > 0,returns,0)
+    counts = present.T @ present
+    sums = values.T @ present
+    squares = (values * values).T @ present
+    products = values.T @ values
+    return counts,sums,squares,products
+
+
+def covarianceMatrix(returns,minPeriods=2):
+    """ Sample covariance of each pair of coins over the rows they share, NaN if they share fewer than minPeriods."""
+    counts,sums,squares,products = pairwiseMoments(returns)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        covariance = (products - sums * sums.T / counts) / (counts - 1)
+    covariance[counts < max(minPeriods,2)] = np.nan
+    return covariance
+
+
+def correlationMatrix(returns,minPeriods=2):
+    """ Pearson correlation of each pair of coins over the rows they share, NaN if they share fewer than minPeriods."""
+    counts,sums,squares,products = pairwiseMoments(returns)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        covariance = products - sums * sums.T / counts
+        # Variance of coin i over the rows shared with coin j
+        variance = squares - sums * sums / counts
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation[counts < max(minPeriods,2)] = np.nan
+    return np.clip(correlation,-1,1)
+
+
+def betas(returns,benchmark,minPeriods=2):
+    """ Beta of each coin against the benchmark column, over the rows they share."""
+    counts,sums,squares,products = pairwiseMoments(returns)
+    counts = counts[:,benchmark]
+    # Sums of each coin, and of the benchmark, over the rows the two share
+    coinSums,benchmarkSums = sums[:,benchmark],sums[benchmark,:]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        covariance = products[:,benchmark] - coinSums * benchmarkSums / counts
+        variance = squares[benchmark,:] - benchmarkSums * benchmarkSums / counts
+        beta = covariance / variance
+    beta[counts < max(minPeriods,2)] = np.nan
+    return beta
@@ -0,0 +1,123 @@
+import cmclogger.settings as settings
+from cmclogger.analytics import measures
+import logging
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+def makePriceMatrix(frame,column=settings.CMC_data_quote_price,interval=0,fill=True):
+    """ Align the rows of a range query into a (timestamp x coin) PriceMatrix.
+
+    Parameters:
+    frame (pandas.DataFrame): Rows with symbol, timestamp and column, as returned by CMCLogger.get_range.
+    column (str): The column holding the prices.
+    interval (int): Seconds, rows are aligned to the start of their interval (keeping the last of each
+    coin) when above 0, so calls made a few seconds apart share a row. Rows are aligned on their
+    exact timestamp otherwise.
+    fill (bool): Fill gaps in a coin's prices with its last price, see measures.forwardFill.
+
+    Returns:
+    The PriceMatrix, with coins in symbol order.
+    """
+    timestamps = frame['timestamp'].to_numpy(dtype=np.int64)
+    if interval > 0:
+        timestamps = timestamps - timestamps % int(interval)
+    symbols,coinIndex = np.unique(frame[settings.CMC_data_symbol].to_numpy(dtype=str),return_inverse=True)
+    times,timeIndex = np.unique(timestamps,return_inverse=True)
+    # Keep the last row of each cell, later rows of a cell aren't guaranteed to win a fancy assignment
+    cells = coinIndex * len(times) + timeIndex
+    _,lastFromEnd = np.unique(cells[::-1],return_index=True)
+    last = len(cells) - 1 - lastFromEnd
+    prices = np.full((len(times),len(symbols)),np.nan)
+    prices[timeIndex[last],coinIndex[last]] = frame[column].to_numpy(dtype=float)[last]
+    if fill:
+        prices = measures.forwardFill(prices)
+    log.debug("Built a price matrix of {} times by {} coins".format(len(times),len(symbols)))
+    return PriceMatrix(times,[str(symbol) for symbol in symbols],prices,interval)
+
+
+class PriceMatrix():
+    """ Prices of several coins aligned on shared timestamps, with vectorised cross-asset measures.
+
+    Every measure is computed for all coins at once with NumPy. Missing prices are NaN and are
+    left out of each measure, so coins logged over different periods can be compared.
+
+    Parameters:
+    timestamps (numpy.ndarray): Unix time of each row, ascending.
+    symbols (list): Symbol of each column.
+    prices (numpy.ndarray): (timestamp x coin) prices.
+    interval (int): Seconds between rows, the median spacing of the timestamps if 0.
+    """
+
+    def __init__(self,timestamps,symbols,prices,interval=0):
+        self.timestamps = timestamps
+        self.symbols = symbols
+        self.prices = prices
+        if interval <= 0 and len(timestamps) > 1:
+            interval = float(np.median(np.diff(timestamps)))
+        self.interval = interval
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def indexOf(self,symbol):
+        """ Column of a symbol, None if it isn't in the matrix."""
+        return self.symbols.index(symbol) if symbol in self.symbols else None
+
+    def returns(self,periods=1,logarithmic=False):
+        """ Rolling return of each coin over the last periods rows."""
+        if logarithmic:
+            return measures.logReturns(self.prices,periods)
+        return measures.simpleReturns(self.prices,periods)
+
+    def volatility(self,window,annualised=True):
+        """ Realised volatility, the standard deviation of log returns over each trailing window of rows.
+
+        Annualised volatility is scaled by the square root of the rows in a year.
+        """
+        volatility = measures.rollingVolatility(self.returns(logarithmic=True),window)
+        if annualised and self.interval > 0:
+            volatility = volatility * np.sqrt(settings.analytics_seconds_per_year / self.interval)
+        return volatility
+
+    def drawdowns(self):
+        """ Fall of each price from the highest price before it."""
+        return measures.drawdowns(self.prices)
+
+    def maxDrawdowns(self):
+        """ Largest fall of each coin from a previous high, as a negative fraction."""
+        drawdowns = self.drawdowns()
+        drawdowns[np.isnan(drawdowns)] = 0
+        return drawdowns.min(axis=0) if len(drawdowns) > 0 else np.zeros(len(self.symbols))
+
+    def covariance(self,periods=1,minPeriods=2):
+        """ (coin x coin) covariance of the returns over periods rows."""
+        return measures.covarianceMatrix(self.returns(periods),minPeriods)
+
+    def correlation(self,periods=1,minPeriods=2):
+        """ (coin x coin) correlation of the returns over periods rows."""
+        return measures.correlationMatrix(self.returns(periods),minPeriods)
+
+    def beta(self,benchmark=settings.analytics_benchmark_symbol,periods=1,minPeriods=2):
+        """ Beta of each coin's returns against those of the benchmark symbol.
+
+        Returns:
+        An array with a beta per coin, None if the benchmark isn't in the matrix.
+        """
+        column = self.indexOf(benchmark)
+        if column is None:
+            log.warning("Benchmark {} is not in the price matrix, cannot calculate betas".format(benchmark))
+            return None
+        return measures.betas(self.returns(periods),column,minPeriods)
+
+    def toDataFrame(self,values=None,byCoin=False):
+        """ A pandas.DataFrame of the prices or a measure, with a row per timestamp or, if byCoin, per coin.
+
+        A measure with one value per coin is returned as a pandas.Series.
+        """
+        values = self.prices if values is None else values
+        if values.ndim == 1:
+            return pd.Series(values,index=self.symbols)
+        return pd.DataFrame(values,index=self.symbols if byCoin else self.timestamps,columns=self.symbols)
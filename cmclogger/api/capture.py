@@ -0,0 +1,136 @@
+import codecs
+import gzip
+import itertools
+import json
+import logging
+import threading
+import zlib
+
+log = logging.getLogger(__name__)
+
+
+class ResponseCapture():
+    """ Appends raw listings responses to a gzip compressed JSON lines file.
+
+    Each response is written as a line holding the unix time its rows are stored with, the call it
+    belongs to, the request parameters, the HTTP status code and the body as received. Every line
+    is its own gzip member, so the file is only ever appended to and a line cut short by a crash
+    loses nothing before it.
+
+    Parameters:
+    fileName (str): The capture file, created if it doesn't exist.
+    """
+
+    def __init__(self,fileName):
+        self.__fileName = fileName
+        self.__calls = itertools.count(1)
+        self.__lock = threading.Lock()
+
+    def getFileName(self):
+        return self.__fileName
+
+    def newCall(self):
+        """ A number identifying the responses of one call."""
+        with self.__lock:
+            return next(self.__calls)
+
+    def record(self,timestamp,call,parameters,statusCode,body):
+        """ Append a response, safe to call from several threads at once."""
+        line = json.dumps({'timestamp' : timestamp,'call' : call,'parameters' : parameters,
+                           'status_code' : statusCode,'body' : body}) + '\n'
+        with self.__lock:
+            try:
+                with gzip.open(self.__fileName,'ab') as f:
+                    f.write(line.encode('utf-8'))
+            except OSError as e:
+                log.error("Failed to capture API response to '{}'. Exception '{}'".format(self.__fileName,e))
+
+    def start(self,timestamp,call,parameters,statusCode):
+        """ Start appending a response whose body is written as it is received, see CapturedBody.
+
+        Other responses wait to be captured until the CapturedBody is closed.
+        """
+        head = json.dumps({'timestamp' : timestamp,'call' : call,'parameters' : parameters,'status_code' : statusCode})
+        return CapturedBody(self.__fileName,self.__lock,head[:-1] + ', "body": "')
+
+
+class CapturedBody():
+    """ Writes the body of a captured response one chunk at a time, so it is never held in memory.
+
+    The line is the same as ResponseCapture.record writes, the body is JSON escaped as each chunk
+    arrives. The capture file is held from when this is made until close() is called.
+
+    Parameters:
+    fileName (str): The capture file.
+    lock (threading.Lock): Held while the line is written.
+    head (str): The line up to the opening quote of the body.
+    """
+
+    def __init__(self,fileName,lock,head):
+        self.__fileName = fileName
+        self.__lock = lock
+        self.__decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.__lock.acquire()
+        self.__file = None
+        try:
+            self.__file = gzip.open(fileName,'ab')
+        except OSError as e:
+            log.error("Failed to capture API response to '{}'. Exception '{}'".format(fileName,e))
+        self.__writeText(head,False)
+
+    def write(self,chunk):
+        """ Append a bytes (UTF-8) or str chunk of the body."""
+        self.__writeText(chunk if isinstance(chunk,str) else self.__decoder.decode(chunk))
+
+    def close(self):
+        """ End the line and let other responses be captured."""
+        try:
+            self.__writeText(self.__decoder.decode(b'',final=True))
+            self.__writeText('"}\n',False)
+            if self.__file is not None:
+                self.__file.close()
+        except OSError as e:
+            log.error("Failed to capture API response to '{}'. Exception '{}'".format(self.__fileName,e))
+        finally:
+            self.__file = None
+            self.__lock.release()
+
+    def __writeText(self,text,escape=True):
+        if self.__file is None or text == '':
+            return
+        if escape:
+            # Escaping is done per character, so escaped chunks join into the escaped body
+            text = json.dumps(text)[1:-1]
+        try:
+            self.__file.write(text.encode('utf-8'))
+        except OSError as e:
+            log.error("Failed to capture API response to '{}'. Exception '{}'".format(self.__fileName,e))
+            self.__file = None
+
+
+class CapturedResponse():
+    """ A captured response, with the members of requests.Response used to parse it."""
+
+    def __init__(self,record):
+        self.status_code = record['status_code']
+        self.text = record['body']
+        self.raw = None
+
+
+def readCapture(fileName):
+    """ The responses of a capture file, in the order they were captured.
+
+    A line cut short at the end of the file, by a crash while it was written, is skipped.
+    """
+    with gzip.open(fileName,'rt',encoding='utf-8') as f:
+        try:
+            for line in f:
+                yield json.loads(line)
+        except (EOFError,zlib.error,json.decoder.JSONDecodeError) as e:
+            log.warning("Capture file '{}' ends with an incomplete response, skipping it. Exception '{}'".format(fileName,e))
+
+
+def groupCalls(records):
+    """ Group captured responses into the calls they were made for, each a list of responses (one per page)."""
+    for key,group in itertools.groupby(records,key=lambda record: (record['timestamp'],record['call'])):
+        yield list(group)
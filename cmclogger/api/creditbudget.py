@@ -0,0 +1,150 @@
+import cmclogger.settings as settings
+import calendar
+import datetime
+import logging
+import math
+import time
+
+log = logging.getLogger(__name__)
+
+
+def expectedCredits(coins,pageSize=0):
+    """ Credits used by a listings call for a number of coins, split into pages of pageSize if above zero."""
+    if pageSize <= 0 or pageSize >= coins:
+        return math.ceil(coins / settings.CMC_coins_per_credit)
+    pages,remainder = divmod(coins,pageSize)
+    return pages * math.ceil(pageSize / settings.CMC_coins_per_credit) + math.ceil(remainder / settings.CMC_coins_per_credit)
+
+
+def expectedQuoteCredits(coins):
+    """ Credits used by quotes calls for a watchlist of coins, made in batches of settings.quotes_batch_size."""
+    batches,remainder = divmod(coins,settings.quotes_batch_size)
+    return batches * math.ceil(settings.quotes_batch_size / settings.CMC_quotes_per_credit) + math.ceil(remainder / settings.CMC_quotes_per_credit)
+
+
+def dayBounds(now):
+    """ Unix times of the start and end of the UTC day holding now."""
+    start = int(now) - int(now) % 86400
+    return start,start + 86400
+
+
+def billingPeriodBounds(now,billingDay):
+    """ Unix times of the start and end of the billing period holding now, periods start on billingDay of each month (UTC)."""
+    date = datetime.datetime.fromtimestamp(now,datetime.timezone.utc)
+    year,month = date.year,date.month
+    if date.day < billingDay:
+        year,month = (year,month - 1) if month > 1 else (year - 1,12)
+    start = calendar.timegm((year,month,billingDay,0,0,0))
+    year,month = (year,month + 1) if month < 12 else (year + 1,1)
+    return start,calendar.timegm((year,month,billingDay,0,0,0))
+
+
+class CreditBudget():
+    """ Spreads API credits over the day and the billing period.
+
+    Credits used are counted per UTC day and per billing period, and kept in the status file so
+    they survive a restart. Job intervals are stretched (or compressed, down to minScale of the
+    configured interval) so that, at the credits each job has been using, the remaining credits
+    last until the end of the day and of the billing period. Once a limit has been reached jobs
+    wait for it to reset.
+
+    Parameters:
+    status (ConfigChecker): The status file, holding the credit usage section.
+    dailyLimit (int): Credits available per day, 0 for no limit.
+    monthlyLimit (int): Credits available per billing period, 0 for no limit.
+    billingDay (int): Day of the month billing periods start on, 1 to 28.
+    minScale (float): Smallest fraction of a configured interval a job can be compressed to.
+    clock (function): Current unix time, time.time by default.
+    """
+
+    def __init__(self,status,dailyLimit=0,monthlyLimit=0,billingDay=settings.credits_option_billing_day_default,
+                 minScale=settings.credits_option_min_interval_scale_default,clock=time.time):
+        if billingDay < 1 or billingDay > 28:
+            log.warning("Billing day cannot be less than 1 or greater than 28, using default value of {}".format(
+                settings.credits_option_billing_day_default))
+            billingDay = settings.credits_option_billing_day_default
+        if minScale <= 0:
+            log.warning("Minimum interval scale must be above 0, using default value of {}".format(
+                settings.credits_option_min_interval_scale_default))
+            minScale = settings.credits_option_min_interval_scale_default
+        self.__status = status
+        self.__dailyLimit = max(dailyLimit,0)
+        self.__monthlyLimit = max(monthlyLimit,0)
+        self.__billingDay = billingDay
+        self.__minScale = minScale
+        self.__clock = clock
+        self.__jobs = dict()
+
+    def enabled(self):
+        return self.__dailyLimit > 0 or self.__monthlyLimit > 0
+
+    def addJob(self,name,intervalSeconds,creditsPerCall):
+        """ Register a job and the credits each of its calls is expected to use."""
+        self.__jobs[name] = [intervalSeconds,creditsPerCall]
+
+    def record(self,name,credits):
+        """ Count the credits used by a call of a job."""
+        now = self.__clock()
+        self.__rollOver(now)
+        if name in self.__jobs and credits > 0:
+            self.__jobs[name][1] = credits
+        for option in [settings.status_file_option_credits_today,settings.status_file_option_credits_this_period]:
+            self.__status.set_value(settings.status_file_credit_usage_section_name,option,self.__getUsage(option) + credits)
+
+    def getUsage(self):
+        """ (credits used today, credits used this billing period)"""
+        self.__rollOver(self.__clock())
+        return self.__getUsage(settings.status_file_option_credits_today),self.__getUsage(settings.status_file_option_credits_this_period)
+
+    def intervalFor(self,intervalSeconds):
+        """ Seconds until the next call of a job configured to run every intervalSeconds."""
+        if not self.enabled():
+            return intervalSeconds
+        now = self.__clock()
+        scale,reset = self.__scale(now)
+        if reset is not None:
+            log.warning("API credit limit reached, waiting {:.0f} seconds for it to reset".format(reset - now))
+            return max(reset - now,0) + intervalSeconds
+        return intervalSeconds * scale
+
+    def isConstrained(self):
+        """ True if jobs are being slowed down to stay within the limits."""
+        if not self.enabled():
+            return False
+        scale,reset = self.__scale(self.__clock())
+        return reset is not None or scale > 1
+
+    def pageSize(self,pageSize):
+        """ The page size to use, rounded up to a whole number of credits while constrained."""
+        if pageSize <= 0 or not self.isConstrained():
+            return pageSize
+        return min(math.ceil(pageSize / settings.CMC_coins_per_credit) * settings.CMC_coins_per_credit,settings.CMC_max_limit)
+
+    def __scale(self,now):
+        # Returns (scale, None), or (None, reset time) if a limit has been reached
+        self.__rollOver(now)
+        rate = sum(credits / interval for interval,credits in self.__jobs.values())
+        scale = self.__minScale
+        periods = [(self.__dailyLimit,settings.status_file_option_credits_today,dayBounds(now)[1]),
+                   (self.__monthlyLimit,settings.status_file_option_credits_this_period,billingPeriodBounds(now,self.__billingDay)[1])]
+        for limit,option,end in periods:
+            if limit <= 0:
+                continue
+            remaining = limit - self.__getUsage(option)
+            if remaining <= 0:
+                return None,end
+            # Scale at which the credits planned until the end of the period match those remaining
+            scale = max(scale,rate * (end - now) / remaining)
+        return scale,None
+
+    def __rollOver(self,now):
+        day = datetime.datetime.fromtimestamp(dayBounds(now)[0],datetime.timezone.utc).date().isoformat()
+        period = datetime.datetime.fromtimestamp(billingPeriodBounds(now,self.__billingDay)[0],datetime.timezone.utc).date().isoformat()
+        for dateOption,option,current in [(settings.status_file_option_credits_day,settings.status_file_option_credits_today,day),
+                                          (settings.status_file_option_credits_period,settings.status_file_option_credits_this_period,period)]:
+            if self.__status.get_value(settings.status_file_credit_usage_section_name,dateOption) != current:
+                self.__status.set_value(settings.status_file_credit_usage_section_name,dateOption,current)
+                self.__status.set_value(settings.status_file_credit_usage_section_name,option,0)
+
+    def __getUsage(self,option):
+        return self.__status.get_value(settings.status_file_credit_usage_section_name,option)
@@ -1,10 +1,14 @@
 import logging
 import cmclogger.settings as settings
-from requests import Session
-from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
+from cmclogger.api.streamjson import iterMembers
+from cmclogger.dataparser.schema import RowExtractor, extractErrorMissing
+from cmclogger.api.keypool import KeyPool
+from cmclogger.api.retrypolicy import RetryPolicy, CircuitBreaker
+from cmclogger.api.capture import CapturedResponse
+from requests.exceptions import ConnectionError, Timeout, TooManyRedirects, RequestException
+from concurrent.futures import ThreadPoolExecutor
 import json
 import datetime
-import time
 
 log = logging.getLogger(__name__)
 
@@ -16,20 +20,66 @@ allowedCurrencies = [
         'RUB','SAR','RSD','SGD','ZAR','KRW','SSP','VES','LKR','SEK','CHF','THB','TTD','TND','TRY','UGX','UAH','AED',
         'UYU','UZS','VND']
 
+# Error code of the status of a call skipped while the API is unreachable
+skippedCallErrorCode = 10
+stoppedCallErrorCode = 11
+
+def getOptionalValue(config,section,option,default):
+    """ Get an option which may be missing from a configuration built before the option existed."""
+    for expectation in config.get_expectations():
+        if expectation['section'] == section and expectation['key'] == option:
+            return config.get_value(section,option)
+    return default
+
 class CMCGetLatest():
+    """ Wrapper for the listings/latest API call.
+
+    Parameters:
+    config (ConfigChecker): Configuration with the CMC_API section.
+    jobSection (str): Section holding the rank range, interval and currency of a scheduled job,
+    the CMC_API section is used if None.
+    keyPool (KeyPool): Keys to make requests with, shared by wrappers polling at the same time.
+    A pool of the CMC_API keys is made if None.
+    retryPolicy (RetryPolicy): Backoff between retries, the default policy if None.
+    circuitBreaker (CircuitBreaker): Skips calls while the API is unreachable, shared by wrappers
+    polling at the same time. A new one is made if None.
+    deferRetries (bool): Don't wait between attempts, a failed call which should be retried
+    returns straight away and the caller makes the retry after getRetryDelay() seconds.
+    """
 
-    def __init__(self,config):
+    def __init__(self,config,jobSection=None,keyPool=None,retryPolicy=None,circuitBreaker=None,deferRetries=False):
+        jobSection = settings.API_section_name if jobSection is None else jobSection
         self.__configuration = {
                 'privateKey' : config.get_value(settings.API_section_name,settings.API_option_private_key),
-                'conversionCurrency' : config.get_value(settings.API_section_name,settings.API_option_conversion_currency),
-                'startIndex' : config.get_value(settings.API_section_name,settings.API_option_start_index),
-                'endIndex' : config.get_value(settings.API_section_name,settings.API_option_end_index),
-                'callInterval' : config.get_value(settings.API_section_name,settings.API_option_interval)
+                'conversionCurrency' : config.get_value(jobSection,settings.API_option_conversion_currency),
+                'startIndex' : config.get_value(jobSection,settings.API_option_start_index),
+                'endIndex' : config.get_value(jobSection,settings.API_option_end_index),
+                'callInterval' : config.get_value(jobSection,settings.API_option_interval),
+                'pageSize' : getOptionalValue(config,settings.API_section_name,settings.API_option_page_size,
+                                              settings.API_option_page_size_default),
+                'fetchWorkers' : getOptionalValue(config,settings.API_section_name,settings.API_option_fetch_workers,
+                                                  settings.API_option_fetch_workers_default),
+                'extraKeys' : getOptionalValue(config,settings.API_section_name,settings.API_option_extra_keys,
+                                               settings.API_option_extra_keys_default),
+                'keyRequestsPerMinute' : getOptionalValue(config,settings.API_section_name,settings.API_option_key_requests_per_minute,
+                                                          settings.API_option_key_requests_per_minute_default),
+                'watchlist' : getOptionalValue(config,jobSection,settings.API_option_watchlist,settings.API_option_watchlist_default)
                 }
         self.__checkConfigurationValues()
+        self.__extractor = RowExtractor(self.__configuration['conversionCurrency'])
         log.debug("API wrapper initialised with confg '{}'".format(str(self.__configuration)))
-        self.__getLatestSession = Session()
-        self.__configureGetLatestSession()
+        self.__retryPolicy = RetryPolicy() if retryPolicy is None else retryPolicy
+        self.__keyPool = self.__makeKeyPool(self.__apiKeys()) if keyPool is None else keyPool
+        self.__singleKeyPool = None
+        self.__circuitBreaker = CircuitBreaker() if circuitBreaker is None else circuitBreaker
+        self.__retryTimings = []
+        self.__unreachable = False
+        self.__deferRetries = deferRetries
+        self.__retryable = False
+        self.__retryAttempt = 0
+        self.__retryDelay = None
+        self.__capture = None
+        self.__captureCall = None
         self.__getLatestData = None
         self.__getLatestStatus = None
         self.__lastCallTimestamp = None;
@@ -40,14 +90,46 @@ class CMCGetLatest():
     def getLatestData(self):
         return self.__getLatestData
 
-    def __configureGetLatestSession(self,apiKey = None):
-        getLatestHeaders = settings.getLatest_Headers
-        if apiKey is None:
-            getLatestHeaders['X-CMC_PRO_API_KEY'] = self.__configuration['privateKey']
-        else:
-            getLatestHeaders['X-CMC_PRO_API_KEY'] = apiKey
-        self.__getLatestSession.headers.update(getLatestHeaders)
-        log.debug("Setting getLatest session headers to {}".format(getLatestHeaders))
+    def getKeyPool(self):
+        return self.__keyPool
+
+    def getRetryPolicy(self):
+        return self.__retryPolicy
+
+    def getCircuitBreaker(self):
+        return self.__circuitBreaker
+
+    def getWatchlist(self):
+        """ The coin ids and symbols fetched instead of the rank range, empty if the rank range is fetched."""
+        return [item.strip() for item in self.__configuration['watchlist'].split(',') if item.strip() != '']
+
+    def getCapture(self):
+        return self.__capture
+
+    def setCapture(self,capture):
+        """ Write every response received to a ResponseCapture, None stops capturing."""
+        self.__capture = capture
+
+    def getRetryTimings(self):
+        """ Seconds waited before each retry made during the last call, with deferred retries
+        those of the retries made or due for the call being retried."""
+        return list(self.__retryTimings)
+
+    def getRetryDelay(self):
+        """ With deferred retries, seconds after which the last call should be made again, None if it shouldn't."""
+        return self.__retryDelay
+
+    def __apiKeys(self):
+        extraKeys = [key.strip() for key in self.__configuration['extraKeys'].split(',') if key.strip() != '']
+        return [self.__configuration['privateKey']] + extraKeys
+
+    def __makeKeyPool(self,keys):
+        # Enough pooled connections per key for every page fetched at once
+        # Waits for a free key end when the retry policy's waits do, when the logger is stopped
+        keyPool = KeyPool(keys,self.__configuration['keyRequestsPerMinute'],max(self.__configuration['fetchWorkers'],10),
+                          wait=self.__retryPolicy.pause)
+        log.debug("Using a pool of {} API keys".format(len(keyPool)))
+        return keyPool
 
     def __checkConfigurationValues(self):
         if self.__configuration['startIndex'] < 1 or self.__configuration['startIndex'] > 4999:
@@ -69,6 +151,20 @@ class CMCGetLatest():
                 self.__configuration['conversionCurrency'],settings.API_option_conversion_currency_default))
             self.__configuration['conversionCurrency'] = settings.API_option_conversion_currency_default
 
+        if self.__configuration['pageSize'] < 0:
+            log.warning('Page size cannot be less than 0, using default value of {}'.format(settings.API_option_page_size_default))
+            self.__configuration['pageSize'] = settings.API_option_page_size_default
+
+        if self.__configuration['fetchWorkers'] < 1:
+            log.warning('Fetch workers cannot be less than 1, using default value of {}'.format(
+                settings.API_option_fetch_workers_default))
+            self.__configuration['fetchWorkers'] = settings.API_option_fetch_workers_default
+
+        if self.__configuration['keyRequestsPerMinute'] < 0:
+            log.warning('Key requests per minute cannot be less than 0, using default value of {}'.format(
+                settings.API_option_key_requests_per_minute_default))
+            self.__configuration['keyRequestsPerMinute'] = settings.API_option_key_requests_per_minute_default
+
         if self.__configuration['privateKey'] == '':
             log.warning("API private key cannot be empty, using default value")
             self.__configuration['privateKey'] = settings.API_option_privatate_key_default
@@ -76,63 +172,417 @@ class CMCGetLatest():
     def getConfiguration(self):
         return self.__configuration;
 
-    def getLatest(self,apiKey = None):
+    def setPageSize(self,pageSize):
+        """ Change the page size used for following calls, 0 fetches the whole range in one request."""
+        if pageSize < 0:
+            log.warning('Page size cannot be less than 0, leaving it at {}'.format(self.__configuration['pageSize']))
+            return
+        self.__configuration['pageSize'] = pageSize
+
+    def getLatest(self,apiKey = None,stage = None):
+        """ Make a listings API call.
+
+        Parameters:
+        apiKey (str): Optionally make this call with a different key.
+        stage (StagedData): If given, data entries are added to it as they are decoded from the
+        response instead of being kept for getLatestData(). It is emptied if the call fails.
+
+        Returns:
+        True if the call succeeded.
+        """
 
         if apiKey is not None:
-            self.__configureGetLatestSession(apiKey)
+            # Kept between calls so the key's request counts carry over
+            if self.__singleKeyPool is None or self.__singleKeyPool[0] != apiKey:
+                self.__singleKeyPool = (apiKey,self.__makeKeyPool([apiKey]))
+            keyPool = self.__keyPool
+            self.__keyPool = self.__singleKeyPool[1]
+            try:
+                return self.getLatest(stage=stage)
+            finally:
+                self.__keyPool = keyPool
 
         self.__lastCallTimestamp = int(datetime.datetime.now().timestamp())
-        successfullRequest,response = self.__getAPIResponse()
+        if self.__retryAttempt == 0:
+            self.__retryTimings = []
+        self.__unreachable = False
+        self.__retryable = False
+        self.__retryDelay = None
+        if self.__capture is not None:
+            self.__captureCall = (self.__lastCallTimestamp if stage is None else stage.timestamp,self.__capture.newCall())
+        if not self.__circuitBreaker.allowRequest():
+            self.__retryAttempt = 0
+            return self.__skipCall(stage)
+        goodResponse = self.__makeCall(stage)
+        self.__deferRetry(goodResponse)
+        # Only failures to reach the API count towards opening the circuit, a call being retried counts once
+        if goodResponse or not self.__unreachable:
+            self.__circuitBreaker.recordSuccess()
+        elif self.__retryDelay is None:
+            self.__circuitBreaker.recordFailure()
+        return goodResponse
+
+    def __deferRetry(self,goodResponse):
+        if not self.__deferRetries:
+            return
+        if goodResponse or not self.__retryable or self.__retryAttempt >= settings.API_callRetriesOnFailure:
+            self.__retryAttempt = 0
+            return
+        self.__retryAttempt = self.__retryAttempt + 1
+        self.__retryDelay = self.__retryPolicy.delay(self.__retryAttempt)
+        self.__retryTimings.append(self.__retryDelay)
+        log.warning("API call failed, making retry {} of {} in {:.1f} seconds".format(
+            self.__retryAttempt,settings.API_callRetriesOnFailure,self.__retryDelay))
+
+    def __skipCall(self,stage):
+        if stage is not None:
+            stage.discard()
+        self.__getLatestData = None
+        self.__getLatestStatus = self.__makeCustomStatusError(skippedCallErrorCode,"Internal error: API unreachable, skipping calls for another {:.0f} seconds".format(
+            self.__circuitBreaker.secondsUntilRetry()))
+        return False
+
+    def __makeCall(self,stage):
+        if len(self.getWatchlist()) > 0:
+            return self.__stageData(self.__getWatchlist(None if stage is None else stage.timestamp),stage)
+        if self.__usePages():
+            return self.__stageData(self.__getLatestInPages(None if stage is None else stage.timestamp),stage)
+        parameters = self.__updateRequesetParameters()
+        successfullRequest,response = self.__getAPIResponse(parameters,stage is not None)
         if not successfullRequest:
             return False
 
-        return self.__parseSuccessfulGetLatestRequest(response)
+        if stage is None:
+            return self.__parseSuccessfulGetLatestRequest(response)
+        return self.__parseStreamedGetLatestRequest(response,stage,parameters)
 
-    def __getAPIResponse(self):
+    def __getAPIResponse(self,parameters,stream=False):
 
-        parameters = self.__updateRequesetParameters()
         log.debug("Attempting API call at '{}' with parameters '{}'".format(settings.getLatest_Url,parameters))
+        response,errorStatus = self.__requestWithRetries(parameters,stream)
+        if response is None:
+            self.__getLatestStatus = errorStatus
+            self.__getLatestData = None
+            return False,None
+        return True,response
+
+    def __requestWithRetries(self,parameters,stream=False,url=None):
+        # Returns (response, None) or (None, error status), safe to call from several threads at once
+        url = settings.getLatest_Url if url is None else url
         retries = settings.API_callRetriesOnFailure
         attempt = 1;
+        streamArgument = {'stream' : True} if stream else {}
+        keySwitches = 0
         while retries >= 0:
+            key = self.__keyPool.acquire()
+            if key is None:
+                return None,self.__makeCustomStatusError(stoppedCallErrorCode,"Internal error: Stopped while waiting for a free API key")
             try:
-                response = self.__getLatestSession.get(settings.getLatest_Url,params=parameters,timeout=settings.API_call_timeout_seconds)
+                response = key.session.get(url,params=parameters,timeout=settings.API_call_timeout_seconds,
+                                           **streamArgument)
+                self.__keyPool.release(key,response.status_code)
+                # A rejected key is sidelined, the request is tried straight away with each other key
+                if response.status_code in [401,429] and keySwitches < len(self.__keyPool) - 1 and self.__keyPool.hasAvailableKey():
+                    keySwitches = keySwitches + 1
+                    log.warning("API key '{}' rejected with HTTP code {}, trying another key".format(key.maskedKey(),response.status_code))
+                    if response.raw is not None:
+                        response.close()
+                    continue
                 retries = -1;
+                if response.status_code >= 500:
+                    self.__unreachable = True
+                # A streamed body is captured as it is decoded
+                if not stream:
+                    self.__captureResponse(parameters,response)
             except ConnectionError:
+                self.__keyPool.release(key)
                 retries,attempt,done = self.__evaluateAttempt(retries,attempt)
                 if not done:
                     continue
-                self.__getLatestStatus = self.__makeCustomStatusError(3,"Internal error: Connection exception when conduction API call")
-                self.__getLatestData = None
-                return False,None
+                self.__unreachable = True
+                return None,self.__makeCustomStatusError(3,"Internal error: Connection exception when conduction API call")
             except Timeout:
+                self.__keyPool.release(key)
                 retries,attempt,done = self.__evaluateAttempt(retries,attempt)
                 if not done:
                     continue
-                self.__getLatestStatus = self.__makeCustomStatusError(4,"Internal error: Timeout exception when conduction API call, no internet connection?")
-                self.__getLatestData = None
-                return False,None
+                self.__unreachable = True
+                return None,self.__makeCustomStatusError(4,"Internal error: Timeout exception when conduction API call, no internet connection?")
             except TooManyRedirects:
+                self.__keyPool.release(key)
                 retries,attempt,done = self.__evaluateAttempt(retries,attempt)
                 if not done:
                     continue
-                self.__getLatestStatus = self.__makeCustomStatusError(5,"Internal error: Too many redirects exception when conduction API call")
-                self.__getLatestData = None
-                return False,None
+                self.__unreachable = True
+                return None,self.__makeCustomStatusError(5,"Internal error: Too many redirects exception when conduction API call")
 
-        return True,response
+        return response,None
+
+    def __captureResponse(self,parameters,response):
+        if self.__capture is None:
+            return
+        self.__capture.record(*self.__captureCall,parameters,response.status_code,response.text)
+
+    def replayCall(self,records,stage=None):
+        """ Parse the captured responses of one call as if they had just been received.
+
+        Parameters:
+        records (list): The captured responses of the call, one per page, see capture.groupCalls.
+        stage (StagedData): If given, data entries are extracted into it instead of being kept for
+        getLatestData().
+
+        Returns:
+        True if the call succeeded.
+        """
+        extractor = self.__extractor
+        # Responses are parsed in the currency they were requested in
+        self.__extractor = RowExtractor(records[0]['parameters']['convert'])
+        try:
+            timestamp = None if stage is None else stage.timestamp
+            pages = [self.__capturedPage(record['parameters']) for record in records]
+            results = [self.__parsePage(CapturedResponse(record),limit,timestamp,self.__requestedItems(record['parameters']))
+                       for record,(start,limit) in zip(records,pages)]
+            return self.__stageData(self.__mergePages(pages,results),stage)
+        finally:
+            self.__extractor = extractor
+
+    def __capturedPage(self,parameters):
+        # (start, limit) of a captured listings page, or (first coin, count) of a watchlist batch
+        if 'start' in parameters:
+            return parameters['start'],parameters['limit']
+        items = self.__requestedItems(parameters)
+        return items[0],len(items)
+
+    def __requestedItems(self,parameters):
+        # The ids or symbols requested in a watchlist batch, None for a listings page
+        for key in ['id','symbol']:
+            if key in parameters:
+                return str(parameters[key]).split(',')
+        return None
+
+    def __usePages(self):
+        return self.__configuration['pageSize'] > 0 and self.__requestedCount() > self.__configuration['pageSize']
+
+    def __requestedCount(self):
+        return self.__configuration['endIndex'] - self.__configuration['startIndex'] + 1
+
+    def __getLatestInPages(self,timestamp=None):
+        pageSize = self.__configuration['pageSize']
+        pages = [(start,min(pageSize,self.__configuration['endIndex'] - start + 1))
+                 for start in range(self.__configuration['startIndex'],self.__configuration['endIndex'] + 1,pageSize)]
+        log.debug("Fetching ranks {} to {} in {} pages".format(self.__configuration['startIndex'],self.__configuration['endIndex'],len(pages)))
+        with ThreadPoolExecutor(max_workers=min(self.__configuration['fetchWorkers'],len(pages))) as executor:
+            results = list(executor.map(lambda page: self.__fetchPage(*page,timestamp),pages))
+        return self.__mergePages(pages,results)
+
+    def __fetchPage(self,start,limit,timestamp=None):
+        # Returns (status, data), data is None if the page could not be fetched and rows if a timestamp is given
+        parameters = self.__updateRequesetParameters()
+        parameters['start'] = start
+        parameters['limit'] = limit
+        return self.__fetchParsed(settings.getLatest_Url,parameters,limit,timestamp)
+
+    def __watchlistBatches(self):
+        # Ids and symbols can't be mixed in a request, each batch is (parameter, ids or symbols)
+        watchlist = self.getWatchlist()
+        batches = []
+        for key,items in [('id',[item for item in watchlist if item.isdigit()]),
+                          ('symbol',[item.upper() for item in watchlist if not item.isdigit()])]:
+            for start in range(0,len(items),settings.quotes_batch_size):
+                batches.append((key,items[start:start + settings.quotes_batch_size]))
+        return batches
+
+    def __getWatchlist(self,timestamp=None):
+        batches = self.__watchlistBatches()
+        log.debug("Fetching {} watchlist coins in {} requests".format(len(self.getWatchlist()),len(batches)))
+        with ThreadPoolExecutor(max_workers=min(self.__configuration['fetchWorkers'],len(batches))) as executor:
+            results = list(executor.map(lambda batch: self.__fetchBatch(*batch,timestamp),batches))
+        return self.__mergePages([(items[0],len(items)) for key,items in batches],results,"requests starting at")
+
+    def __fetchBatch(self,key,items,timestamp=None):
+        parameters = {key : ','.join(items),'convert' : self.__configuration['conversionCurrency']}
+        return self.__fetchParsed(settings.quotes_Url,parameters,len(items),timestamp,items)
+
+    def __fetchParsed(self,url,parameters,limit,timestamp=None,requested=None):
+        # Returns (status, data) of a page or batch, data is None if it could not be fetched
+        retries = settings.API_callRetriesOnFailure
+        attempt = 1
+        while True:
+            response,errorStatus = self.__requestWithRetries(parameters,url=url)
+            if response is None:
+                return errorStatus,None
+            status,data = self.__parsePage(response,limit,timestamp,requested)
+            # Server errors and truncated bodies are worth another try, other errors are not
+            retry = data is None and (response.status_code >= 500 or status[settings.CMC_status_error_code] == 2)
+            if not retry:
+                return status,data
+            retries,attempt,done = self.__evaluateAttempt(retries,attempt)
+            if done:
+                return status,None
+
+    def __parsePage(self,response,limit,timestamp=None,requested=None):
+        try:
+            jsonFields = json.loads(response.text)
+        except json.decoder.JSONDecodeError:
+            return self.__makeCustomStatusError(2,"Internal error: Error parsion JSON object from received response"),None
+        try:
+            status = jsonFields['status']
+            data = jsonFields['data'] if response.status_code == 200 else None
+        except KeyError:
+            return self.__makeCustomStatusError(1,"Internal error: Error parsing main dictionary keys from received response"),None
+        errorStatus = self.__statusKeysError(status)
+        if errorStatus is not None:
+            return errorStatus,None
+        if response.status_code != 200:
+            log.warning("Failed API request for page, Receved HTTP code {} from server".format(response.status_code))
+            return status,None
+        if isinstance(data,dict):
+            # Quotes responses are keyed by id or symbol, a symbol can hold a list of coins so
+            # the count of coins isn't checked, only that each requested id or symbol came back
+            status = self.__flagMissingItems(status,requested,data)
+            data = [entry for value in data.values() for entry in (value if isinstance(value,list) else [value])]
+            limit = None
+        errorStatus,data = self.__extractData(data,limit,timestamp)
+        if errorStatus is not None:
+            return errorStatus,None
+        return status,data
+
+    def __flagMissingItems(self,status,requested,data):
+        missing = [item for item in (requested or []) if not data.get(item)]
+        if len(missing) == 0:
+            return status
+        status = dict(status)
+        status[settings.CMC_status_error_message] = "Partial response, watchlist coins {} were not returned".format(", ".join(missing))
+        log.warning(status[settings.CMC_status_error_message])
+        return status
+
+    def __mergePages(self,pages,results,failedName="pages starting at rank"):
+        data = []
+        failedPages = []
+        goodStatus = None
+        messages = []
+        for (start,limit),(status,pageData) in zip(pages,results):
+            if pageData is None:
+                failedPages.append(start)
+                lastError = status
+                continue
+            data.extend(pageData)
+            if status[settings.CMC_status_error_message] and status[settings.CMC_status_error_message] not in messages:
+                messages.append(status[settings.CMC_status_error_message])
+            if goodStatus is None:
+                goodStatus = dict(status)
+                goodStatus[settings.CMC_status_credit_count] = 0
+            goodStatus[settings.CMC_status_credit_count] = goodStatus[settings.CMC_status_credit_count] + status[settings.CMC_status_credit_count]
+            goodStatus[settings.CMC_status_elapsed] = max(goodStatus[settings.CMC_status_elapsed],status[settings.CMC_status_elapsed])
+        if goodStatus is None:
+            self.__getLatestStatus = lastError
+            self.__getLatestData = None
+            return False
+        if len(failedPages) > 0:
+            messages.append("Partial response, {} {} failed".format(failedName,", ".join(str(start) for start in failedPages)))
+            log.warning("{} of {} pages failed, keeping the {} entries received".format(len(failedPages),len(pages),len(data)))
+        if len(messages) > 0:
+            goodStatus[settings.CMC_status_error_message] = "; ".join(messages)
+        self.__getLatestStatus = goodStatus
+        self.__getLatestData = data
+        log.info("Successful API call returned {} crypto entries in {} pages".format(len(data),len(pages) - len(failedPages)))
+        return True
 
     def __evaluateAttempt(self,retries,attempt):
-        if retries >= 1:
+        if retries >= 1 and self.__deferRetries:
+            # The caller makes the retry once the backoff has passed, see getRetryDelay
+            self.__retryable = True
+            done = True
+        elif retries >= 1:
             retries = retries - 1;
-            time.sleep(2*attempt)
-            log.warning("Exception occurred on API call attempt {} of {}".format(attempt,settings.API_callRetriesOnFailure));
+            delay = self.__retryPolicy.delay(attempt)
+            log.warning("Exception occurred on API call attempt {} of {}, retrying in {:.1f} seconds".format(
+                attempt,settings.API_callRetriesOnFailure,delay));
+            self.__retryTimings.append(delay)
             attempt = attempt + 1
-            done = False
+            # An interrupted wait means the logger is stopping
+            done = self.__retryPolicy.pause(delay)
         else:
             done = True
         return retries,attempt,done
 
+    def __stageData(self,goodResponse,stage):
+        if stage is None or not goodResponse:
+            return goodResponse
+        # Pages were extracted into rows as they were parsed
+        stage.discard()
+        stage.extend(self.__getLatestData)
+        self.__getLatestData = None
+        return True
+
+    def __responseChunks(self,response):
+        if response.raw is None:
+            # Responses which were not read from a connection only have text
+            return [response.text]
+        return response.iter_content(chunk_size=settings.getLatest_stream_chunk_size)
+
+    def __captureChunks(self,chunks,body):
+        for chunk in chunks:
+            body.write(chunk)
+            yield chunk
+
+    def __finishCapture(self,chunks,body):
+        try:
+            # The rest of a body which failed to decode is still captured, so the failure can be replayed
+            for chunk in chunks:
+                pass
+        except RequestException as e:
+            log.warning("Failed to read the rest of the response to capture it. Exception '{}'".format(e))
+        finally:
+            body.close()
+
+    def __parseStreamedGetLatestRequest(self,response,stage,parameters):
+        if response.status_code != 200:
+            stage.discard()
+            # Error bodies are small and read whole to parse them
+            self.__captureResponse(parameters,response)
+            return self.__parseSuccessfulGetLatestRequest(response)
+        self.__getLatestData = None
+        stage.discard()
+        status = None
+        chunks = self.__responseChunks(response)
+        body = None
+        if self.__capture is not None:
+            # Chunks are written to the capture as they are fed to the decoder
+            body = self.__capture.start(*self.__captureCall,parameters,response.status_code)
+            chunks = self.__captureChunks(chunks,body)
+        try:
+            for key,value in iterMembers(chunks,'data'):
+                if key == 'status':
+                    status = value
+                elif key == 'data':
+                    row,error = self.__extractor.extract(value,stage.timestamp)
+                    if error is not None:
+                        return self.__failStreamedRequest(stage,self.__extractError(error))
+                    stage.append(row)
+        except ValueError:
+            return self.__failStreamedRequest(stage,self.__makeCustomStatusError(2,"Internal error: Error parsion JSON object from received response"))
+        finally:
+            if body is not None:
+                self.__finishCapture(chunks,body)
+            if response.raw is not None:
+                response.close()
+        if status is None:
+            return self.__failStreamedRequest(stage,self.__makeCustomStatusError(1,"Internal error: Error parsing main dictionary keys from received response"))
+        errorStatus = self.__statusKeysError(status)
+        if errorStatus is None and len(stage) != self.__requestedCount():
+            errorStatus = self.__makeCustomStatusError(8,"Internal error: Number of received crypto data points doesn't match that requested.")
+        if errorStatus is not None:
+            return self.__failStreamedRequest(stage,errorStatus)
+        self.__getLatestStatus = status
+        log.info("Successful API call returned {} crypto entries".format(len(stage)))
+        return True
+
+    def __failStreamedRequest(self,stage,errorStatus):
+        stage.discard()
+        self.__getLatestStatus = errorStatus
+        return False
+
     def __parseSuccessfulGetLatestRequest(self,response):
         try:
             jsonFields = json.loads(response.text)
@@ -161,52 +611,52 @@ class CMCGetLatest():
             return False
 
     def __checkGoodDataKeys(self):
-        if len(self.getLatestData()) != (self.__configuration['endIndex'] - self.__configuration['startIndex'] + 1):
-            self.__getLatestStatus = self.__makeCustomStatusError(8,"Internal error: Number of received crypto data points doesn't match that requested.")
-            self.__getLatestData = None
-            return False
-        try:
-            for i in range(0,len(self.getLatestData())):
-                dummy = self.getLatestData()[i][settings.CMC_data_id]
-                dummy = self.getLatestData()[i][settings.CMC_data_name]
-                dummy = self.getLatestData()[i][settings.CMC_data_symbol]
-                dummy = self.getLatestData()[i][settings.CMC_data_slug]
-                dummy = self.getLatestData()[i][settings.CMC_data_cmc_rank]
-                dummy = self.getLatestData()[i][settings.CMC_data_num_market_pairs]
-                dummy = self.getLatestData()[i][settings.CMC_data_circulating_suuply]
-                dummy = self.getLatestData()[i][settings.CMC_data_total_supply]
-                dummy = self.getLatestData()[i][settings.CMC_data_max_supply]
-                dummy = self.getLatestData()[i][settings.CMC_data_last_updated]
-                dummy = self.getLatestData()[i][settings.CMC_data_data_added]
-                dummy = self.getLatestData()[i][settings.CMC_data_tags]
-                dummy = self.getLatestData()[i][settings.CMC_data_platform]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_quote_price]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_quote_volume_24h]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_quote_market_cap]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_percent_change_1h]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_percent_change_24h]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_percent_change_7d]
-                dummy = self.getLatestData()[i][settings.CMC_data_quote][self.__configuration['conversionCurrency']][settings.CMC_data_last_updated]
-            log.info("Successful API call returned {} crypto entries".format(len(self.getLatestData())))
-        except KeyError:
-            self.__getLatestStatus = self.__makeCustomStatusError(7,"Internal error: Error parsing API received data keys")
+        errorStatus,data = self.__extractData(self.getLatestData(),self.__requestedCount())
+        if errorStatus is not None:
+            self.__getLatestStatus = errorStatus
             self.__getLatestData = None
             return False
+        log.info("Successful API call returned {} crypto entries".format(len(self.getLatestData())))
         return True
 
+    def __extractData(self,data,expectedCount,timestamp=None):
+        # Returns (error status, None) or (None, data), data is the extracted rows if a timestamp is given
+        # A count of None isn't checked
+        if expectedCount is not None and len(data) != expectedCount:
+            return self.__makeCustomStatusError(8,"Internal error: Number of received crypto data points doesn't match that requested."),None
+        rows = []
+        for entry in data:
+            row,error = self.__extractor.extract(entry,timestamp)
+            if error is not None:
+                return self.__extractError(error),None
+            rows.append(row)
+        return None,(data if timestamp is None else rows)
+
+    def __extractError(self,error):
+        field,reason = error
+        if reason == extractErrorMissing:
+            return self.__makeCustomStatusError(7,"Internal error: Error parsing API received data keys, '{}' is missing".format(field))
+        return self.__makeCustomStatusError(9,"Internal error: API received data field '{}' has an invalid value".format(field))
+
     def __checkGoodStatusKeys(self):
-        try:
-            dummy = self.getLatestStatus()[settings.CMC_status_timestamp]
-            dummy = self.getLatestStatus()[settings.CMC_status_elapsed]
-            dummy = self.getLatestStatus()[settings.CMC_status_error_code]
-            dummy = self.getLatestStatus()[settings.CMC_status_credit_count]
-            dummy = self.getLatestStatus()[settings.CMC_status_error_message]
-        except KeyError:
-            self.__getLatestStatus = self.__makeCustomStatusError(6,"Internal error: Error parsing API received status keys")
+        errorStatus = self.__statusKeysError(self.getLatestStatus())
+        if errorStatus is not None:
+            self.__getLatestStatus = errorStatus
             self.__getLatestData = None
             return False
         return True
 
+    def __statusKeysError(self,status):
+        try:
+            dummy = status[settings.CMC_status_timestamp]
+            dummy = status[settings.CMC_status_elapsed]
+            dummy = status[settings.CMC_status_error_code]
+            dummy = status[settings.CMC_status_credit_count]
+            dummy = status[settings.CMC_status_error_message]
+        except KeyError:
+            return self.__makeCustomStatusError(6,"Internal error: Error parsing API received status keys")
+        return None
+
     def __makeCustomStatusError(self,errNo,message):
        customStatus = dict();
        customStatus[settings.CMC_status_timestamp] = str(datetime.datetime.now().isoformat())
@@ -218,7 +668,7 @@ class CMCGetLatest():
        return customStatus;
 
     def __updateRequesetParameters(self):
-        defaultParameters = settings.getLatest_Parameters
+        defaultParameters = dict(settings.getLatest_Parameters)
         defaultParameters['start'] = self.__configuration['startIndex']
         defaultParameters['limit'] = self.__configuration['endIndex'] - self.__configuration['startIndex'] + 1
         defaultParameters['convert'] = self.__configuration['conversionCurrency']
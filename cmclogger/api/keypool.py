@@ -0,0 +1,137 @@
+import cmclogger.settings as settings
+from requests import Session
+from requests.adapters import HTTPAdapter
+from collections import deque
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class PooledKey():
+    """ An API key with its own session, request window and error counters.
+
+    Parameters:
+    key (str): The API key, sent in the request headers of its session.
+    poolSize (int): Connections kept open by the session.
+    """
+
+    def __init__(self,key,poolSize=10):
+        self.key = key
+        self.session = Session()
+        self.session.mount('https://',HTTPAdapter(pool_maxsize=poolSize))
+        # The shared default headers are copied, never changed
+        headers = dict(settings.getLatest_Headers)
+        headers[settings.getLatest_key_header] = key
+        self.session.headers.update(headers)
+        self.requests = 0
+        self.failures = 0
+        self.rateLimited = 0
+        self.unauthorized = 0
+        self.sidelinedUntil = None
+        self.recentRequests = deque()
+
+    def maskedKey(self):
+        return '...' + self.key[-4:]
+
+
+class KeyPool():
+    """ Spreads API requests over several keys.
+
+    Keys are handed out in turn, so pages and jobs fetched together use different keys. A key
+    which has made requestsPerMinute requests in the last minute is skipped, and if every key has,
+    acquire() waits for the first to free up. A key the server answers with HTTP 429 (rate
+    limited) or 401 (unauthorised) is sidelined for a while. If every key is sidelined the one
+    due back first is still used, so a pool of one key behaves as a single key always has.
+
+    Parameters:
+    keys (list): API keys, duplicates are ignored.
+    requestsPerMinute (int): Requests each key can make per minute, 0 for no limit.
+    poolSize (int): Connections kept open by each key's session.
+    clock (function): Current time in seconds, time.monotonic by default.
+    wait (function): Called with the seconds to wait, returns True if the wait was interrupted
+    (as threading.Event.wait does), time.sleep if None.
+    """
+
+    def __init__(self,keys,requestsPerMinute=0,poolSize=10,clock=time.monotonic,wait=None):
+        self.__keys = [PooledKey(key,poolSize) for key in dict.fromkeys(keys)]
+        self.__requestsPerMinute = max(requestsPerMinute,0)
+        self.__clock = clock
+        self.__wait = wait
+        self.__nextIndex = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def acquire(self):
+        """ Take the key to make the next request with, waiting if every key is at its limit.
+
+        Returns:
+        The PooledKey, to be passed back to release() with the result. None if the wait was interrupted.
+        """
+        while True:
+            with self.__lock:
+                now = self.__clock()
+                key,wait = self.__nextKey(now)
+                if key is not None:
+                    key.recentRequests.append(now)
+                    key.requests = key.requests + 1
+                    return key
+            log.debug("Every API key is at its request limit, waiting {:.1f} seconds".format(wait))
+            if self.__wait is None:
+                time.sleep(wait)
+            elif self.__wait(wait):
+                return None
+
+    def release(self,key,statusCode=None):
+        """ Count the result of a request made with key, statusCode is None if no response was received."""
+        with self.__lock:
+            if statusCode != 200:
+                key.failures = key.failures + 1
+            if statusCode == 429:
+                key.rateLimited = key.rateLimited + 1
+                self.__sideline(key,settings.key_pool_rate_limited_seconds,'was rate limited')
+            elif statusCode == 401:
+                key.unauthorized = key.unauthorized + 1
+                self.__sideline(key,settings.key_pool_unauthorized_seconds,'was not authorised')
+
+    def hasAvailableKey(self):
+        """ True if at least one key isn't sidelined."""
+        now = self.__clock()
+        with self.__lock:
+            return any(not self.__isSidelined(key,now) for key in self.__keys)
+
+    def getStats(self):
+        """ Request and error counts of each key, with the key masked."""
+        now = self.__clock()
+        with self.__lock:
+            return [{'key' : key.maskedKey(),'requests' : key.requests,'failures' : key.failures,
+                     'rate_limited' : key.rateLimited,'unauthorized' : key.unauthorized,
+                     'sidelined' : self.__isSidelined(key,now)} for key in self.__keys]
+
+    def __nextKey(self,now):
+        # Returns (key, 0), or (None, seconds until a key is free) if every usable key is at its limit
+        count = len(self.__keys)
+        turn = [self.__keys[(self.__nextIndex + offset) % count] for offset in range(count)]
+        usable = [key for key in turn if not self.__isSidelined(key,now)]
+        if len(usable) == 0:
+            usable = [min(turn,key=lambda key: key.sidelinedUntil)]
+        waits = []
+        for key in usable:
+            while len(key.recentRequests) > 0 and key.recentRequests[0] <= now - 60:
+                key.recentRequests.popleft()
+            if self.__requestsPerMinute <= 0 or len(key.recentRequests) < self.__requestsPerMinute:
+                self.__nextIndex = (self.__keys.index(key) + 1) % count
+                return key,0
+            waits.append(key.recentRequests[0] + 60 - now)
+        return None,min(waits)
+
+    def __isSidelined(self,key,now):
+        return key.sidelinedUntil is not None and key.sidelinedUntil > now
+
+    def __sideline(self,key,seconds,reason):
+        key.sidelinedUntil = self.__clock() + seconds
+        log.warning("API key '{}' {}, leaving it out for {} seconds".format(key.maskedKey(),reason,seconds))
+
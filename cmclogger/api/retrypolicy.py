@@ -0,0 +1,122 @@
+import cmclogger.settings as settings
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+circuitClosed = 'closed'
+circuitOpen = 'open'
+circuitHalfOpen = 'half_open'
+
+
+class RetryPolicy():
+    """ Jittered exponential backoff between attempts of an API request.
+
+    The wait before retry n is drawn between half and all of baseSeconds * 2^(n-1), capped at
+    maxSeconds, so requests retried at the same time (pages, or several loggers) spread out
+    instead of hitting the API together again.
+
+    Parameters:
+    baseSeconds (float): Longest wait before the first retry.
+    maxSeconds (float): Longest wait before any retry.
+    wait (function): Called with the seconds to wait, returns True if the wait was interrupted
+    (as threading.Event.wait does), time.sleep if None.
+    random (function): Returns a number from 0 to 1, random.random by default.
+    """
+
+    def __init__(self,baseSeconds=settings.API_retry_base_seconds,maxSeconds=settings.API_retry_max_seconds,
+                 wait=None,random=random.random):
+        self.__baseSeconds = baseSeconds
+        self.__maxSeconds = maxSeconds
+        self.__wait = wait
+        self.__random = random
+
+    def delay(self,attempt):
+        """ Seconds to wait before retry number attempt, counting from 1."""
+        cap = min(self.__maxSeconds,self.__baseSeconds * 2 ** (attempt - 1))
+        return cap / 2 + self.__random() * cap / 2
+
+    def pause(self,seconds):
+        """ Wait before a retry.
+
+        Returns:
+        True if the wait was interrupted and no more attempts should be made.
+        """
+        if self.__wait is None:
+            time.sleep(seconds)
+            return False
+        return bool(self.__wait(seconds))
+
+
+class CircuitBreaker():
+    """ Skips API calls while the API is down.
+
+    After failureThreshold calls in a row fail to reach the API the circuit opens, and calls are
+    skipped for resetSeconds. One call is then let through (half open): if it succeeds the circuit
+    closes, if not it opens again for twice as long as before, up to maxResetSeconds.
+
+    Parameters:
+    failureThreshold (int): Failed calls in a row which open the circuit.
+    resetSeconds (float): Time calls are first skipped for.
+    maxResetSeconds (float): Longest time calls are skipped for.
+    clock (function): Current time in seconds, time.monotonic by default.
+    """
+
+    def __init__(self,failureThreshold=settings.API_circuit_failure_threshold,resetSeconds=settings.API_circuit_reset_seconds,
+                 maxResetSeconds=settings.API_circuit_max_reset_seconds,clock=time.monotonic):
+        self.__failureThreshold = max(failureThreshold,1)
+        self.__resetSeconds = resetSeconds
+        self.__maxResetSeconds = maxResetSeconds
+        self.__clock = clock
+        self.__state = circuitClosed
+        self.__failures = 0
+        self.__openSeconds = resetSeconds
+        self.__openUntil = None
+        self.__lock = threading.Lock()
+
+    def getState(self):
+        with self.__lock:
+            return self.__state
+
+    def secondsUntilRetry(self):
+        """ Seconds until a call is let through again, 0 if calls are being made."""
+        with self.__lock:
+            if self.__state != circuitOpen:
+                return 0
+            return max(self.__openUntil - self.__clock(),0)
+
+    def allowRequest(self):
+        """ True if a call should be made now."""
+        with self.__lock:
+            if self.__state == circuitClosed:
+                return True
+            if self.__state == circuitOpen and self.__clock() >= self.__openUntil:
+                self.__state = circuitHalfOpen
+                log.info("Trying an API call after {:.0f} seconds of skipped calls".format(self.__openSeconds))
+                return True
+            # Only the one trial call is made while half open
+            return False
+
+    def recordSuccess(self):
+        """ Count a call which reached the API."""
+        with self.__lock:
+            if self.__state != circuitClosed:
+                log.info("API is reachable again, resuming calls")
+            self.__state = circuitClosed
+            self.__failures = 0
+            self.__openSeconds = self.__resetSeconds
+
+    def recordFailure(self):
+        """ Count a call which couldn't reach the API."""
+        with self.__lock:
+            self.__failures = self.__failures + 1
+            if self.__state == circuitHalfOpen:
+                self.__openSeconds = min(self.__openSeconds * 2,self.__maxResetSeconds)
+            elif self.__failures < self.__failureThreshold:
+                return
+            self.__state = circuitOpen
+            self.__openUntil = self.__clock() + self.__openSeconds
+            log.warning("API unreachable for {} calls in a row, skipping calls for {:.0f} seconds".format(
+                self.__failures,self.__openSeconds))
@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ScheduledJob():
+    """ A named task run by the Scheduler every intervalSeconds.
+
+    Parameters:
+    name (str): Name of the job, used in log messages.
+    task (function): Called with no arguments each time the job runs, returns the seconds after
+    which the run should be retried, or None.
+    intervalSeconds (float): Time between runs.
+    priority (int): Jobs with a higher priority run first when several are due.
+    """
+
+    def __init__(self,name,task,intervalSeconds,priority=0):
+        self.name = name
+        self.task = task
+        self.intervalSeconds = intervalSeconds
+        self.priority = priority
+        self.nextRun = None
+        self.retryAt = None
+        self.missedRuns = 0
+        self.running = False
+
+
+class Scheduler():
+    """ Runs named jobs, each at its own interval, using a monotonic clock.
+
+    Runs are kept on a fixed grid from when a job was added, so a slow run doesn't push back the
+    runs after it. Ticks missed while a job was running (or the machine was suspended) are caught
+    up with a single run straight away, instead of one run per missed tick. A job is never started
+    while its previous run is still going. A run whose task asks for a retry is run again once the
+    retry is due, without waiting in the meantime, and the job keeps its place on its grid.
+
+    Parameters:
+    clock (function): Current time in seconds, time.monotonic by default.
+    intervalFor (function): Given a job's configured interval, returns the time until its next run,
+    used to stretch intervals (see CreditBudget.intervalFor). The configured interval if None.
+    """
+
+    def __init__(self,clock=time.monotonic,intervalFor=None):
+        self.__clock = clock
+        self.__intervalFor = intervalFor
+        self.__jobs = []
+        self.__lock = threading.Lock()
+
+    def addJob(self,name,task,intervalSeconds,priority=0):
+        """ Add a job, which is due straight away.
+
+        Returns:
+        The ScheduledJob.
+        """
+        job = ScheduledJob(name,task,intervalSeconds,priority)
+        job.nextRun = self.__clock()
+        with self.__lock:
+            self.__jobs.append(job)
+        log.debug("Scheduled job '{}' every {} seconds with priority {}".format(name,intervalSeconds,priority))
+        return job
+
+    def getJobs(self):
+        return list(self.__jobs)
+
+    def runDue(self):
+        """ Run the jobs which are due, one at a time, highest priority first.
+
+        Each job runs at most once per call, so a job with a short interval can't hold up the others.
+
+        Returns:
+        The names of the jobs run, in the order they ran.
+        """
+        ran = []
+        while True:
+            job = self.__claimNextDue(ran)
+            if job is None:
+                return ran
+            retrySeconds = None
+            try:
+                retrySeconds = job.task()
+            except Exception as e:
+                log.error("Scheduled job '{}' failed, exception '{}'".format(job.name,e))
+            finally:
+                self.__reschedule(job,retrySeconds)
+            ran.append(job.name)
+
+    def secondsToNextRun(self):
+        """ Seconds until the next job is due, 0 if one is due now and None if there are no jobs."""
+        now = self.__clock()
+        with self.__lock:
+            waiting = [self.__dueTime(job) - now for job in self.__jobs if not job.running]
+        if len(waiting) == 0:
+            return None
+        return max(min(waiting),0)
+
+    def __claimNextDue(self,ran):
+        now = self.__clock()
+        with self.__lock:
+            due = [job for job in self.__jobs if not job.running and self.__dueTime(job) <= now and job.name not in ran]
+            if len(due) == 0:
+                return None
+            job = min(due,key=lambda job: (-job.priority,self.__dueTime(job)))
+            job.running = True
+        return job
+
+    def __dueTime(self,job):
+        return job.nextRun if job.retryAt is None else job.retryAt
+
+    def __reschedule(self,job,retrySeconds=None):
+        if retrySeconds is not None:
+            # The run that is retried keeps its place on the grid, the run after it is timed from there
+            with self.__lock:
+                job.retryAt = self.__clock() + retrySeconds
+                job.running = False
+            log.debug("Retrying job '{}' in {:.1f} seconds".format(job.name,retrySeconds))
+            return
+        interval = job.intervalSeconds if self.__intervalFor is None else self.__intervalFor(job.intervalSeconds)
+        now = self.__clock()
+        with self.__lock:
+            job.retryAt = None
+            nextRun = job.nextRun + interval
+            if nextRun <= now:
+                # Every tick which passed while running is caught up by one run, due now
+                passed = int((now - nextRun) // interval) + 1
+                job.missedRuns = job.missedRuns + passed - 1
+                nextRun = job.nextRun + passed * interval
+                log.warning("Job '{}' took longer than its interval, catching up {} missed runs with one run now".format(job.name,passed))
+            job.nextRun = nextRun
+            job.running = False
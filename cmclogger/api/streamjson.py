@@ -0,0 +1,111 @@
+import codecs
+import json
+
+decoder = json.JSONDecoder()
+whitespace = ' \t\n\r'
+
+
+def iterMembers(chunks,streamKey):
+    """ Decode a JSON object received in chunks, one member at a time.
+
+    Only the part of the document not yet decoded is held in memory.
+
+    Parameters:
+    chunks (iterable): bytes (UTF-8) or str pieces of the document, such as Response.iter_content().
+    streamKey (str): Name of the member holding an array which is decoded one element at a time.
+
+    Yields:
+    (key, value) for each member of the object, the array named streamKey as (streamKey, element)
+    for each of its elements as soon as the element has been received.
+
+    Raises:
+    ValueError if the document is not a valid JSON object.
+    """
+    reader = ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.decode()
+        reader.expect(':')
+        if key == streamKey and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.take()
+            else:
+                while True:
+                    yield key,reader.decode()
+                    separator = reader.take()
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise ValueError("Expected ',' or ']' in JSON array, found '{}'".format(separator))
+        else:
+            yield key,reader.decode()
+        separator = reader.take()
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError("Expected ',' or '}}' in JSON object, found '{}'".format(separator))
+
+
+class ChunkReader():
+    """ Text buffer over an iterable of chunks, read with the standard library JSON decoder."""
+
+    def __init__(self,chunks):
+        self.__chunks = iter(chunks)
+        self.__decoder = codecs.getincrementaldecoder('utf-8')()
+        self.__buffer = ''
+        self.__position = 0
+        self.__finished = False
+
+    def peek(self):
+        """ The next non whitespace character, without consuming it."""
+        while True:
+            while self.__position < len(self.__buffer) and self.__buffer[self.__position] in whitespace:
+                self.__position = self.__position + 1
+            if self.__position < len(self.__buffer):
+                return self.__buffer[self.__position]
+            if not self.__fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def take(self):
+        character = self.peek()
+        self.__position = self.__position + 1
+        return character
+
+    def expect(self,character):
+        found = self.take()
+        if found != character:
+            raise ValueError("Expected '{}' in JSON document, found '{}'".format(character,found))
+
+    def decode(self):
+        """ Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value,end = decoder.raw_decode(self.__buffer,self.__position)
+                # A number ending the buffer may continue in the next chunk
+                if end < len(self.__buffer) or self.__finished:
+                    self.__position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.__finished:
+                    raise
+            self.__fill()
+
+    def __fill(self):
+        # Append the next chunk to the undecoded part of the buffer, False once the input is exhausted
+        if self.__finished:
+            return False
+        chunk = next(self.__chunks,None)
+        if chunk is None:
+            self.__finished = True
+            text = self.__decoder.decode(b'',final=True)
+        elif isinstance(chunk,str):
+            text = chunk
+        else:
+            text = self.__decoder.decode(chunk)
+        self.__buffer = self.__buffer[self.__position:] + text
+        self.__position = 0
+        return True
@@ -2,16 +2,27 @@
 
 import sys
 import os
-import time
 import logging
 import socket
+import signal
+import threading
+import time
 import pandas as pd
 from datetime import datetime
-from dbops.sqhelper import SQHelper
 from configchecker import ConfigChecker
-from cmclogger.api.getlatest import CMCGetLatest
-from cmclogger.dataparser.publisher import Publisher
+from cmclogger.api.getlatest import CMCGetLatest, skippedCallErrorCode
+from cmclogger.api.retrypolicy import RetryPolicy, circuitClosed
+from cmclogger.api.capture import ResponseCapture, readCapture, groupCalls
+from cmclogger.api.scheduler import Scheduler
+from cmclogger.api.creditbudget import CreditBudget, expectedCredits, expectedQuoteCredits
+from cmclogger.dataparser.publisher import Publisher, StagedData
 from cmclogger.dataparser.reader import Reader
+from cmclogger.dataparser.database import Database
+from cmclogger.dataparser.layout import makeLayout, migrateToQuotesLayout
+from cmclogger.dataparser.writebehind import WriteBehindQueue, SharedStatus
+from cmclogger.dataparser.retention import Retention
+from cmclogger.dataparser.archive import ParquetArchive, ArchivedLayout, parquetAvailable
+from cmclogger.analytics.pricematrix import makePriceMatrix
 import cmclogger.settings as settings
 
 log = logging.getLogger(__name__)
@@ -63,10 +74,16 @@ class CMCLogger():
         self.__make_directories_as_needed()
         self.__setup_logging(log_level)
         self.__config = self.__load_configuration(api_key)
-        self.__status = self.__setup_status_file()
+        # The write queue's thread writes the status file while the daemon updates it
+        self.__status = SharedStatus(self.__setup_status_file())
         self.__database = self.__setup_database()
+        self.__layout = self.__setup_layout()
         self.__api = None
         self.__publisher = None
+        self.__writeQueue = None
+        self.__retention = None
+        self.__archive = None
+        self.__stopEvent = threading.Event()
 
     def start_daemon(self, force_start=False):
         """ Start the logging daemon, if it is not already running.
@@ -74,11 +91,22 @@ class CMCLogger():
         The logging daemon uses the values found in config.ini in the working directory.
         Calls are made to the CMC API at the configuration interval set with the requried parameters.
 
+        If write_queue_size is greater than zero in config.ini, results are stored by a separate
+        writer thread so slow storage doesn't delay the next API call.
+
+        If jobs are listed in the Scheduler section of config.ini, each job polls its own rank range
+        at its own interval, as set in its [Job name] section. Otherwise a single job polls the range
+        set in the CMC_API section.
+
+        If full_resolution_days or parquet_after_days is greater than zero in config.ini, old rows are
+        compacted or archived between API calls, for at most run_seconds each time.
+
         Parameters:
         force_start: Start the daemon even if it is already running. Warning, this could result in rate limiting.
 
         Return:
-        This call doesn't return
+        This call only returns once the daemon is stopped with stop_daemon() or SIGTERM, after all
+        queued results have been written.
         """
         if daemon_already_running() and not force_start:
             return
@@ -86,21 +114,174 @@ class CMCLogger():
         self.__status.set_value(settings.status_file_current_session_section_name, settings.status_file_option_successful_calls, 0)
         self.__status.set_value(settings.status_file_current_session_section_name, settings.status_file_option_failed_calls, 0)
         self.__status.set_value(settings.status_file_current_session_section_name, settings.status_file_option_success_rate, 100.0)
+        self.__status.set_value(settings.status_file_current_session_section_name, settings.status_file_option_suppressed_rows, 0)
         self.__create_API_and_publisher()
+        self.__handle_termination()
 
         self.__daemon()
 
-    def __daemon(self):
-        while True:
-            goodResponse = self.__api.getLatest()
-            self.__publisher.writeStatus(self.__api.getLatestStatus())
-            if goodResponse is True:
-                self.__publisher.writeData(self.__api.getLatestData())
-
-            log.info("Scheduling next API call in {} seconds".format(
-                self.__api.secondsToNextAPICall()))
+    def stop_daemon(self):
+        """ Stop a running daemon, start_daemon returns once any queued results are written."""
+        self.__stopEvent.set()
 
-            time.sleep(self.__api.secondsToNextAPICall())
+    def __daemon(self):
+        self.__stopEvent.clear()
+        self.__writeQueue = self.__create_write_queue()
+        scheduler = self.__create_scheduler()
+        try:
+            while not self.__stopEvent.is_set():
+                scheduler.runDue()
+                self.__run_maintenance(scheduler.secondsToNextRun())
+
+                log.info("Scheduling next API call in {:.0f} seconds".format(scheduler.secondsToNextRun()))
+
+                self.__stopEvent.wait(scheduler.secondsToNextRun())
+        finally:
+            self.__close_write_queue()
+
+    def __create_scheduler(self):
+        budget = self.__create_credit_budget()
+        scheduler = Scheduler(intervalFor=budget.intervalFor)
+        names = self.__job_names(self.__config)
+        if len(names) == 0:
+            jobs = [(settings.scheduler_default_job_name, self.__job_api(None), settings.scheduler_job_option_priority_default)]
+        else:
+            jobs = []
+            for name in names:
+                section = settings.scheduler_job_section_prefix + name
+                jobs.append((name, self.__job_api(section), self.__config.get_value(section, settings.scheduler_job_option_priority)))
+        for name, api, priority in jobs:
+            configuration = api.getConfiguration()
+            intervalSeconds = configuration['callInterval'] * 60
+            if len(api.getWatchlist()) > 0:
+                credits = expectedQuoteCredits(len(api.getWatchlist()))
+            else:
+                credits = expectedCredits(configuration['endIndex'] - configuration['startIndex'] + 1, configuration['pageSize'])
+            budget.addJob(name, intervalSeconds, credits)
+            api.setCapture(self.__api.getCapture())
+            task = lambda name=name, api=api, pageSize=configuration['pageSize']: self.__poll(name, api, budget, pageSize)
+            scheduler.addJob(name, task, intervalSeconds, priority)
+        return scheduler
+
+    def __job_api(self, section):
+        # Every job makes its requests with the same pool of keys, and stops calling while the API is unreachable.
+        # A failed call is handed back to the scheduler to retry, so other jobs keep running during the backoff
+        return CMCGetLatest(self.__config, section, self.__api.getKeyPool(), self.__api.getRetryPolicy(),
+                            self.__api.getCircuitBreaker(), deferRetries=True)
+
+    def __create_credit_budget(self):
+        return CreditBudget(self.__status,
+                            self.__config.get_value(settings.credits_section_name, settings.credits_option_daily_limit),
+                            self.__config.get_value(settings.credits_section_name, settings.credits_option_monthly_limit),
+                            self.__config.get_value(settings.credits_section_name, settings.credits_option_billing_day),
+                            self.__config.get_value(settings.credits_section_name, settings.credits_option_min_interval_scale))
+
+    def __poll(self, name, api, budget, pageSize):
+        api.setPageSize(budget.pageSize(pageSize))
+        # Entries are flattened as they are decoded, the whole response is never held at once
+        stage = StagedData()
+        goodResponse = api.getLatest(stage=stage)
+        with self.__status.lock:
+            budget.record(name, api.getLatestStatus()[settings.CMC_status_credit_count])
+            self.__record_retries(api)
+        retrySeconds = api.getRetryDelay()
+        # A call that is retried is stored once, when it succeeds or runs out of retries
+        if retrySeconds is None:
+            self.__store_latest(api, goodResponse, stage)
+        return retrySeconds
+
+    def __record_retries(self, api):
+        timings = api.getRetryTimings()
+        section = settings.status_file_retries_section_name
+        self.__status.set_value(section, settings.status_file_option_last_call_retries, len(timings))
+        self.__status.set_value(section, settings.status_file_option_last_call_retry_seconds, round(sum(timings), 1))
+        self.__status.set_value(section, settings.status_file_option_circuit_state, api.getCircuitBreaker().getState())
+        if api.getLatestStatus()[settings.CMC_status_error_code] == skippedCallErrorCode:
+            self.__status.set_value(section, settings.status_file_option_skipped_calls,
+                                    self.__status.get_value(section, settings.status_file_option_skipped_calls) + 1)
+
+    def __store_latest(self, api, goodResponse, stage):
+        data = stage if goodResponse is True else None
+        if self.__writeQueue is not None:
+            self.__writeQueue.submit(api.getLatestStatus(), data, stage.timestamp)
+            return
+        self.__publisher.writeStatus(api.getLatestStatus())
+        if data is not None:
+            self.__publisher.writeData(data)
+
+    def __run_maintenance(self, secondsToNextCall):
+        self.__create_retention_and_archive()
+        budget = min(self.__config.get_value(settings.retention_section_name, settings.retention_option_run_seconds),
+                     secondsToNextCall)
+        deadline = time.monotonic() + budget
+        self.__archive.run(budget)
+        self.__retention.run(max(deadline - time.monotonic(), 0))
+
+    def __create_retention_and_archive(self):
+        if self.__retention is None:
+            self.__retention = self.__create_retention()
+        if self.__archive is None:
+            self.__archive = self.__create_archive()
+
+    def __create_archive(self):
+        directory = os.path.join(self.__workingDirectory, settings.data_file_directory, settings.parquet_archive_directory)
+        return ParquetArchive(self.__database, self.__layout, directory,
+                              self.__config.get_value(settings.retention_section_name, settings.retention_option_parquet_after_days))
+
+    def __query_layout(self):
+        # Reads go through the Parquet archive as well as the database once anything has been archived
+        if self.__archive is None:
+            self.__archive = self.__create_archive()
+        if not parquetAvailable or len(self.__archive.getDays()) == 0:
+            return self.__layout
+        return ArchivedLayout(self.__layout, self.__archive)
+
+    def __create_retention(self):
+        archiveFile = os.path.join(self.__workingDirectory, settings.data_file_directory, settings.retention_archive_file_name)
+        return Retention(self.__database, self.__layout,
+                         self.__config.get_value(settings.retention_section_name, settings.retention_option_full_resolution_days),
+                         self.__config.get_value(settings.retention_section_name, settings.retention_option_hourly_days),
+                         self.__config.get_value(settings.retention_section_name, settings.retention_option_daily_days),
+                         self.__config.get_value(settings.retention_section_name, settings.retention_option_expired_action),
+                         archiveFile)
+
+    def __handle_termination(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.__terminate)
+
+    def __terminate(self, signum, frame):
+        log.info("Received signal {}, stopping daemon".format(signum))
+        self.stop_daemon()
+
+    def __create_write_queue(self):
+        size = self.__config.get_value(settings.database_section_name, settings.database_option_write_queue_size)
+        if size <= 0:
+            return None
+        spillFile = os.path.join(self.__workingDirectory, settings.data_file_directory, settings.write_queue_spill_file_name)
+        return WriteBehindQueue(self.__make_writer_publisher, size,
+                                self.__config.get_value(settings.database_section_name, settings.database_option_write_queue_policy),
+                                self.__config.get_value(settings.database_section_name, settings.database_option_write_queue_timeout),
+                                spillFile)
+
+    def __make_writer_publisher(self):
+        # Called from the writer thread, which needs its own database connection
+        database = self.__open_database()
+        return Publisher(self.__status, database, makeLayout(self.__layout.name, database), self.__change_only(),
+                         self.__currency())
+
+    def __change_only(self):
+        return self.__config.get_value(settings.database_section_name, settings.database_option_change_only)
+
+    def __currency(self):
+        # Entries are extracted in the currency the API wrapper checked and requested them in
+        return self.__api.getConfiguration()['conversionCurrency']
+
+    def __close_write_queue(self):
+        if self.__writeQueue is None:
+            return
+        log.info("Waiting for {} queued results to be written".format(self.__writeQueue.pending()))
+        self.__writeQueue.close(settings.write_queue_drain_timeout_seconds)
+        self.__writeQueue = None
 
     def fetch_and_store_data(self, api_key=None):
         """ Make an CMC API call and store the result in the database / status file
@@ -126,6 +307,41 @@ class CMCLogger():
             self.__publisher.writeData(self.__api.getLatestData())
         return goodResponse, self.__api.getLatestData(), self.__api.getLatestStatus()
 
+    def replay_capture(self, file_name=None, speed=0):
+        """ Parse and store captured API responses again, as if they had just been received.
+
+        Responses are captured to data/capture.jsonl.gz when capture_responses is True in config.ini.
+        Replaying them into a new working directory rebuilds the database without using API credits.
+
+        Parameters:
+        file_name (str): The capture file, defaults to the one in the working directory.
+        speed (float): How many times faster than they were captured to replay the calls, 0 replays
+        them as fast as possible.
+
+        Returns:
+        (calls, successful_calls) (tuple): The number of calls replayed, and of those which succeeded.
+        """
+        self.__create_API_and_publisher()
+        file_name = self.__capture_file() if file_name is None else file_name
+        calls = 0
+        successfulCalls = 0
+        previous = None
+        for records in groupCalls(readCapture(file_name)):
+            timestamp = records[0]['timestamp']
+            if speed > 0 and previous is not None:
+                time.sleep(max(timestamp - previous, 0) / speed)
+            previous = timestamp
+            stage = StagedData(timestamp)
+            goodResponse = self.__api.replayCall(records, stage)
+            self.__store_latest(self.__api, goodResponse, stage)
+            calls = calls + 1
+            successfulCalls = successfulCalls + (1 if goodResponse is True else 0)
+        log.info("Replayed {} captured calls from '{}', {} succeeded".format(calls, file_name, successfulCalls))
+        return calls, successfulCalls
+
+    def __capture_file(self):
+        return os.path.join(self.__workingDirectory, settings.data_file_directory, settings.capture_file_name)
+
     def write_custom_status(self, status):
         """ Enter a custom status into the results API
 
@@ -140,9 +356,11 @@ class CMCLogger():
         """ Request data from the database
 
         Parameters:
-        request (dict): {"query_type", "query_tag", "output_format", "output_detail"}
+        request (dict): {"query_type", "query_tag", "output_format", "output_detail"}, a batch request
+        has "query_tags", a list of symbols, instead of "query_tag", a screen request has "query_sort"
+        and optionally "query_ascending", "query_limit", "query_filters" and "query_as_of"
         """
-        reader = Reader(self.__status, self.__database, self.__config)
+        reader = Reader(self.__status, self.__database, self.__config, self.__query_layout())
         print(reader.processRequest(request))
 
     def get_database(self):
@@ -157,13 +375,115 @@ class CMCLogger():
         """ Get the configchecker.ConfigChecker config file object being used."""
         return self.__config
 
+    def migrate_to_quotes_layout(self, drop_tables=False):
+        """ Copy all per-symbol tables into the single quotes table and switch to the quotes layout.
+
+        The configuration file is updated so subsequent runs read and write the quotes table.
+
+        Parameters:
+        drop_tables (bool): Remove the per-symbol tables once they have been copied.
+
+        Returns:
+        The number of rows copied, or None if the migration failed.
+        """
+        migrated = migrateToQuotesLayout(self.__database, drop_tables)
+        if migrated is None:
+            return None
+        self.__config.set_value(settings.database_section_name, settings.database_option_layout,
+                                settings.database_layout_quotes)
+        self.__config.write_configuration_file()
+        self.__layout = self.__setup_layout()
+        self.__publisher = None
+        self.__retention = None
+        self.__archive = None
+        return migrated
+
+    def apply_retention(self):
+        """ Archive, compact and expire old rows as set in the Retention section of config.ini.
+
+        The daemon does this between API calls, this is for use with fetch_and_store_data.
+
+        Returns:
+        The number of days archived plus the number of retention steps completed.
+        """
+        self.__create_retention_and_archive()
+        return self.__archive.run(float('inf')) + self.__retention.run(float('inf'))
+
+    def get_history(self, symbol, start=None, end=None):
+        """ Get the stored entries of a symbol, from the database and the Parquet archive.
+
+        Parameters:
+        symbol (str): The cryptocurrency symbol.
+        start (int): Unix time of the first entry, defaults to the oldest entry.
+        end (int): Unix time after the last entry, defaults to the newest entry.
+
+        Returns:
+        A pandas.DataFrame ordered by timestamp, None if nothing is stored for the symbol.
+        """
+        layout = self.__query_layout()
+        if layout is self.__layout:
+            frame = self.__layout.rangeToDataFrame(0 if start is None else start, float('inf') if end is None else end, symbol)
+            return frame if len(frame) > 0 else None
+        return layout.symbolToDataFrame(symbol, start, end)
+
+    def get_range(self, symbols=None, start=None, end=None, columns=None, interval=0, as_arrays=False):
+        """ Get the stored rows of one or more symbols between two times, read in one query per batch of symbols.
+
+        Rows in the Parquet archive are included.
+
+        Parameters:
+        symbols (list): Cryptocurrency symbols (or a single symbol), None for every symbol.
+        start (int): Unix time of the first row, defaults to the oldest row.
+        end (int): Unix time after the last row, defaults to after the newest row.
+        columns (list): Stored columns to return, every column if None.
+        interval (int): Resample to the last row of each symbol in each interval of this many seconds, 0 keeps every row.
+        as_arrays (bool): Return a dictionary of NumPy arrays keyed by column instead of a DataFrame.
+
+        Returns:
+        A pandas.DataFrame ordered by symbol then timestamp, with the symbol and timestamp columns first.
+        """
+        reader = Reader(self.__status, self.__database, self.__config, self.__query_layout())
+        return reader.getRange(symbols, start, end, columns, interval, as_arrays)
+
+    def get_price_matrix(self, symbols=None, start=None, end=None, interval=0, column=settings.CMC_data_quote_price):
+        """ Get the prices of several symbols aligned on shared timestamps, for vectorised cross-asset analytics.
+
+        Parameters:
+        symbols (list): Cryptocurrency symbols, None for every symbol.
+        start (int): Unix time of the first row, defaults to the oldest row.
+        end (int): Unix time after the last row, defaults to the newest row.
+        interval (int): Align the rows to intervals of this many seconds, 0 aligns on the stored timestamps.
+        column (str): The stored column used as the price.
+
+        Returns:
+        A cmclogger.analytics.pricematrix.PriceMatrix.
+        """
+        return makePriceMatrix(self.get_range(symbols, start, end, [column], interval), column, interval)
+
+    def screen(self, sort_column, descending=True, limit=settings.screen_default_limit, filters=(), as_of=None):
+        """ Sort and filter the newest row of every coin by any stored column.
+
+        Parameters:
+        sort_column (str): The stored column to sort by, such as percent_change_24h.
+        descending (bool): Sort from the highest value.
+        limit (int): Most rows to return, 0 for all of them.
+        filters (list): Filters such as 'market_cap>1e9' or ('cmc_rank', '<=', 100), all must match.
+        as_of (int): Screen the rows stored at or before this unix time, the newest rows if None.
+
+        Returns:
+        A pandas.DataFrame of the rows in order, None if the sort column or a filter isn't valid.
+        """
+        reader = Reader(self.__status, self.__database, self.__config, self.__query_layout())
+        return reader.screen(sort_column, descending, limit, filters, as_of)
+
     def to_excel(self):
-        tables = self.__database.get_table_names()
+        layout = self.__query_layout()
+        tables = layout.getSymbols()
         if len(tables) == 0:
             return False
         df_list = []
         for table in tables:
-            df_list.append(self.__database.table_to_df(table))
+            df_list.append(layout.symbolToDataFrame(table))
         writer = pd.ExcelWriter(r"cryptoData.xlsx")
         _ = [A.to_excel(writer,sheet_name="{0}".format(tables[i])) for i, A in enumerate(df_list)]
         writer.save()
@@ -171,9 +491,13 @@ class CMCLogger():
 
     def __create_API_and_publisher(self):
         if self.__api is None:
-            self.__api = CMCGetLatest(self.__config)
+            # Retry waits end early when the daemon is stopped
+            self.__api = CMCGetLatest(self.__config, retryPolicy=RetryPolicy(wait=self.__stopEvent.wait))
+            if self.__config.get_value(settings.general_section_name, settings.general_option_capture_responses) is True:
+                self.__api.setCapture(ResponseCapture(self.__capture_file()))
         if self.__publisher is None:
-            self.__publisher = Publisher(self.__status, self.__database)
+            self.__publisher = Publisher(self.__status, self.__database, self.__layout, self.__change_only(),
+                                         self.__currency())
 
     def __setup_logging(self, logLevel):
         loggingFile = os.path.join(self.__workingDirectory, settings.log_file_directory, settings.log_file_name)
@@ -215,12 +539,67 @@ class CMCLogger():
                                settings.API_option_end_index_default)
         config.set_expectation(settings.API_section_name, settings.API_option_interval, int,
                                settings.API_option_interval_default)
+        config.set_expectation(settings.API_section_name, settings.API_option_page_size, int,
+                               settings.API_option_page_size_default)
+        config.set_expectation(settings.API_section_name, settings.API_option_fetch_workers, int,
+                               settings.API_option_fetch_workers_default)
+        config.set_expectation(settings.API_section_name, settings.API_option_extra_keys, str,
+                               settings.API_option_extra_keys_default)
+        config.set_expectation(settings.API_section_name, settings.API_option_key_requests_per_minute, int,
+                               settings.API_option_key_requests_per_minute_default)
+        config.set_expectation(settings.API_section_name, settings.API_option_watchlist, str,
+                               settings.API_option_watchlist_default)
         config.set_expectation(settings.general_section_name, settings.general_option_status_file_format, str,
                                settings.general_option_status_file_format_default)
+        config.set_expectation(settings.general_section_name, settings.general_option_capture_responses, bool,
+                               settings.general_option_capture_responses_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_layout, str,
+                               settings.database_option_layout_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_write_queue_size, int,
+                               settings.database_option_write_queue_size_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_write_queue_policy, str,
+                               settings.database_option_write_queue_policy_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_write_queue_timeout, int,
+                               settings.database_option_write_queue_timeout_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_change_only, bool,
+                               settings.database_option_change_only_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_journal_mode, str,
+                               settings.database_option_journal_mode_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_synchronous, str,
+                               settings.database_option_synchronous_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_cache_size_kb, int,
+                               settings.database_option_cache_size_kb_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_mmap_size_mb, int,
+                               settings.database_option_mmap_size_mb_default)
+        config.set_expectation(settings.database_section_name, settings.database_option_busy_timeout_ms, int,
+                               settings.database_option_busy_timeout_ms_default)
+        config.set_expectation(settings.retention_section_name, settings.retention_option_full_resolution_days, int,
+                               settings.retention_option_full_resolution_days_default)
+        config.set_expectation(settings.retention_section_name, settings.retention_option_hourly_days, int,
+                               settings.retention_option_hourly_days_default)
+        config.set_expectation(settings.retention_section_name, settings.retention_option_daily_days, int,
+                               settings.retention_option_daily_days_default)
+        config.set_expectation(settings.retention_section_name, settings.retention_option_expired_action, str,
+                               settings.retention_option_expired_action_default)
+        config.set_expectation(settings.retention_section_name, settings.retention_option_run_seconds, int,
+                               settings.retention_option_run_seconds_default)
+        config.set_expectation(settings.retention_section_name, settings.retention_option_parquet_after_days, int,
+                               settings.retention_option_parquet_after_days_default)
+        config.set_expectation(settings.scheduler_section_name, settings.scheduler_option_jobs, str,
+                               settings.scheduler_option_jobs_default)
+        config.set_expectation(settings.credits_section_name, settings.credits_option_daily_limit, int,
+                               settings.credits_option_daily_limit_default)
+        config.set_expectation(settings.credits_section_name, settings.credits_option_monthly_limit, int,
+                               settings.credits_option_monthly_limit_default)
+        config.set_expectation(settings.credits_section_name, settings.credits_option_billing_day, int,
+                               settings.credits_option_billing_day_default)
+        config.set_expectation(settings.credits_section_name, settings.credits_option_min_interval_scale, float,
+                               settings.credits_option_min_interval_scale_default)
 
 
         fileLocation = os.path.join(self.__workingDirectory, settings.input_configuation_filename)
         config.set_configuration_file(fileLocation)
+        self.__set_job_expectations(config, fileLocation)
 
         if apiKey is not None:
             config.set_value(settings.API_section_name, settings.API_option_private_key, apiKey)
@@ -230,6 +609,38 @@ class CMCLogger():
             raise
         return config
 
+    def __set_job_expectations(self, config, fileLocation):
+        # Job sections are only known once the list of jobs has been read, their defaults are the CMC_API values
+        names = self.__job_names(config)
+        for name in names:
+            section = settings.scheduler_job_section_prefix + name
+            for option, dataType in [(settings.API_option_start_index, int), (settings.API_option_end_index, int),
+                                     (settings.API_option_interval, int), (settings.API_option_conversion_currency, str),
+                                     (settings.API_option_watchlist, str)]:
+                config.set_expectation(section, option, dataType, config.get_value(settings.API_section_name, option))
+            config.set_expectation(section, settings.scheduler_job_option_priority, int,
+                                   settings.scheduler_job_option_priority_default)
+        if len(names) > 0:
+            config.set_configuration_file(fileLocation)
+        self.__check_job_currencies(config, names)
+
+    def __check_job_currencies(self, config, names):
+        # Rows of every job go into the same tables, which don't record the currency they are priced in
+        currency = config.get_value(settings.API_section_name, settings.API_option_conversion_currency)
+        for name in names:
+            section = settings.scheduler_job_section_prefix + name
+            if config.get_value(section, settings.API_option_conversion_currency) != currency:
+                log.warning("Job '{}' conversion currency '{}' differs from the {} currency, using '{}'".format(
+                    name, config.get_value(section, settings.API_option_conversion_currency), settings.API_section_name, currency))
+                config.set_value(section, settings.API_option_conversion_currency, currency)
+
+    def __job_names(self, config):
+        names = []
+        for name in config.get_value(settings.scheduler_section_name, settings.scheduler_option_jobs).split(','):
+            if name.strip() != '' and name.strip() not in names:
+                names.append(name.strip())
+        return names
+
     def __setup_status_file(self):
         status = ConfigChecker()
         status.set_expectation(settings.status_file_last_call_section_name,settings.status_file_option_timeStamp, str, datetime.now().isoformat())
@@ -246,9 +657,19 @@ class CMCLogger():
         status.set_expectation(settings.status_file_current_session_section_name, settings.status_file_option_successful_calls, int, 0)
         status.set_expectation(settings.status_file_current_session_section_name, settings.status_file_option_failed_calls, int, 0)
         status.set_expectation(settings.status_file_current_session_section_name, settings.status_file_option_success_rate, float,100.0)
+        status.set_expectation(settings.status_file_current_session_section_name, settings.status_file_option_suppressed_rows, int, 0)
         status.set_expectation(settings.status_file_all_time_section_name, settings.status_file_option_successful_calls, int, 0)
         status.set_expectation(settings.status_file_all_time_section_name, settings.status_file_option_failed_calls, int, 0)
         status.set_expectation(settings.status_file_all_time_section_name, settings.status_file_option_success_rate, float, 100.0)
+        status.set_expectation(settings.status_file_all_time_section_name, settings.status_file_option_suppressed_rows, int, 0)
+        status.set_expectation(settings.status_file_credit_usage_section_name, settings.status_file_option_credits_day, str, '')
+        status.set_expectation(settings.status_file_credit_usage_section_name, settings.status_file_option_credits_today, int, 0)
+        status.set_expectation(settings.status_file_credit_usage_section_name, settings.status_file_option_credits_period, str, '')
+        status.set_expectation(settings.status_file_credit_usage_section_name, settings.status_file_option_credits_this_period, int, 0)
+        status.set_expectation(settings.status_file_retries_section_name, settings.status_file_option_last_call_retries, int, 0)
+        status.set_expectation(settings.status_file_retries_section_name, settings.status_file_option_last_call_retry_seconds, float, 0.0)
+        status.set_expectation(settings.status_file_retries_section_name, settings.status_file_option_skipped_calls, int, 0)
+        status.set_expectation(settings.status_file_retries_section_name, settings.status_file_option_circuit_state, str, circuitClosed)
 
         fileLocation = os.path.join(self.__workingDirectory, settings.status_file_directory, settings.status_file_name)
         status.set_configuration_file(fileLocation)
@@ -258,9 +679,21 @@ class CMCLogger():
         return status
 
     def __setup_database(self):
-        fileLocation = os.path.join(self.__workingDirectory, settings.data_file_directory, settings.database_file_name)
-        database = SQHelper(fileLocation)
+        database = self.__open_database()
         if not database.exists():
             log.critical("Failed to create required database file, exiting")
             raise
         return database
+
+    def __open_database(self):
+        fileLocation = os.path.join(self.__workingDirectory, settings.data_file_directory, settings.database_file_name)
+        return Database(fileLocation,
+                        self.__config.get_value(settings.database_section_name, settings.database_option_journal_mode),
+                        self.__config.get_value(settings.database_section_name, settings.database_option_synchronous),
+                        self.__config.get_value(settings.database_section_name, settings.database_option_cache_size_kb),
+                        self.__config.get_value(settings.database_section_name, settings.database_option_mmap_size_mb),
+                        self.__config.get_value(settings.database_section_name, settings.database_option_busy_timeout_ms))
+
+    def __setup_layout(self):
+        return makeLayout(self.__config.get_value(settings.database_section_name, settings.database_option_layout),
+                          self.__database)
@@ -0,0 +1,285 @@
+import cmclogger.settings as settings
+import logging
+import time
+import os
+import pandas as pd
+from cmclogger.dataparser.layout import makeRangeColumns, resampleFrame
+from datetime import datetime, timezone
+
+try:
+    import pyarrow
+    parquetAvailable = True
+except ImportError:
+    parquetAvailable = False
+
+log = logging.getLogger(__name__)
+
+secondsPerDay = 86400
+datePartition = 'date='
+symbolPartition = 'symbol='
+
+
+def dayToDate(day):
+    return datetime.fromtimestamp(day,timezone.utc).strftime('%Y-%m-%d')
+
+
+def dateToDay(date):
+    return int(datetime.strptime(date,'%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+class ParquetArchive():
+    """ Moves closed days of rows out of the database into compressed Parquet files.
+
+    Files are partitioned by UTC date and symbol:
+    directory/date=2020-03-25/symbol=BTC/data.parquet
+
+    A day is archived once it is older than afterDays (0 disables archiving). The files
+    are written before the rows are removed from the database, rows written to an archived
+    day later on are merged into the existing file.
+
+    Needs pyarrow, archiving is disabled with a warning when it isn't installed.
+    """
+
+    def __init__(self,database,layout,directory,afterDays):
+        if afterDays > 0 and not parquetAvailable:
+            log.warning("Parquet archiving needs pyarrow, which is not installed. Rows will not be archived")
+            afterDays = 0
+        self.__database = database
+        self.__layout = layout
+        self.__directory = directory
+        self.__afterDays = afterDays
+
+    def enabled(self):
+        return self.__afterDays > 0
+
+    def run(self,budgetSeconds,now=None):
+        """ Archive closed days until there are none left or budgetSeconds has passed.
+
+        The time is checked after each symbol, a day left part way through is finished on a
+        later run.
+
+        Returns:
+        The number of days archived.
+        """
+        if not self.enabled():
+            return 0
+        deadline = time.monotonic() + budgetSeconds
+        days = 0
+        while self.step(now,deadline):
+            days = days + 1
+            if time.monotonic() >= deadline:
+                break
+        return days
+
+    def step(self,now=None,deadline=None):
+        """ Archive the oldest closed day still in the database.
+
+        Parameters:
+        deadline (float): time.monotonic() after which no more symbols of the day are archived.
+
+        Returns:
+        True if the day was archived, False if there is nothing to archive, the deadline passed
+        first or archiving failed.
+        """
+        now = int(time.time()) if now is None else now
+        cutoff = now - self.__afterDays * secondsPerDay
+        cutoff = cutoff - cutoff % secondsPerDay
+        try:
+            self.__layout.prepare([])
+            oldest = self.__layout.getOldestTimestamp()
+        except Exception as e:
+            log.error("Cannot find rows to archive, exception '{}'".format(e))
+            return False
+        if oldest is None or oldest >= cutoff:
+            return False
+        return self.archiveDay(oldest - oldest % secondsPerDay,deadline)
+
+    def archiveDay(self,day,deadline=None):
+        """ Write the rows of one UTC day to Parquet files and remove them from the database.
+
+        Symbols are archived one at a time, each in its own transaction.
+
+        Parameters:
+        day (int): Unix time of the start of the day.
+        deadline (float): time.monotonic() after which the rest of the symbols are left for later.
+
+        Returns:
+        True if every symbol of the day was archived.
+        """
+        try:
+            symbols = self.__layout.getSymbolsBetween(day,day + secondsPerDay)
+        except Exception as e:
+            log.error("Failed to find symbols to archive for {}, exception '{}'".format(dayToDate(day),e))
+            return False
+        deleted = 0
+        for position,symbol in enumerate(symbols):
+            rows = self.__archiveSymbol(day,symbol)
+            if rows is None:
+                return False
+            deleted = deleted + rows
+            if deadline is not None and time.monotonic() >= deadline and position < len(symbols) - 1:
+                log.info("Archived {} of {} symbols for {}, continuing on the next run".format(position + 1,len(symbols),dayToDate(day)))
+                return False
+        log.info("Archived {} rows for {}".format(deleted,dayToDate(day)))
+        return True
+
+    def __archiveSymbol(self,day,symbol):
+        # Returns the number of rows moved, None if they couldn't be
+        try:
+            self.__writePartition(day,symbol,self.__layout.rangeToDataFrame(day,day + secondsPerDay,symbol))
+        except Exception as e:
+            log.error("Failed to archive {} for {}, exception '{}'".format(symbol,dayToDate(day),e))
+            return None
+        connection = self.__database.con
+        cursor = connection.cursor()
+        try:
+            if not connection.in_transaction:
+                cursor.execute("BEGIN")
+            deleted = self.__layout.deleteSamplesBetween(cursor,day,day + secondsPerDay,symbol)
+            connection.commit()
+        except Exception as e:
+            # The file is complete, the rows are merged into it again on the next attempt
+            log.error("Failed to remove archived rows of {} for {}, exception '{}'".format(symbol,dayToDate(day),e))
+            connection.rollback()
+            return None
+        return deleted
+
+    def __partitionFile(self,day,symbol):
+        return os.path.join(self.__directory,datePartition + dayToDate(day),symbolPartition + symbol,
+                            settings.parquet_archive_file_name)
+
+    def __writePartition(self,day,symbol,rows):
+        fileName = self.__partitionFile(day,symbol)
+        os.makedirs(os.path.dirname(fileName),exist_ok=True)
+        if os.path.exists(fileName):
+            rows = pd.concat([pd.read_parquet(fileName),rows],ignore_index=True)
+            rows = rows.drop_duplicates([settings.CMC_data_id,'timestamp'],keep='last').sort_values('timestamp')
+        temporaryFile = fileName + '.tmp'
+        rows.to_parquet(temporaryFile,index=False,compression=settings.parquet_archive_compression)
+        os.replace(temporaryFile,fileName)
+
+    def getDays(self):
+        """ The start of each archived day, oldest first."""
+        if not os.path.isdir(self.__directory):
+            return []
+        return sorted(dateToDay(name[len(datePartition):]) for name in os.listdir(self.__directory)
+                      if name.startswith(datePartition))
+
+    def getSymbols(self):
+        symbols = set()
+        for day in self.getDays():
+            directory = os.path.join(self.__directory,datePartition + dayToDate(day))
+            symbols.update(name[len(symbolPartition):] for name in os.listdir(directory) if name.startswith(symbolPartition))
+        return sorted(symbols)
+
+    def symbolToDataFrame(self,symbol,start=None,end=None):
+        """ Archived rows of a symbol with start <= timestamp < end, ordered by timestamp."""
+        frames = []
+        for day in self.getDays():
+            if (start is not None and day + secondsPerDay <= start) or (end is not None and day >= end):
+                continue
+            fileName = self.__partitionFile(day,symbol)
+            if os.path.exists(fileName):
+                frames.append(pd.read_parquet(fileName))
+        if len(frames) == 0:
+            return None
+        frame = pd.concat(frames,ignore_index=True)
+        if start is not None:
+            frame = frame[frame['timestamp'] >= start]
+        if end is not None:
+            frame = frame[frame['timestamp'] < end]
+        return frame.sort_values('timestamp').reset_index(drop=True)
+
+    def getEntryAsOf(self,symbol,timestamp):
+        for day in reversed(self.getDays()):
+            if day > timestamp:
+                continue
+            fileName = self.__partitionFile(day,symbol)
+            if not os.path.exists(fileName):
+                continue
+            frame = pd.read_parquet(fileName)
+            frame = frame[frame['timestamp'] <= timestamp]
+            if len(frame) > 0:
+                return self.__rowToEntry(frame.sort_values('timestamp').iloc[-1])
+        return None
+
+    def __rowToEntry(self,row):
+        entry = dict()
+        for key,value in row.to_dict().items():
+            if pd.isna(value):
+                value = None
+            entry[key] = value.item() if hasattr(value,'item') else value
+        return entry
+
+
+class ArchivedLayout():
+    """ Reads a storage layout and its Parquet archive as if they were one.
+
+    Everything other than the read methods below is passed to the wrapped layout.
+    """
+
+    def __init__(self,layout,archive):
+        self.__layout = layout
+        self.__archive = archive
+
+    def __getattr__(self,name):
+        return getattr(self.__layout,name)
+
+    def getSymbols(self):
+        return sorted(set(self.__layout.getSymbols()) | set(self.__archive.getSymbols()))
+
+    def getLastEntry(self,symbol):
+        entry = self.__layout.getLastEntry(symbol)
+        if entry:
+            return entry
+        return self.__archive.getEntryAsOf(symbol,float('inf'))
+
+    def getEntryAsOf(self,symbol,timestamp):
+        entry = self.__layout.getEntryAsOf(symbol,timestamp)
+        if entry:
+            return entry
+        return self.__archive.getEntryAsOf(symbol,timestamp)
+
+    def getLastEntries(self,symbols,timestamp=None):
+        entries = self.__layout.getLastEntries(symbols,timestamp)
+        for symbol in symbols:
+            if symbol not in entries:
+                entry = self.__archive.getEntryAsOf(symbol,float('inf') if timestamp is None else timestamp)
+                if entry:
+                    entries[symbol] = entry
+        return entries
+
+    def queryRange(self,symbols,start,end,columns=None,interval=0):
+        frame = self.__layout.queryRange(symbols,start,end,columns,interval)
+        archivedSymbols = self.__archive.getSymbols()
+        if symbols is not None:
+            archivedSymbols = sorted(set(symbols) & set(archivedSymbols))
+        columns = makeRangeColumns(columns)
+        archived = dict()
+        for symbol in archivedSymbols:
+            rows = self.__archive.symbolToDataFrame(symbol,start,end)
+            if rows is not None and len(rows) > 0:
+                archived[symbol] = resampleFrame(rows[columns],interval)
+        if len(archived) == 0:
+            return frame
+        # Archived rows are older than those in the database, an interval split between them keeps the newer row
+        stored = dict(tuple(frame.groupby(settings.CMC_data_symbol,sort=False)))
+        frames = []
+        for symbol in sorted(set(archived) | set(stored)):
+            parts = [part for part in [archived.get(symbol),stored.get(symbol)] if part is not None]
+            frames.append(pd.concat(parts,ignore_index=True).drop_duplicates('timestamp',keep='last'))
+        return pd.concat(frames,ignore_index=True)
+
+    def symbolToDataFrame(self,symbol,start=None,end=None):
+        frames = []
+        archived = self.__archive.symbolToDataFrame(symbol,start,end)
+        if archived is not None:
+            frames.append(archived)
+        frames.append(self.__layout.rangeToDataFrame(0 if start is None else start,
+                                                     float('inf') if end is None else end,symbol))
+        frames = [frame for frame in frames if len(frame) > 0]
+        if len(frames) == 0:
+            return None
+        # Rows are removed from the database after their file is written, both hold them after a failed removal
+        frame = pd.concat(frames,ignore_index=True).drop_duplicates([settings.CMC_data_id,'timestamp'])
+        return frame.sort_values('timestamp').reset_index(drop=True)
@@ -0,0 +1,66 @@
+import cmclogger.settings as settings
+import logging
+import sqlite3
+from dbops.sqhelper import SQHelper
+
+log = logging.getLogger(__name__)
+
+
+class Database(SQHelper):
+    """ SQHelper which tunes its connection with pragmas, each time it connects.
+
+    In WAL journal mode readers (CLI queries) and the writer (daemon) no longer block each other.
+
+    Parameters:
+    fileName (str): Path to the sqlite3 database file.
+    journalMode (str): One of settings.database_journal_modes.
+    synchronous (str): One of settings.database_synchronous_modes, normal is safe in WAL mode.
+    cacheSizeKb (int): Page cache size of the connection.
+    mmapSizeMb (int): Size of the database memory mapped for reads, 0 disables.
+    busyTimeoutMs (int): Time to wait for a lock held by another connection.
+    """
+
+    def __init__(self,fileName,
+                 journalMode=settings.database_option_journal_mode_default,
+                 synchronous=settings.database_option_synchronous_default,
+                 cacheSizeKb=settings.database_option_cache_size_kb_default,
+                 mmapSizeMb=settings.database_option_mmap_size_mb_default,
+                 busyTimeoutMs=settings.database_option_busy_timeout_ms_default):
+        journalMode = str(journalMode).lower()
+        if journalMode not in settings.database_journal_modes:
+            log.warning("Journal mode '{}' not valid, using default of {}".format(
+                journalMode,settings.database_option_journal_mode_default))
+            journalMode = settings.database_option_journal_mode_default
+        synchronous = str(synchronous).lower()
+        if synchronous not in settings.database_synchronous_modes:
+            log.warning("Synchronous mode '{}' not valid, using default of {}".format(
+                synchronous,settings.database_option_synchronous_default))
+            synchronous = settings.database_option_synchronous_default
+        self.__journalMode = journalMode
+        self.__pragmas = [
+                "PRAGMA busy_timeout = {}".format(max(int(busyTimeoutMs),0)),
+                "PRAGMA synchronous = {}".format(synchronous),
+                "PRAGMA cache_size = {}".format(-max(int(cacheSizeKb),0)),
+                "PRAGMA mmap_size = {}".format(max(int(mmapSizeMb),0) * 1024 * 1024)]
+        SQHelper.__init__(self,fileName)
+
+    def create_database(self):
+        if SQHelper.create_database(self) is False:
+            return False
+        self.__applyPragmas()
+        return True
+
+    def getJournalMode(self):
+        return self.con.execute("PRAGMA journal_mode").fetchone()[0]
+
+    def __applyPragmas(self):
+        try:
+            # Set first, the database is locked (and busy_timeout applies) while changing journal mode
+            self.con.execute(self.__pragmas[0])
+            journalMode = self.con.execute("PRAGMA journal_mode = {}".format(self.__journalMode)).fetchone()[0]
+            if journalMode != self.__journalMode:
+                log.warning("Database journal mode is '{}', could not change it to '{}'".format(journalMode,self.__journalMode))
+            for pragma in self.__pragmas[1:]:
+                self.con.execute(pragma)
+        except sqlite3.Error as e:
+            log.error("Failed to set database pragmas, exception '{}'".format(e))
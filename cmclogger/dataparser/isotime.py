@@ -0,0 +1,43 @@
+import cmclogger.settings as settings
+import calendar
+import datetime
+from functools import lru_cache
+from dateutil import parser, tz
+
+# Coin Market Cap timestamps always have the form 2020-03-25T19:28:25.000Z
+cmcTimestampLength = 24
+
+
+def isCMCTimestamp(iso8601):
+    return len(iso8601) == cmcTimestampLength and iso8601[10] == 'T' and iso8601[19] == '.' and iso8601[23] == 'Z'
+
+
+@lru_cache(maxsize=settings.iso_time_cache_size)
+def isoToUnixTime(iso8601):
+    """ Convert an ISO 8601 timestamp to a unix timestamp (seconds, UTC).
+
+    Timestamps in the fixed Coin Market Cap format are sliced directly, anything else is
+    handed to dateutil. Timestamps without a timezone are taken as UTC. Results are cached,
+    as date_added (and often last_updated) repeat on every call.
+    """
+    if isCMCTimestamp(iso8601):
+        return calendar.timegm((int(iso8601[0:4]),int(iso8601[5:7]),int(iso8601[8:10]),
+                                int(iso8601[11:13]),int(iso8601[14:16]),int(iso8601[17:19])))
+    parsed = parser.parse(iso8601)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp())
+
+
+def isoToLocalTime(iso8601):
+    """ Convert an ISO 8601 timestamp to a string in the local timezone.
+
+    Timestamps without a timezone are taken as local time.
+    """
+    if isCMCTimestamp(iso8601):
+        parsed = datetime.datetime(int(iso8601[0:4]),int(iso8601[5:7]),int(iso8601[8:10]),
+                                   int(iso8601[11:13]),int(iso8601[14:16]),int(iso8601[17:19]),
+                                   int(iso8601[20:23]) * 1000,tzinfo=tz.tzutc())
+    else:
+        parsed = parser.parse(iso8601)
+    return str(parsed.astimezone(tz.tzlocal()))
@@ -0,0 +1,111 @@
+import cmclogger.settings as settings
+from cmclogger.dataparser.layout import makeColumnDefinition, makeDataBaseTableColumns, fetchEntry, fetchEntries, batches
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class LatestTable():
+    """ The newest row of every coin, kept in one table keyed by coin id.
+
+    The publisher upserts each batch of rows in the same transaction as the history insert, so
+    current price queries read one row per coin however much history is stored. A row is only
+    replaced by a newer one, rows written out of order (a replayed capture) don't go back in time.
+    """
+
+    def __init__(self,database):
+        self.__database = database
+        self.__tableReady = False
+        self.__tableFound = False
+
+    def columns(self):
+        return sorted(makeDataBaseTableColumns().keys())
+
+    def reset(self):
+        self.__tableReady = False
+        self.__tableFound = False
+
+    def exists(self):
+        try:
+            return self.__database.con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                               (settings.database_latest_table_name,)).fetchone() is not None
+        except Exception as e:
+            log.error("Cannot check for the {} table. Exception: {}".format(settings.database_latest_table_name,e))
+            return False
+
+    def createTable(self,cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS {}({}, PRIMARY KEY ({})) WITHOUT ROWID".format(
+            settings.database_latest_table_name,makeColumnDefinition(),settings.CMC_data_id))
+        for column in [settings.CMC_data_symbol] + settings.database_latest_indexed_columns:
+            cursor.execute("CREATE INDEX IF NOT EXISTS {0}_{1} ON {0}({1})".format(settings.database_latest_table_name,column))
+
+    def prepare(self,layout):
+        """ Create the table if needed, filling it from the history of layout when it is new."""
+        if self.__tableReady:
+            return
+        created = not self.exists()
+        cursor = self.__database.con.cursor()
+        self.createTable(cursor)
+        if created:
+            entries = layout.getLastEntries(layout.getSymbols())
+            columns = self.columns()
+            self.upsert(cursor,[tuple(entry.get(column) for column in columns) for entry in entries.values()])
+            log.info("Created the {} table from the newest rows of {} symbols".format(settings.database_latest_table_name,len(entries)))
+        self.__database.con.commit()
+        self.__tableReady = True
+
+    def upsertStatement(self):
+        # INSERT OR REPLACE rather than ON CONFLICT DO UPDATE, which needs SQLite 3.24
+        columns = self.columns()
+        return ("INSERT OR REPLACE INTO {0}({1}) SELECT {2} "
+                "WHERE NOT EXISTS (SELECT 1 FROM {0} WHERE {3} = ? AND timestamp > ?)").format(
+            settings.database_latest_table_name,",".join(columns),",".join(["?"] * len(columns)),settings.CMC_data_id)
+
+    def upsert(self,cursor,rows):
+        """ Store rows ordered as columns(), inside the caller's transaction."""
+        columns = self.columns()
+        idIndex = columns.index(settings.CMC_data_id)
+        timestampIndex = columns.index('timestamp')
+        cursor.executemany(self.upsertStatement(),[tuple(row) + (row[idIndex],row[timestampIndex]) for row in rows])
+
+    def recoverMissingTable(self,cursor):
+        log.warning("Table '{}' missing from database, recreating it".format(settings.database_latest_table_name))
+        self.createTable(cursor)
+
+    def getLastEntry(self,symbol):
+        if not self.__hasTable():
+            return None
+        return fetchEntry(self.__database,"SELECT * FROM {} WHERE {} = ? ORDER BY timestamp DESC LIMIT 1".format(
+            settings.database_latest_table_name,settings.CMC_data_symbol),(symbol,))
+
+    def getLastEntries(self,symbols):
+        """ The newest entry of each symbol.
+
+        Returns:
+        A dictionary of entries keyed by symbol, symbols without an entry are left out.
+        """
+        entries = dict()
+        if not self.__hasTable():
+            return entries
+        for batch in batches(list(dict.fromkeys(symbols))):
+            # Oldest first, so the newest coin holding a symbol is kept
+            for entry in fetchEntries(self.__database,"SELECT * FROM {} WHERE {} IN ({}) ORDER BY timestamp".format(
+                    settings.database_latest_table_name,settings.CMC_data_symbol,",".join(["?"] * len(batch))),tuple(batch)):
+                entries[entry[settings.CMC_data_symbol]] = entry
+        return entries
+
+    def getLastUpdated(self):
+        """ The last_updated time of every coin, keyed by coin id."""
+        try:
+            cursor = self.__database.con.execute("SELECT {},{} FROM {}".format(
+                settings.CMC_data_id,settings.CMC_data_last_updated,settings.database_latest_table_name))
+        except Exception as e:
+            log.error("Cannot read last updated times from {} table. Exception: {}".format(settings.database_latest_table_name,e))
+            return dict()
+        return dict(cursor.fetchall())
+
+    def __hasTable(self):
+        # Databases written before the table was maintained don't have it until the logger next writes
+        if not self.__tableFound:
+            self.__tableFound = self.exists()
+        return self.__tableFound
@@ -0,0 +1,537 @@
+import cmclogger.settings as settings
+from cmclogger.dataparser.schema import makeStoredColumns
+import logging
+import pandas as pd
+
+allowedLayouts = [settings.database_layout_symbol, settings.database_layout_quotes]
+log = logging.getLogger(__name__)
+
+rangeBucketColumn = 'bucket'
+rangeLastColumn = 'last_timestamp'
+reservedTableNames = set(table.lower() for table in settings.database_reserved_tables)
+
+
+def makeLayout(name,database):
+    if name == settings.database_layout_quotes:
+        return QuotesTableLayout(database)
+    if name != settings.database_layout_symbol:
+        log.warning("Storage layout '{}' not valid, using default of {}".format(name,settings.database_option_layout_default))
+    return SymbolTableLayout(database)
+
+
+def isReservedTable(name):
+    """ True if name is a table which isn't a symbol. SQLite table names ignore case, so LATEST is latest."""
+    return name.lower() in reservedTableNames or name.lower().startswith('sqlite_')
+
+
+def makeDataBaseTableColumns():
+    columns = dict()
+    columns['timestamp'] = 'INTEGER'
+    columns.update(makeStoredColumns())
+    return columns
+
+
+def makeSampleColumns():
+    # Columns read by the retention engine when compacting rows into buckets
+    return [settings.CMC_data_id, settings.CMC_data_symbol, 'timestamp', settings.CMC_data_quote_price,
+            settings.CMC_data_quote_volume_24h, settings.CMC_data_quote_market_cap]
+
+
+def makeColumnDefinition():
+    columns = makeDataBaseTableColumns()
+    return ",".join("{} {}".format(name,columns[name]) for name in sorted(columns))
+
+
+def fetchEntry(database,statement,parameters=()):
+    """ Run a query and return its first row as a dictionary keyed by column name.
+
+    Returns:
+    The row as a dictionary, None if no row matched or the query failed.
+    """
+    try:
+        cursor = database.con.execute(statement,parameters)
+    except Exception as e:
+        log.error("Query '{}' failed. Exception: {}".format(statement,e))
+        return None
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([column[0] for column in cursor.description],row))
+
+
+def fetchEntries(database,statement,parameters=()):
+    """ Run a query and return its rows as dictionaries keyed by column name.
+
+    Returns:
+    A list of rows, empty if no row matched or the query failed.
+    """
+    try:
+        cursor = database.con.execute(statement,parameters)
+    except Exception as e:
+        log.error("Query '{}' failed. Exception: {}".format(statement,e))
+        return []
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns,row)) for row in cursor.fetchall()]
+
+
+def batches(items,size=settings.database_batch_query_size):
+    return [items[start:start + size] for start in range(0,len(items),size)]
+
+
+def makeRangeColumns(columns=None):
+    """ Columns returned by a range query, the symbol and timestamp followed by the requested columns.
+
+    Every stored column is returned if columns is None, columns which aren't stored are left out.
+    """
+    stored = makeDataBaseTableColumns()
+    if columns is None:
+        columns = [column for column,columnType in makeStoredColumns()]
+    unknown = [column for column in columns if column not in stored]
+    if len(unknown) > 0:
+        log.warning("Columns {} are not stored, leaving them out of the range query".format(unknown))
+    return [settings.CMC_data_symbol,'timestamp'] + [column for column in dict.fromkeys(columns)
+                                                     if column in stored and column not in [settings.CMC_data_symbol,'timestamp']]
+
+
+def makeRangeSelect(columns,table,interval,condition=""):
+    """ Select columns of the rows of table with start <= timestamp < end (the first two parameters).
+
+    With an interval (seconds) only the last row of each symbol in each interval is selected, using
+    SQLite's bare columns of a MAX() aggregate, with the start of the interval as its timestamp.
+    """
+    if interval <= 0:
+        return "SELECT {} FROM {} WHERE timestamp >= ? AND timestamp < ?{}".format(",".join(columns),table,condition)
+    selected = ["timestamp - timestamp % {} AS {}".format(int(interval),rangeBucketColumn) if column == 'timestamp' else column
+                for column in columns]
+    return "SELECT {}, MAX(timestamp) AS {} FROM {} WHERE timestamp >= ? AND timestamp < ?{} GROUP BY {}, {}".format(
+        ",".join(selected),rangeLastColumn,table,condition,settings.CMC_data_symbol,rangeBucketColumn)
+
+
+def cursorToFrame(cursor,interval=0):
+    """ A pandas.DataFrame of a range query, built from the row tuples without a dictionary per row."""
+    frame = pd.DataFrame(cursor.fetchall(),columns=[column[0] for column in cursor.description])
+    if interval > 0:
+        frame = frame.drop(columns=rangeLastColumn).rename(columns={rangeBucketColumn : 'timestamp'})
+    return frame
+
+
+def resampleFrame(frame,interval):
+    """ Keep the last row of each symbol in each interval of a frame ordered by symbol then timestamp."""
+    if interval <= 0 or len(frame) == 0:
+        return frame
+    frame = frame.assign(timestamp=frame['timestamp'] - frame['timestamp'] % int(interval))
+    return frame.drop_duplicates([settings.CMC_data_symbol,'timestamp'],keep='last').reset_index(drop=True)
+
+
+def migrateToQuotesLayout(database,dropTables=False):
+    """ Copy every per-symbol table into the single quotes table.
+
+    The copy runs in one transaction, rows already present in the quotes table are kept.
+
+    Parameters:
+    database (dbops.SQHelper): The database to migrate.
+    dropTables (bool): Remove the per-symbol tables once they have been copied.
+
+    Returns:
+    The number of rows copied, or None if the migration failed.
+    """
+    symbolLayout = SymbolTableLayout(database)
+    quotesLayout = QuotesTableLayout(database)
+    columns = ",".join(quotesLayout.columns())
+    connection = database.con
+    cursor = connection.cursor()
+    migrated = 0
+    try:
+        if not connection.in_transaction:
+            cursor.execute("BEGIN")
+        quotesLayout.createTable(cursor)
+        for table in symbolLayout.getSymbols():
+            cursor.execute("INSERT OR IGNORE INTO {0}({1}) SELECT {1} FROM {2}".format(
+                settings.database_quotes_table_name,columns,table))
+            migrated = migrated + cursor.rowcount
+            if dropTables:
+                cursor.execute("DROP TABLE {}".format(table))
+        connection.commit()
+    except Exception as e:
+        log.error("Failed to migrate database to {} layout, exception {}".format(settings.database_layout_quotes,e))
+        connection.rollback()
+        return None
+    log.info("Migrated {} rows to the {} table".format(migrated,settings.database_quotes_table_name))
+    return migrated
+
+
+class SymbolTableLayout():
+    """ One table per cryptocurrency symbol, the original storage layout."""
+
+    name = settings.database_layout_symbol
+
+    def __init__(self,database):
+        self.__database = database
+        self.__knownTables = None
+
+    def columns(self):
+        return sorted(makeDataBaseTableColumns().keys())
+
+    def reset(self):
+        self.__knownTables = None
+
+    def tableFor(self,entry):
+        """ The table of the entry's symbol, None if the symbol is the name of a reserved table."""
+        if isReservedTable(entry[settings.CMC_data_symbol]):
+            return None
+        return entry[settings.CMC_data_symbol]
+
+    def insertStatement(self,table):
+        columns = self.columns()
+        return "INSERT INTO {}({}) VALUES ({})".format(table,",".join(columns),",".join(["?"] * len(columns)))
+
+    def prepare(self,entries):
+        if self.__knownTables is None:
+            self.__loadTableCatalogue()
+            self.createTimestampIndexes()
+        for entry in entries:
+            table = self.tableFor(entry)
+            if table is not None and table not in self.__knownTables:
+                if len(self.__database.create_table(table,makeDataBaseTableColumns())) > 0:
+                    self.__createTimestampIndex(self.__database.con.cursor(),table)
+                    self.__database.con.commit()
+                    self.__knownTables.add(table)
+
+    def createTimestampIndexes(self):
+        """ Add the timestamp index to any symbol table created before indexes were maintained.
+
+        Returns:
+        The number of indexes created.
+        """
+        connection = self.__database.con
+        indexes = set(row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        if self.__knownTables is None:
+            self.__loadTableCatalogue()
+        missing = [table for table in sorted(self.__knownTables)
+                   if not isReservedTable(table) and self.__timestampIndexName(table) not in indexes]
+        if len(missing) == 0:
+            return 0
+        log.info("Creating timestamp indexes for {} existing tables".format(len(missing)))
+        cursor = connection.cursor()
+        for table in missing:
+            self.__createTimestampIndex(cursor,table)
+        connection.commit()
+        return len(missing)
+
+    def __timestampIndexName(self,table):
+        return "{}_timestamp".format(table)
+
+    def __createTimestampIndex(self,cursor,table):
+        cursor.execute("CREATE INDEX IF NOT EXISTS {} ON {}(timestamp)".format(self.__timestampIndexName(table),table))
+
+    def recoverMissingTable(self,cursor,table):
+        # The table catalogue is stale (table dropped by another process), reload it and
+        # recreate the table inside the open transaction.
+        log.warning("Table '{}' missing from database, refreshing table catalogue".format(table))
+        self.__loadTableCatalogue()
+        if table not in self.__knownTables:
+            cursor.execute("CREATE TABLE IF NOT EXISTS {}({})".format(table,makeColumnDefinition()))
+            self.__createTimestampIndex(cursor,table)
+            self.__knownTables.add(table)
+
+    def __loadTableCatalogue(self):
+        self.__knownTables = set(self.__database.get_table_names())
+        log.debug("Loaded table catalogue with {} tables".format(len(self.__knownTables)))
+
+    def getSymbols(self):
+        return [table for table in self.__database.get_table_names() if not isReservedTable(table)]
+
+    def getLastEntry(self,symbol):
+        if isReservedTable(symbol):
+            return None
+        return self.__database.get_last_time_entry(symbol)
+
+    def getEntryAsOf(self,symbol,timestamp):
+        if isReservedTable(symbol):
+            return None
+        return fetchEntry(self.__database,"SELECT * FROM {} WHERE timestamp <= ? ORDER BY timestamp DESC LIMIT 1".format(
+            symbol),(timestamp,))
+
+    def getLastEntries(self,symbols,timestamp=None):
+        """ The last entry of each symbol, stored at or before timestamp if given.
+
+        The symbol tables are read together, one statement per batch of symbols.
+
+        Returns:
+        A dictionary of entries keyed by symbol, symbols without an entry are left out.
+        """
+        # Symbols are table names in the statement, so only existing tables are queried
+        tables = set(self.getSymbols())
+        symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol in tables]
+        condition = "" if timestamp is None else " WHERE timestamp <= ?"
+        entries = dict()
+        for batch in batches(symbols):
+            statement = " UNION ALL ".join("SELECT * FROM (SELECT {} FROM {}{} ORDER BY timestamp DESC LIMIT 1)".format(
+                ",".join(self.columns()),table,condition) for table in batch)
+            parameters = () if timestamp is None else (timestamp,) * len(batch)
+            for entry in fetchEntries(self.__database,statement,parameters):
+                entries[entry[settings.CMC_data_symbol]] = entry
+        return entries
+
+    def crossSection(self,timestamp=None):
+        """ A subquery selecting the newest row of every symbol, for screener queries.
+
+        Parameters:
+        timestamp (int): Select the newest row at or before this time, within settings.screen_lookback_seconds
+        of it. The newest row of all if None.
+
+        Returns:
+        The subquery, None if there are no symbols.
+        """
+        condition = "" if timestamp is None else " WHERE timestamp > {:d} AND timestamp <= {:d}".format(
+            int(timestamp) - settings.screen_lookback_seconds,int(timestamp))
+        terms = ["SELECT * FROM (SELECT {} FROM {}{} ORDER BY timestamp DESC LIMIT 1)".format(
+            ",".join(self.columns()),table,condition) for table in self.getSymbols()]
+        if len(terms) == 0:
+            return None
+        # Nested in batches, below SQLite's limit on the terms of a compound select
+        return " UNION ALL ".join("SELECT * FROM ({})".format(" UNION ALL ".join(batch)) for batch in batches(terms))
+
+    def getLastUpdated(self):
+        lastUpdated = dict()
+        for table in self.getSymbols():
+            entry = fetchEntry(self.__database,"SELECT {},{} FROM {} ORDER BY timestamp DESC LIMIT 1".format(
+                settings.CMC_data_id,settings.CMC_data_last_updated,table))
+            if entry is not None:
+                lastUpdated[entry[settings.CMC_data_id]] = entry[settings.CMC_data_last_updated]
+        return lastUpdated
+
+    def symbolToDataFrame(self,symbol):
+        if isReservedTable(symbol):
+            return pd.DataFrame(columns=self.columns())
+        return self.__database.table_to_df(symbol)
+
+    def rangeToDataFrame(self,start,end,symbol=None):
+        """ Every column of the rows with start <= timestamp < end, for one or all symbols."""
+        tables = self.getSymbols()
+        if symbol is not None:
+            tables = [symbol] if symbol in tables else []
+        frames = []
+        for table in tables:
+            cursor = self.__database.con.execute("SELECT * FROM {} WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp".format(
+                table),(start,end))
+            rows = cursor.fetchall()
+            if len(rows) > 0:
+                frames.append(pd.DataFrame(rows,columns=[column[0] for column in cursor.description]))
+        if len(frames) == 0:
+            return pd.DataFrame(columns=self.columns())
+        return pd.concat(frames,ignore_index=True)
+
+    def queryRange(self,symbols,start,end,columns=None,interval=0):
+        """ Columns of the rows of symbols with start <= timestamp < end, ordered by symbol then timestamp.
+
+        Parameters:
+        symbols (list): The symbols to read, None for every symbol.
+        start (int): Unix time of the first row.
+        end (int): Unix time after the last row.
+        columns (list): Stored columns to read, every column if None.
+        interval (int): Seconds, only the last row of each symbol in each interval is read if above 0.
+
+        Returns:
+        A pandas.DataFrame with the symbol and timestamp columns first.
+        """
+        tables = self.getSymbols()
+        if symbols is not None:
+            # Symbols are table names in the statement, so only existing tables are queried
+            tables = sorted(set(symbols) & set(tables))
+        columns = makeRangeColumns(columns)
+        frames = []
+        for batch in batches(sorted(tables)):
+            statement = " UNION ALL ".join(makeRangeSelect(columns,table,interval) for table in batch)
+            statement = statement + " ORDER BY {}, {}".format(settings.CMC_data_symbol,rangeBucketColumn if interval > 0 else 'timestamp')
+            frames.append(cursorToFrame(self.__database.con.execute(statement,(start,end) * len(batch)),interval))
+        frames = [frame for frame in frames if len(frame) > 0]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames,ignore_index=True)
+
+    def getOldestTimestamp(self):
+        oldest = None
+        for table in self.getSymbols():
+            row = self.__database.con.execute("SELECT MIN(timestamp) FROM {}".format(table)).fetchone()
+            if row[0] is not None and (oldest is None or row[0] < oldest):
+                oldest = row[0]
+        return oldest
+
+    def getSamplesBetween(self,start,end):
+        """ Rows with start <= timestamp < end as tuples of makeSampleColumns(), ordered by id then timestamp."""
+        samples = []
+        for table in self.getSymbols():
+            samples.extend(self.__database.con.execute("SELECT {} FROM {} WHERE timestamp >= ? AND timestamp < ?".format(
+                ",".join(makeSampleColumns()),table),(start,end)).fetchall())
+        samples.sort(key=lambda row: (row[0],row[2]))
+        return samples
+
+    def getSymbolsBetween(self,start,end):
+        """ Symbols with rows with start <= timestamp < end."""
+        return [table for table in self.getSymbols() if self.__database.con.execute(
+            "SELECT 1 FROM {} WHERE timestamp >= ? AND timestamp < ? LIMIT 1".format(table),(start,end)).fetchone() is not None]
+
+    def deleteSamplesBetween(self,cursor,start,end,symbol=None):
+        tables = self.getSymbols()
+        if symbol is not None:
+            tables = [symbol] if symbol in tables else []
+        deleted = 0
+        for table in tables:
+            cursor.execute("DELETE FROM {} WHERE timestamp >= ? AND timestamp < ?".format(table),(start,end))
+            deleted = deleted + cursor.rowcount
+        return deleted
+
+
+class QuotesTableLayout():
+    """ A single long table holding every symbol, keyed by (coin id, timestamp)."""
+
+    name = settings.database_layout_quotes
+
+    def __init__(self,database):
+        self.__database = database
+        self.__tableReady = False
+
+    def columns(self):
+        return sorted(makeDataBaseTableColumns().keys())
+
+    def reset(self):
+        self.__tableReady = False
+
+    def tableFor(self,entry):
+        return settings.database_quotes_table_name
+
+    def insertStatement(self,table):
+        columns = self.columns()
+        return "INSERT OR REPLACE INTO {}({}) VALUES ({})".format(table,",".join(columns),",".join(["?"] * len(columns)))
+
+    def createTable(self,cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS {}({}, PRIMARY KEY ({}, timestamp)) WITHOUT ROWID".format(
+            settings.database_quotes_table_name,makeColumnDefinition(),settings.CMC_data_id))
+        cursor.execute("CREATE INDEX IF NOT EXISTS {0}_symbol_timestamp ON {0}({1}, timestamp)".format(
+            settings.database_quotes_table_name,settings.CMC_data_symbol))
+        cursor.execute("CREATE INDEX IF NOT EXISTS {0}_timestamp ON {0}(timestamp)".format(settings.database_quotes_table_name))
+
+    def prepare(self,entries):
+        if not self.__tableReady:
+            self.createTable(self.__database.con.cursor())
+            self.__database.con.commit()
+            self.__tableReady = True
+
+    def recoverMissingTable(self,cursor,table):
+        log.warning("Table '{}' missing from database, recreating it".format(table))
+        self.createTable(cursor)
+
+    def getSymbols(self):
+        try:
+            cursor = self.__database.con.execute("SELECT DISTINCT {} FROM {} ORDER BY {}".format(
+                settings.CMC_data_symbol,settings.database_quotes_table_name,settings.CMC_data_symbol))
+        except Exception as e:
+            log.error("Cannot get symbols from {} table. Exception: {}".format(settings.database_quotes_table_name,e))
+            return []
+        return [row[0] for row in cursor.fetchall()]
+
+    def getLastEntry(self,symbol):
+        return fetchEntry(self.__database,"SELECT * FROM {} WHERE {} = ? ORDER BY timestamp DESC LIMIT 1".format(
+            settings.database_quotes_table_name,settings.CMC_data_symbol),(symbol,))
+
+    def getEntryAsOf(self,symbol,timestamp):
+        return fetchEntry(self.__database,"SELECT * FROM {} WHERE {} = ? AND timestamp <= ? ORDER BY timestamp DESC LIMIT 1".format(
+            settings.database_quotes_table_name,settings.CMC_data_symbol),(symbol,timestamp))
+
+    def getLastEntries(self,symbols,timestamp=None):
+        """ The last entry of each symbol, stored at or before timestamp if given.
+
+        Returns:
+        A dictionary of entries keyed by symbol, symbols without an entry are left out.
+        """
+        condition = "" if timestamp is None else " AND timestamp <= ?"
+        entries = dict()
+        for batch in batches(list(dict.fromkeys(symbols))):
+            statement = ("SELECT {0}.* FROM {0} JOIN (SELECT {1}, MAX(timestamp) AS latest FROM {0} WHERE {1} IN ({2}){3} GROUP BY {1})"
+                         " AS last ON {0}.{1} = last.{1} AND {0}.timestamp = last.latest").format(
+                settings.database_quotes_table_name,settings.CMC_data_symbol,",".join(["?"] * len(batch)),condition)
+            parameters = tuple(batch) if timestamp is None else tuple(batch) + (timestamp,)
+            for entry in fetchEntries(self.__database,statement,parameters):
+                entries.setdefault(entry[settings.CMC_data_symbol],entry)
+        return entries
+
+    def crossSection(self,timestamp=None):
+        """ A subquery selecting the newest row of every coin, see SymbolTableLayout.crossSection."""
+        condition = "" if timestamp is None else " WHERE timestamp > {:d} AND timestamp <= {:d}".format(
+            int(timestamp) - settings.screen_lookback_seconds,int(timestamp))
+        return ("SELECT {0}.* FROM {0} JOIN (SELECT {1}, MAX(timestamp) AS latest FROM {0}{2} GROUP BY {1})"
+                " AS last ON {0}.{1} = last.{1} AND {0}.timestamp = last.latest").format(
+            settings.database_quotes_table_name,settings.CMC_data_id,condition)
+
+    def getLastUpdated(self):
+        try:
+            cursor = self.__database.con.execute("SELECT {0}, MAX({1}) FROM {2} GROUP BY {0}".format(
+                settings.CMC_data_id,settings.CMC_data_last_updated,settings.database_quotes_table_name))
+        except Exception as e:
+            log.error("Cannot read last updated times from {} table. Exception: {}".format(settings.database_quotes_table_name,e))
+            return dict()
+        return dict(cursor.fetchall())
+
+    def symbolToDataFrame(self,symbol):
+        try:
+            cursor = self.__database.con.execute("SELECT * FROM {} WHERE {} = ? ORDER BY timestamp".format(
+                settings.database_quotes_table_name,settings.CMC_data_symbol),(symbol,))
+        except Exception as e:
+            log.error("Cannot read {} from {} table. Exception: {}".format(symbol,settings.database_quotes_table_name,e))
+            return None
+        return pd.DataFrame(cursor.fetchall(),columns=[column[0] for column in cursor.description])
+
+    def rangeToDataFrame(self,start,end,symbol=None):
+        """ Every column of the rows with start <= timestamp < end, for one or all symbols."""
+        statement = "SELECT * FROM {} WHERE timestamp >= ? AND timestamp < ?".format(settings.database_quotes_table_name)
+        parameters = (start,end)
+        if symbol is not None:
+            statement = statement + " AND {} = ?".format(settings.CMC_data_symbol)
+            parameters = (start,end,symbol)
+        cursor = self.__database.con.execute(statement + " ORDER BY {}, timestamp".format(settings.CMC_data_symbol),parameters)
+        return pd.DataFrame(cursor.fetchall(),columns=[column[0] for column in cursor.description])
+
+    def queryRange(self,symbols,start,end,columns=None,interval=0):
+        """ Columns of the rows of symbols with start <= timestamp < end, ordered by symbol then timestamp.
+
+        See SymbolTableLayout.queryRange.
+        """
+        columns = makeRangeColumns(columns)
+        order = " ORDER BY {}, {}".format(settings.CMC_data_symbol,rangeBucketColumn if interval > 0 else 'timestamp')
+        if symbols is None:
+            statements = [(makeRangeSelect(columns,settings.database_quotes_table_name,interval) + order,(start,end))]
+        else:
+            statements = [(makeRangeSelect(columns,settings.database_quotes_table_name,interval," AND {} IN ({})".format(
+                settings.CMC_data_symbol,",".join(["?"] * len(batch)))) + order,(start,end) + tuple(batch))
+                for batch in batches(sorted(set(symbols)))]
+        frames = []
+        for statement,parameters in statements:
+            frames.append(cursorToFrame(self.__database.con.execute(statement,parameters),interval))
+        frames = [frame for frame in frames if len(frame) > 0]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames,ignore_index=True)
+
+    def getOldestTimestamp(self):
+        return self.__database.con.execute("SELECT MIN(timestamp) FROM {}".format(settings.database_quotes_table_name)).fetchone()[0]
+
+    def getSamplesBetween(self,start,end):
+        """ Rows with start <= timestamp < end as tuples of makeSampleColumns(), ordered by id then timestamp."""
+        return self.__database.con.execute("SELECT {} FROM {} WHERE timestamp >= ? AND timestamp < ? ORDER BY {}, timestamp".format(
+            ",".join(makeSampleColumns()),settings.database_quotes_table_name,settings.CMC_data_id),(start,end)).fetchall()
+
+    def getSymbolsBetween(self,start,end):
+        """ Symbols with rows with start <= timestamp < end."""
+        return [row[0] for row in self.__database.con.execute(
+            "SELECT DISTINCT {0} FROM {1} WHERE timestamp >= ? AND timestamp < ? ORDER BY {0}".format(
+                settings.CMC_data_symbol,settings.database_quotes_table_name),(start,end)).fetchall()]
+
+    def deleteSamplesBetween(self,cursor,start,end,symbol=None):
+        statement = "DELETE FROM {} WHERE timestamp >= ? AND timestamp < ?".format(settings.database_quotes_table_name)
+        parameters = (start,end)
+        if symbol is not None:
+            statement = statement + " AND {} = ?".format(settings.CMC_data_symbol)
+            parameters = (start,end,symbol)
+        cursor.execute(statement,parameters)
+        return cursor.rowcount
@@ -1,18 +1,57 @@
 import cmclogger.settings as settings
+from cmclogger.dataparser.layout import SymbolTableLayout
+from cmclogger.dataparser.latest import LatestTable
+from cmclogger.dataparser.isotime import isoToLocalTime
+from cmclogger.dataparser.schema import RowExtractor
 import logging
 import time
-from dateutil import parser, tz
+import sqlite3
 
 allowedDataFormats = ['ini']
 log = logging.getLogger(__name__)
 
 
+class StagedData(list):
+    """ API data entries flattened one at a time as they are received, for Publisher.writeData.
+
+    Only the stored columns of each entry are kept, so the full API entries never need to be
+    held in memory together. Rows are added by CMCGetLatest, with the extractor of the currency
+    it requested.
+
+    Parameters:
+    timestamp (int): Unix time the data was fetched, defaults to now.
+    rows (list): Entries which have already been flattened.
+    """
+
+    def __init__(self,timestamp=None,rows=()):
+        list.__init__(self,rows)
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+
+    def discard(self):
+        del self[:]
+
+
 class Publisher():
+    """ Stores API data entries and call statuses.
 
-    def __init__(self,status,database):
+    Parameters:
+    status (ConfigChecker): The status file.
+    database (Database): The database rows are stored in.
+    layout: The storage layout, a SymbolTableLayout if None.
+    changeOnly (bool): Only store entries whose last_updated time has moved.
+    currency (str): Conversion currency the entries passed to writeData were requested in, None
+    takes each entry's only quote.
+    """
+
+    def __init__(self,status,database,layout=None,changeOnly=False,currency=None):
         self.__status = status
         self.__checkstatus()
         self.__database = database
+        self.__layout = layout if layout is not None else SymbolTableLayout(database)
+        self.__latest = LatestTable(database)
+        self.__changeOnly = changeOnly
+        self.__extractor = RowExtractor(currency)
+        self.__lastUpdated = self.__loadLastUpdated() if changeOnly else None
         self.__healthList = [1] * 30
         log.debug("Data publisher setup with inital status '{}'".format(status.get_expectations()))
 
@@ -88,85 +127,158 @@ class Publisher():
         return round(100 * success/(success+fail),2)
 
     def toLocalTime(self,iso8601):
-        return str(parser.parse(iso8601).astimezone(tz.tzlocal()))
+        return isoToLocalTime(iso8601)
 
     def __incrementStatusValue(self,sectionName,optionName):
         self.__status.set_value(sectionName,optionName,self.__status.get_value(sectionName,optionName)+1)
 
-    def writeData(self,data):
+    def writeData(self,data,timestamp=None):
+        """ Store API data entries.
+
+        Parameters:
+        data (list): Entries from the API, or StagedData which has already been flattened.
+        timestamp (int): Unix time the data was fetched, defaults to now (or the StagedData timestamp).
+        """
         if data is None:
             return
         self.__createDataBaseIfNotExist()
+        rejected = []
+        if isinstance(data,StagedData):
+            rows = data
+        else:
+            if timestamp is None:
+                timestamp = int(time.time())
+            rows = self.__extractRows(data,timestamp,rejected)
+        entries = []
+        suppressed = 0
+        for row in rows:
+            if self.__isUnchanged(row):
+                suppressed = suppressed + 1
+                continue
+            entries.append(row)
+        # A coin's table is created even if its entry in this batch couldn't be stored
+        self.__layout.prepare(entries + rejected)
+        self.__latest.prepare(self.__layout)
+        written = self.__addToDatabase(entries)
+        log.info("Added {} new entries to the database".format(written))
+        if self.__changeOnly:
+            self.__writeSuppressedStats(suppressed)
+
+    def __extractRows(self,data,timestamp,rejected):
         for entry in data:
-            dataCopy = dict(entry)
-            self.__dropUnusedEntries(dataCopy)
-            self.__createTablesAsNeeded(dataCopy)
-            self.__createTimestamp(dataCopy)
-            self.__convertTimeEntries(dataCopy)
-            # dataList = self.__convertToSortedList(dataCopy)
-            self.__addToDatabase(dataCopy)
-            log.debug("Adding a new entry in database for coin '{}'".format(dataCopy[settings.CMC_data_symbol]))
-        log.info("Added {} new entries to the database".format(len(data)))
-
-    def __addToDatabase(self,dataCopy):
-         try:
-            self.__database.insert(dataCopy[settings.CMC_data_symbol],dataCopy)
-         except Exception as e:
-             log.error("Error adding coin '{}' to database, SQHelper error {}".format(dataCopy[settings.CMC_data_symbol],e))
-
-    def __convertTimeEntries(self,entry):
-        entry[settings.CMC_data_data_added] = self.__convertISO860toUnixTime(entry[settings.CMC_data_data_added])
-        entry[settings.CMC_data_last_updated] = self.__convertISO860toUnixTime(entry[settings.CMC_data_last_updated])
-
-    def __convertISO860toUnixTime(self,iso8601):
-        return int((parser.parse(iso8601).strftime('%s')))
-
-    def __createTimestamp(self,entry):
-        entry['timestamp'] = int(time.time())
-
-    def __dropUnusedEntries(self,entry):
-        self.__flattenJsonData(entry)
-        entry.pop(settings.CMC_data_quote)
-        entry.pop(settings.CMC_data_tags)
-        entry.pop(settings.CMC_data_platform)
-
-    def __flattenJsonData(self,entry):
-        currencyEntry = next(iter(entry[settings.CMC_data_quote]))
-        entry[settings.CMC_data_quote_price] = entry[settings.CMC_data_quote][currencyEntry][settings.CMC_data_quote_price]
-        entry[settings.CMC_data_quote_volume_24h] = entry[settings.CMC_data_quote][currencyEntry][settings.CMC_data_quote_volume_24h]
-        entry[settings.CMC_data_quote_market_cap] = entry[settings.CMC_data_quote][currencyEntry][settings.CMC_data_quote_market_cap]
-        entry[settings.CMC_data_percent_change_1h] = entry[settings.CMC_data_quote][currencyEntry][settings.CMC_data_percent_change_1h]
-        entry[settings.CMC_data_percent_change_24h] = entry[settings.CMC_data_quote][currencyEntry][settings.CMC_data_percent_change_24h]
-        entry[settings.CMC_data_percent_change_7d] = entry[settings.CMC_data_quote][currencyEntry][settings.CMC_data_percent_change_7d]
+            row,error = self.__extractor.extract(entry,timestamp)
+            if error is not None:
+                log.error("Skipping API data entry, field '{}' is {}".format(*error))
+                if isinstance(entry,dict) and settings.CMC_data_symbol in entry:
+                    rejected.append(entry)
+                continue
+            yield row
+
+    def __loadLastUpdated(self):
+        # Seeded when the publisher starts, so the first write doesn't scan the latest table
+        self.__layout.prepare([])
+        self.__latest.prepare(self.__layout)
+        lastUpdated = self.__latest.getLastUpdated()
+        log.debug("Loaded last updated times for {} coins".format(len(lastUpdated)))
+        return lastUpdated
+
+    def __isUnchanged(self,entry):
+        # Change only mode, an entry is unchanged if CMC hasn't updated the coin since it was last stored
+        if not self.__changeOnly or settings.CMC_data_id not in entry:
+            return False
+        return self.__lastUpdated.get(entry[settings.CMC_data_id]) == entry[settings.CMC_data_last_updated]
+
+    def __rememberLastUpdated(self,rows):
+        # Only rows which were committed count as stored
+        if not self.__changeOnly:
+            return
+        columns = self.__layout.columns()
+        idIndex = columns.index(settings.CMC_data_id)
+        lastUpdatedIndex = columns.index(settings.CMC_data_last_updated)
+        for row in rows:
+            self.__lastUpdated[row[idIndex]] = row[lastUpdatedIndex]
+
+    def __writeSuppressedStats(self,suppressed):
+        log.info("Suppressed {} unchanged entries".format(suppressed))
+        for section in [settings.status_file_current_session_section_name,settings.status_file_all_time_section_name]:
+            self.__status.set_value(section,settings.status_file_option_suppressed_rows,
+                    self.__status.get_value(section,settings.status_file_option_suppressed_rows) + suppressed)
+        self.__status.write_configuration_file()
+
+    def __addToDatabase(self,entries):
+        columns = self.__layout.columns()
+        tables = dict()
+        for entry in entries:
+            try:
+                table = self.__layout.tableFor(entry)
+                if table is None:
+                    log.error("Cannot add coin '{}' to database, its symbol is the name of a reserved table".format(
+                        entry[settings.CMC_data_symbol]))
+                    continue
+                tables.setdefault(table,[]).append(tuple(entry[column] for column in columns))
+            except KeyError as e:
+                log.error("Error adding coin '{}' to database, missing field {}".format(entry[settings.CMC_data_symbol],e))
+
+        connection = self.__database.con
+        cursor = connection.cursor()
+        written = []
+        try:
+            if not connection.in_transaction:
+                cursor.execute("BEGIN")
+            for table,rows in tables.items():
+                written.extend(self.__insertRows(cursor,table,self.__layout.insertStatement(table),rows))
+            # The newest row of each coin is kept in the same transaction as its history
+            self.__upsertLatest(cursor,written)
+            connection.commit()
+        except sqlite3.Error as e:
+            log.error("Error committing batch of {} entries to database, SQLite error {}".format(len(entries),e))
+            connection.rollback()
+            return 0
+        self.__rememberLastUpdated(written)
+        return len(written)
+
+    def __upsertLatest(self,cursor,rows,recovered=False):
+        # A failure here is rolled back on its own, the history rows are still committed
+        cursor.execute("SAVEPOINT latest")
+        try:
+            self.__latest.upsert(cursor,rows)
+            cursor.execute("RELEASE SAVEPOINT latest")
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT latest")
+            cursor.execute("RELEASE SAVEPOINT latest")
+            if not recovered and self.__isMissingTableError(e):
+                self.__latest.recoverMissingTable(cursor)
+                self.__upsertLatest(cursor,rows,True)
+            else:
+                log.error("Error updating the {} table, SQLite error {}".format(settings.database_latest_table_name,e))
+
+    def __insertRows(self,cursor,table,statement,rows,recovered=False):
+        """ Insert rows into table, returning the rows which were written."""
+        cursor.execute("SAVEPOINT batch")
+        try:
+            cursor.executemany(statement,rows)
+            cursor.execute("RELEASE SAVEPOINT batch")
+            return rows
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT batch")
+            cursor.execute("RELEASE SAVEPOINT batch")
+            if not recovered and self.__isMissingTableError(e):
+                self.__layout.recoverMissingTable(cursor,table)
+                return self.__insertRows(cursor,table,statement,rows,True)
+            if len(rows) == 1:
+                log.error("Error adding entry to database table '{}', SQLite error {}".format(table,e))
+                return []
+        # Isolate the failing row(s) so the rest of the batch is still written
+        return [written for row in rows for written in self.__insertRows(cursor,table,statement,[row])]
+
+    def __isMissingTableError(self,error):
+        return isinstance(error,sqlite3.OperationalError) and 'no such table' in str(error)
 
     def __createDataBaseIfNotExist(self):
         if not self.__database.exists():
             log.error("Target database didn't exist at runtime, creating a new database")
             self.__database.create_database()
-
-    def __createTablesAsNeeded(self,entry):
-        if entry[settings.CMC_data_symbol] not in self.__database.get_table_names():
-            self.__database.create_table(entry[settings.CMC_data_symbol],self.__makeDataBaseTableColumns())
-
-    def __makeDataBaseTableColumns(self):
-
-        columns = dict()
-        columns['timestamp'] = 'INTEGER'
-        columns[settings.CMC_data_circulating_suuply] = settings.CMC_data_circulating_suuply_type
-        columns[settings.CMC_data_cmc_rank] = settings.CMC_data_cmc_rank_type
-        columns[settings.CMC_data_data_added] = settings.CMC_data_data_added_type
-        columns[settings.CMC_data_id] = settings.CMC_data_id_type
-        columns[settings.CMC_data_last_updated] = settings.CMC_data_last_updated_type
-        columns[settings.CMC_data_max_supply] = settings.CMC_data_max_supply_type
-        columns[settings.CMC_data_name] = settings.CMC_data_name_type
-        columns[settings.CMC_data_quote_market_cap] = settings.CMC_data_quote_market_cap_type
-        columns[settings.CMC_data_num_market_pairs] = settings.CMC_data_num_market_pairs_type
-        columns[settings.CMC_data_percent_change_1h] = settings.CMC_data_percent_change_1h_type
-        columns[settings.CMC_data_percent_change_7d] = settings.CMC_data_percent_change_7d_type
-        columns[settings.CMC_data_percent_change_24h] = settings.CMC_data_percent_change_24h_type
-        columns[settings.CMC_data_quote_price] = settings.CMC_data_quote_price_type
-        columns[settings.CMC_data_slug] = settings.CMC_data_slug_type
-        columns[settings.CMC_data_symbol] = settings.CMC_data_symbol_type
-        columns[settings.CMC_data_total_supply] = settings.CMC_data_total_supply_type
-        columns[settings.CMC_data_quote_volume_24h] = settings.CMC_data_quote_volume_24h_type
-        return columns
+            self.__layout.reset()
+            self.__latest.reset()
+            if self.__changeOnly:
+                self.__lastUpdated = dict()
@@ -1,21 +1,31 @@
 from dateutil import parser, tz
 from io import StringIO
 import cmclogger.settings as settings
+from cmclogger.dataparser.layout import makeLayout
+from cmclogger.dataparser.latest import LatestTable
+from cmclogger.dataparser.screener import Screener, parseFilter
 import logging
 import json
 import time
 import math
+import pandas as pd
 
 log = logging.getLogger(__name__)
 millnames = ['', ' Thousand', ' Million', ' Billion', ' Trillion']
 
 class Reader():
 
-    def __init__(self,statusFile,database,config):
+    def __init__(self,statusFile,database,config,layout=None,latest=None):
 
         self.__statusFile = statusFile
         self.__database = database
         self.__config = config
+        if layout is None:
+            layout = makeLayout(config.get_value(settings.database_section_name,settings.database_option_layout),database)
+        self.__layout = layout
+        # Current prices are read from the latest table, the layout's history is read for the rest
+        self.__latest = latest if latest is not None else LatestTable(database)
+        self.__screener = Screener(database,self.__layout,self.__latest)
 
         log.debug("Starting a new data reader instance")
 
@@ -28,10 +38,99 @@ class Reader():
             return self.__processPriceRequest(request)
         elif request[settings.data_query_type] == settings.data_query_type_status:
             return self.__processStatusRequest(request)
+        elif request[settings.data_query_type] == settings.data_query_type_batch:
+            return self.__processBatchPriceRequest(request)
+        elif request[settings.data_query_type] == settings.data_query_type_range:
+            return self.__processRangeRequest(request)
+        elif request[settings.data_query_type] == settings.data_query_type_screen:
+            return self.__processScreenRequest(request)
         else:
             log.warning("Request with type {} is not valid".format(request[settings.data_query_type]))
             return "Request with type {} is not valid".format(request[settings.data_query_type])
 
+    def getRange(self,symbols=None,start=None,end=None,columns=None,interval=0,asArrays=False):
+        """ Get the stored rows of one or more symbols between two times.
+
+        Parameters:
+        symbols (list): Cryptocurrency symbols (or a single symbol), None for every symbol.
+        start (int): Unix time of the first row, defaults to the oldest row.
+        end (int): Unix time after the last row, defaults to after the newest row.
+        columns (list): Stored columns to return, every column if None.
+        interval (int): Resample to the last row of each symbol in each interval of this many seconds, 0 keeps every row.
+        asArrays (bool): Return a dictionary of NumPy arrays keyed by column instead of a DataFrame.
+
+        Returns:
+        A pandas.DataFrame ordered by symbol then timestamp, with the symbol and timestamp columns first.
+        """
+        if isinstance(symbols,str):
+            symbols = [symbols]
+        try:
+            interval = max(int(interval),0)
+        except (TypeError,ValueError):
+            log.warning("Range query interval '{}' not valid, returning every row".format(interval))
+            interval = 0
+        frame = self.__layout.queryRange(symbols,0 if start is None else start,float('inf') if end is None else end,columns,interval)
+        if asArrays:
+            return {column : frame[column].to_numpy() for column in frame.columns}
+        return frame
+
+    def __processRangeRequest(self,request):
+        columns = request.get(settings.data_query_columns)
+        if columns is None and request[settings.data_query_detail] == settings.data_query_detail_long:
+            columns = [settings.CMC_data_quote_price,settings.CMC_data_quote_volume_24h,settings.CMC_data_quote_market_cap,
+                       settings.CMC_data_percent_change_1h,settings.CMC_data_percent_change_24h,settings.CMC_data_percent_change_7d]
+        elif columns is None:
+            columns = [settings.CMC_data_quote_price]
+        frame = self.getRange(request[settings.data_query_tags],request.get(settings.data_query_start),request.get(settings.data_query_end),
+                              columns,request.get(settings.data_query_interval,0))
+        if request[settings.data_query_format] == settings.data_query_format_json:
+            return json.dumps({column : frame[column].tolist() for column in frame.columns})
+        elif request[settings.data_query_format] == settings.data_query_format_stdout:
+            if len(frame) == 0:
+                return "No entries stored for {} in the requested range.".format(" ".join(request[settings.data_query_tags]))
+            frame = frame.assign(timestamp=pd.to_datetime(frame['timestamp'],unit='s',utc=True).dt.strftime('%Y-%m-%d %H:%M:%S'))
+            return frame.to_string(index=False)
+        else:
+            log.warning("Range request format '{}' not found".format(request[settings.data_query_format]))
+            return "{} is an invalid range request format".format(request[settings.data_query_format])
+
+    def screen(self,sortColumn,descending=True,limit=settings.screen_default_limit,filters=(),asOf=None):
+        """ Sort and filter the newest row of every coin, see Screener.screen.
+
+        Filters can be given as (column, operator, value) tuples or strings such as 'market_cap>1e9'.
+        """
+        return self.__screener.screen(sortColumn,descending,limit,self.__parsedFilters(filters),asOf)
+
+    def __processScreenRequest(self,request):
+        sortColumn = request[settings.data_query_sort]
+        filters = request.get(settings.data_query_filters,[])
+        frame = self.screen(sortColumn,not request.get(settings.data_query_ascending,False),
+                            request.get(settings.data_query_limit,settings.screen_default_limit),filters,request.get(settings.data_query_as_of))
+        if frame is None:
+            return "Screen by '{}' with filters {} is not valid.".format(sortColumn,filters)
+        columns = [settings.CMC_data_symbol,settings.CMC_data_cmc_rank,settings.CMC_data_quote_price]
+        columns.extend(screenFilter[0] for screenFilter in self.__parsedFilters(filters))
+        columns = list(dict.fromkeys(columns + [sortColumn]))
+        if request[settings.data_query_format] == settings.data_query_format_json:
+            return json.dumps(frame[columns].to_dict(orient='records'))
+        elif request[settings.data_query_format] == settings.data_query_format_stdout:
+            if len(frame) == 0:
+                return "No coins match the screen."
+            rows = [[str(entry[settings.CMC_data_symbol])] + [self.__screenValue(entry,column) for column in columns[1:]]
+                    for entry in frame[columns].to_dict(orient='records')]
+            return "\n".join(self.__alignRows([columns] + rows))
+        else:
+            log.warning("Screen request format '{}' not found".format(request[settings.data_query_format]))
+            return "{} is an invalid screen request format".format(request[settings.data_query_format])
+
+    def __parsedFilters(self,filters):
+        return [parseFilter(screenFilter) if isinstance(screenFilter,str) else screenFilter for screenFilter in filters]
+
+    def __screenValue(self,entry,column):
+        if isinstance(entry[column],float):
+            return self.__getKeyAndRoundValue(entry,column)
+        return "NULL" if entry[column] is None else str(entry[column])
+
     def __processStatusRequest(self,request):
         if request[settings.data_query_format] == settings.data_query_format_stdout:
             return self.__processStatusStdout(request)
@@ -86,7 +185,13 @@ class Reader():
         return int((currentTime - lastCall) / 60)
 
     def __processPriceRequest(self,request):
-        entry = self.__database.get_last_time_entry(request[settings.data_query_tag])
+        if request.get(settings.data_query_as_of) is not None:
+            # Valid in change only mode too, an entry is current until a newer one is stored
+            entry = self.__layout.getEntryAsOf(request[settings.data_query_tag],request[settings.data_query_as_of])
+        else:
+            entry = self.__latest.getLastEntry(request[settings.data_query_tag])
+            if entry is None:
+                entry = self.__layout.getLastEntry(request[settings.data_query_tag])
         if entry is None:
             log.error("Cannot request symbol {} from database, as it does not exist.".format(request[settings.data_query_tag]))
             return "{} not a valid stored cryptocurreny symbol.".format(request[settings.data_query_tag])
@@ -98,6 +203,70 @@ class Reader():
             log.warning("Price request detail '{}' not found".format(request[settings.data_query_detail]))
             return '{} is an invalid output detail request.'.format(request[settings.data_query_detail])
 
+    def __processBatchPriceRequest(self,request):
+        # Every symbol is read in one query and output in one pass, as a JSON array or an aligned table
+        symbols = list(dict.fromkeys(request[settings.data_query_tags]))
+        if request[settings.data_query_detail] not in [settings.data_query_detail_short,settings.data_query_detail_long]:
+            log.warning("Price request detail '{}' not found".format(request[settings.data_query_detail]))
+            return '{} is an invalid output detail request.'.format(request[settings.data_query_detail])
+        if request[settings.data_query_format] not in [settings.data_query_format_stdout,settings.data_query_format_json]:
+            log.warning("Price request format '{}' not found".format(request[settings.data_query_format]))
+            return "{} is an invalid price request format".format(request[settings.data_query_format])
+        entries = self.__getLastEntries(symbols,request.get(settings.data_query_as_of))
+        missing = [symbol for symbol in symbols if symbol not in entries]
+        for symbol in missing:
+            log.error("Cannot request symbol {} from database, as it does not exist.".format(symbol))
+        long = request[settings.data_query_detail] == settings.data_query_detail_long
+        if request[settings.data_query_format] == settings.data_query_format_json:
+            output = []
+            for symbol in symbols:
+                if symbol in missing:
+                    output.append({settings.CMC_data_symbol : symbol,
+                                   settings.output_json_error : "{} not a valid stored cryptocurreny symbol.".format(symbol)})
+                else:
+                    output.append(self.__longPriceDict(entries[symbol]) if long else self.__shortPriceDict(entries[symbol]))
+            return str(json.dumps(output))
+        rows = [self.__longPriceRow(entries[symbol]) if long else self.__shortPriceRow(entries[symbol])
+                for symbol in symbols if symbol not in missing]
+        lines = self.__alignRows([self.__priceRowHeader(long)] + rows) if len(rows) > 0 else []
+        lines.extend("{} not a valid stored cryptocurreny symbol.".format(symbol) for symbol in missing)
+        return "\n".join(lines)
+
+    def __getLastEntries(self,symbols,timestamp):
+        if timestamp is not None:
+            return self.__layout.getLastEntries(symbols,timestamp)
+        entries = self.__latest.getLastEntries(symbols)
+        missing = [symbol for symbol in symbols if symbol not in entries]
+        if len(missing) > 0:
+            entries.update(self.__layout.getLastEntries(missing))
+        return entries
+
+    def __priceRowHeader(self,long):
+        if long:
+            return ['Symbol','Price','1H','1D','7D','24h Volume']
+        return ['Symbol','Price','24H']
+
+    def __shortPriceRow(self,entry):
+        return [str(entry[settings.CMC_data_symbol]),
+                self.__config.get_value(settings.API_section_name,settings.API_option_conversion_currency_symbol) +
+                self.__getKeyAndRoundValue(entry,settings.CMC_data_quote_price),
+                self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_24h) + '%']
+
+    def __longPriceRow(self,entry):
+        return [str(entry[settings.CMC_data_symbol]),
+                self.__config.get_value(settings.API_section_name,settings.API_option_conversion_currency_symbol) +
+                self.__getKeyAndRoundValue(entry,settings.CMC_data_quote_price),
+                self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_1h) + '%',
+                self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_24h) + '%',
+                self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_7d) + '%',
+                self.__currencyToNiceFormat(entry)]
+
+    def __alignRows(self,rows):
+        # The symbol column is left aligned, the value columns right aligned
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+        return ["  ".join([row[0].ljust(widths[0])] + [value.rjust(width) for value,width in zip(row[1:],widths[1:])])
+                for row in rows]
+
     def __processLongPriceRequest(self,entry,request):
         if request[settings.data_query_format] == settings.data_query_format_stdout:
             return self.__longPriceStdout(entry)
@@ -126,17 +295,22 @@ class Reader():
             "%)"
 
     def __shortPriceJson(self,entry):
+        return str(json.dumps(self.__shortPriceDict(entry)))
+
+    def __shortPriceDict(self,entry):
         symbol = self.__config.get_value(settings.API_section_name,settings.API_option_conversion_currency_symbol)
-        outputDict = {
+        return {
                 settings.CMC_data_symbol : str(entry[settings.CMC_data_symbol]),
                 settings.CMC_data_quote_price : symbol + self.__getKeyAndRoundValue(entry,settings.CMC_data_quote_price),
                 settings.CMC_data_percent_change_24h : self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_24h) + '%'
                 }
-        return str(json.dumps(outputDict))
 
     def __longPriceJson(self,entry):
+        return str(json.dumps(self.__longPriceDict(entry)))
+
+    def __longPriceDict(self,entry):
         symbol = self.__config.get_value(settings.API_section_name,settings.API_option_conversion_currency_symbol)
-        outputDict = {
+        return {
                 settings.CMC_data_symbol : str(entry[settings.CMC_data_symbol]),
                 settings.CMC_data_quote_price : symbol + self.__getKeyAndRoundValue(entry,settings.CMC_data_quote_price),
                 settings.CMC_data_percent_change_1h : self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_1h) + "%",
@@ -144,7 +318,6 @@ class Reader():
                 settings.CMC_data_percent_change_7d : self.__getKeyAndRoundValue(entry,settings.CMC_data_percent_change_7d) + "%",
                 settings.CMC_data_quote_market_cap : self.__currencyToNiceFormat(entry)
                 }
-        return str(json.dumps(outputDict))
 
     def __longPriceStdout(self,entry):
         return str(entry[settings.CMC_data_symbol]) + \
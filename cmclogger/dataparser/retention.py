@@ -0,0 +1,252 @@
+import cmclogger.settings as settings
+import logging
+import itertools
+import time
+
+allowedExpiredActions = [settings.retention_expired_action_drop, settings.retention_expired_action_archive]
+log = logging.getLogger(__name__)
+
+secondsPerHour = 3600
+secondsPerDay = 86400
+bucketColumns = [settings.CMC_data_id, settings.CMC_data_symbol, 'bucket', 'open', 'high', 'low', 'close',
+                 settings.CMC_data_quote_volume_24h, settings.CMC_data_quote_market_cap, 'samples',
+                 'first_timestamp', 'last_timestamp']
+
+
+def makeBucketColumnDefinition():
+    return ("{} INTEGER, {} TEXT, bucket INTEGER, open REAL, high REAL, low REAL, close REAL, {} REAL, {} REAL, "
+            "samples INTEGER, first_timestamp INTEGER, last_timestamp INTEGER, PRIMARY KEY ({}, bucket)").format(
+            settings.CMC_data_id,settings.CMC_data_symbol,settings.CMC_data_quote_volume_24h,
+            settings.CMC_data_quote_market_cap,settings.CMC_data_id)
+
+
+def makeBucketReplaceStatement(table):
+    return "INSERT OR REPLACE INTO {}({}) VALUES ({})".format(table,",".join(bucketColumns),",".join(["?"] * len(bucketColumns)))
+
+
+def mergeBucket(existing,late):
+    """ Merge a bucket with one compacted earlier for the same coin and time (rows written late).
+
+    Both buckets and the result are tuples ordered as bucketColumns.
+    """
+    samples = existing[9] + late[9]
+    volume = ((existing[7] if existing[7] is not None else 0) * existing[9] +
+              (late[7] if late[7] is not None else 0) * late[9]) / samples
+    newest = late if late[11] >= existing[11] else existing
+    return (existing[0],existing[1],existing[2],late[3] if late[10] < existing[10] else existing[3],
+            max(existing[4],late[4]),min(existing[5],late[5]),newest[6],volume,newest[8],samples,
+            min(existing[10],late[10]),max(existing[11],late[11]))
+
+
+def compactSamples(samples,bucketSize):
+    """ Reduce raw rows into OHLC buckets.
+
+    Parameters:
+    samples (list): Tuples of (id, symbol, timestamp, price, volume_24h, market_cap), ordered by id then timestamp.
+    bucketSize (int): Bucket width in seconds.
+
+    Returns:
+    A list of tuples ordered as bucketColumns.
+    """
+    buckets = []
+    key = lambda row: (row[0],row[2] - row[2] % bucketSize)
+    for (coinId,bucket),rows in itertools.groupby(samples,key):
+        rows = [row for row in rows if row[3] is not None]
+        if len(rows) == 0:
+            continue
+        prices = [row[3] for row in rows]
+        volumes = [row[4] for row in rows if row[4] is not None]
+        buckets.append((coinId,rows[-1][1],bucket,prices[0],max(prices),min(prices),prices[-1],
+                        sum(volumes) / len(volumes) if len(volumes) > 0 else None,rows[-1][5],
+                        len(rows),rows[0][2],rows[-1][2]))
+    return buckets
+
+
+def compactBuckets(rows,bucketSize):
+    """ Merge smaller buckets (ordered by id then bucket, as bucketColumns) into larger ones."""
+    merged = []
+    key = lambda row: (row[0],row[2] - row[2] % bucketSize)
+    for (coinId,bucket),group in itertools.groupby(rows,key):
+        group = list(group)
+        samples = sum(row[9] for row in group)
+        volumes = [(row[7],row[9]) for row in group if row[7] is not None]
+        volumeSamples = sum(count for _,count in volumes)
+        merged.append((coinId,group[-1][1],bucket,group[0][3],max(row[4] for row in group),min(row[5] for row in group),
+                       group[-1][6],sum(volume * count for volume,count in volumes) / volumeSamples if volumeSamples > 0 else None,
+                       group[-1][8],samples,group[0][10],group[-1][11]))
+    return merged
+
+
+class Retention():
+    """ Compacts old rows into hourly and daily OHLC buckets and expires old daily buckets.
+
+    Ages are measured back from the current time:
+    Rows older than fullResolutionDays are compacted into hourly buckets (0 keeps every row).
+    Hourly buckets older than hourlyDays are compacted into daily buckets (0 keeps hourly buckets).
+    Daily buckets older than dailyDays are dropped or moved to archiveFile (0 keeps daily buckets).
+
+    Work is done in small steps, one hour of rows or one day of hourly buckets per transaction,
+    so the database is never locked for long.
+    """
+
+    def __init__(self,database,layout,fullResolutionDays,hourlyDays=0,dailyDays=0,
+                 expiredAction=settings.retention_option_expired_action_default,archiveFile=None):
+        if expiredAction not in allowedExpiredActions:
+            log.warning("Retention expired action '{}' not valid, using default of {}".format(
+                expiredAction,settings.retention_option_expired_action_default))
+            expiredAction = settings.retention_option_expired_action_default
+        if expiredAction == settings.retention_expired_action_archive and archiveFile is None:
+            log.warning("Retention expired action '{}' needs an archive file, keeping expired rows".format(expiredAction))
+            dailyDays = 0
+        if hourlyDays > 0 and hourlyDays < fullResolutionDays:
+            log.warning("Retention hourly_days ({}) is less than full_resolution_days ({}), using {}".format(
+                hourlyDays,fullResolutionDays,fullResolutionDays))
+            hourlyDays = fullResolutionDays
+        if dailyDays > 0 and dailyDays < hourlyDays:
+            log.warning("Retention daily_days ({}) is less than hourly_days ({}), using {}".format(
+                dailyDays,hourlyDays,hourlyDays))
+            dailyDays = hourlyDays
+        self.__database = database
+        self.__layout = layout
+        self.__fullResolutionDays = fullResolutionDays
+        self.__hourlyDays = hourlyDays
+        self.__dailyDays = dailyDays
+        self.__expiredAction = expiredAction
+        self.__archiveFile = archiveFile
+        self.__tablesReady = False
+
+    def run(self,budgetSeconds,now=None):
+        """ Do retention work until there is none left or budgetSeconds has passed.
+
+        Parameters:
+        budgetSeconds (float): Time allowed for this run, at least one step is always done.
+        now (int): Unix time the ages are measured from, defaults to now.
+
+        Returns:
+        The number of steps completed.
+        """
+        if self.__fullResolutionDays <= 0:
+            return 0
+        deadline = time.monotonic() + budgetSeconds
+        steps = 0
+        while self.step(now):
+            steps = steps + 1
+            if time.monotonic() >= deadline:
+                break
+        return steps
+
+    def step(self,now=None):
+        """ Do the oldest outstanding piece of retention work.
+
+        Returns:
+        True if work was done, False if there is nothing left to do or the step failed.
+        """
+        now = int(time.time()) if now is None else now
+        if not self.__createTables():
+            return False
+        cutoff = self.__alignedCutoff(now,self.__fullResolutionDays,secondsPerHour)
+        oldest = self.__layout.getOldestTimestamp()
+        if oldest is not None and oldest < cutoff:
+            start = oldest - oldest % secondsPerHour
+            return self.__transaction(self.__compactSamples,start,start + secondsPerHour)
+        if self.__hourlyDays > 0:
+            cutoff = self.__alignedCutoff(now,self.__hourlyDays,secondsPerDay)
+            oldest = self.__oldestBucket(settings.database_hourly_table_name)
+            if oldest is not None and oldest < cutoff:
+                start = oldest - oldest % secondsPerDay
+                return self.__transaction(self.__compactHourly,start,start + secondsPerDay)
+        if self.__dailyDays > 0:
+            cutoff = self.__alignedCutoff(now,self.__dailyDays,secondsPerDay)
+            oldest = self.__oldestBucket(settings.database_daily_table_name)
+            if oldest is not None and oldest < cutoff:
+                return self.__expireDaily(cutoff)
+        return False
+
+    def __alignedCutoff(self,now,days,bucketSize):
+        cutoff = now - days * secondsPerDay
+        return cutoff - cutoff % bucketSize
+
+    def __createTables(self):
+        if self.__tablesReady:
+            return True
+        try:
+            self.__layout.prepare([])
+            for table in [settings.database_hourly_table_name,settings.database_daily_table_name]:
+                self.__database.con.execute("CREATE TABLE IF NOT EXISTS {}({}) WITHOUT ROWID".format(
+                    table,makeBucketColumnDefinition()))
+                self.__database.con.execute("CREATE INDEX IF NOT EXISTS {0}_bucket ON {0}(bucket)".format(table))
+            self.__database.con.commit()
+        except Exception as e:
+            log.error("Failed to create retention tables, exception '{}'".format(e))
+            return False
+        self.__tablesReady = True
+        return True
+
+    def __oldestBucket(self,table):
+        return self.__database.con.execute("SELECT MIN(bucket) FROM {}".format(table)).fetchone()[0]
+
+    def __transaction(self,work,start,end):
+        connection = self.__database.con
+        cursor = connection.cursor()
+        try:
+            if not connection.in_transaction:
+                cursor.execute("BEGIN")
+            work(cursor,start,end)
+            connection.commit()
+        except Exception as e:
+            log.error("Retention step for {} to {} failed, exception '{}'".format(start,end,e))
+            connection.rollback()
+            return False
+        return True
+
+    def __storeBuckets(self,cursor,table,buckets):
+        # Merged here rather than with ON CONFLICT DO UPDATE, which needs SQLite 3.24
+        if len(buckets) == 0:
+            return
+        existing = dict(((row[0],row[2]),row) for row in cursor.execute(
+            "SELECT {} FROM {} WHERE bucket >= ? AND bucket <= ?".format(",".join(bucketColumns),table),
+            (min(bucket[2] for bucket in buckets),max(bucket[2] for bucket in buckets))))
+        buckets = [mergeBucket(existing[(bucket[0],bucket[2])],bucket) if (bucket[0],bucket[2]) in existing else bucket
+                   for bucket in buckets]
+        cursor.executemany(makeBucketReplaceStatement(table),buckets)
+
+    def __compactSamples(self,cursor,start,end):
+        buckets = compactSamples(self.__layout.getSamplesBetween(start,end),secondsPerHour)
+        self.__storeBuckets(cursor,settings.database_hourly_table_name,buckets)
+        deleted = self.__layout.deleteSamplesBetween(cursor,start,end)
+        log.debug("Compacted {} rows from {} into {} hourly buckets".format(deleted,start,len(buckets)))
+
+    def __compactHourly(self,cursor,start,end):
+        rows = cursor.execute("SELECT {} FROM {} WHERE bucket >= ? AND bucket < ? ORDER BY {}, bucket".format(
+            ",".join(bucketColumns),settings.database_hourly_table_name,settings.CMC_data_id),(start,end)).fetchall()
+        buckets = compactBuckets(rows,secondsPerDay)
+        self.__storeBuckets(cursor,settings.database_daily_table_name,buckets)
+        cursor.execute("DELETE FROM {} WHERE bucket >= ? AND bucket < ?".format(settings.database_hourly_table_name),(start,end))
+        log.debug("Compacted {} hourly buckets from {} into {} daily buckets".format(len(rows),start,len(buckets)))
+
+    def __expireDaily(self,cutoff):
+        if self.__expiredAction == settings.retention_expired_action_drop:
+            return self.__transaction(self.__dropDaily,0,cutoff)
+        connection = self.__database.con
+        try:
+            # ATTACH cannot run inside a transaction
+            connection.commit()
+            connection.execute("ATTACH DATABASE ? AS archive",(self.__archiveFile,))
+        except Exception as e:
+            log.error("Cannot attach archive database '{}', exception '{}'".format(self.__archiveFile,e))
+            return False
+        try:
+            return self.__transaction(self.__archiveDaily,0,cutoff)
+        finally:
+            connection.execute("DETACH DATABASE archive")
+
+    def __dropDaily(self,cursor,start,end):
+        cursor.execute("DELETE FROM {} WHERE bucket < ?".format(settings.database_daily_table_name),(end,))
+        log.info("Dropped {} daily buckets older than {}".format(cursor.rowcount,end))
+
+    def __archiveDaily(self,cursor,start,end):
+        table = settings.database_daily_table_name
+        cursor.execute("CREATE TABLE IF NOT EXISTS archive.{}({}) WITHOUT ROWID".format(table,makeBucketColumnDefinition()))
+        cursor.execute("INSERT OR REPLACE INTO archive.{0} SELECT * FROM main.{0} WHERE bucket < ?".format(table),(end,))
+        cursor.execute("DELETE FROM main.{} WHERE bucket < ?".format(table),(end,))
+        log.info("Archived {} daily buckets older than {}".format(cursor.rowcount,end))
@@ -0,0 +1,126 @@
+import cmclogger.settings as settings
+from cmclogger.dataparser.isotime import isoToUnixTime
+from operator import itemgetter
+
+# Stands for the conversion currency in a path, entries have one quote per requested currency
+quoteCurrency = None
+
+# (column, path in the API data entry, column type, conversion)
+# A column of None is a field which must be present but isn't stored
+entrySchema = [
+        (settings.CMC_data_id, (settings.CMC_data_id,), settings.CMC_data_id_type, None),
+        (settings.CMC_data_name, (settings.CMC_data_name,), settings.CMC_data_name_type, None),
+        (settings.CMC_data_symbol, (settings.CMC_data_symbol,), settings.CMC_data_symbol_type, None),
+        (settings.CMC_data_slug, (settings.CMC_data_slug,), settings.CMC_data_slug_type, None),
+        (settings.CMC_data_cmc_rank, (settings.CMC_data_cmc_rank,), settings.CMC_data_cmc_rank_type, None),
+        (settings.CMC_data_num_market_pairs, (settings.CMC_data_num_market_pairs,), settings.CMC_data_num_market_pairs_type, None),
+        (settings.CMC_data_circulating_suuply, (settings.CMC_data_circulating_suuply,), settings.CMC_data_circulating_suuply_type, None),
+        (settings.CMC_data_total_supply, (settings.CMC_data_total_supply,), settings.CMC_data_total_supply_type, None),
+        (settings.CMC_data_max_supply, (settings.CMC_data_max_supply,), settings.CMC_data_max_supply_type, None),
+        (settings.CMC_data_last_updated, (settings.CMC_data_last_updated,), settings.CMC_data_last_updated_type, isoToUnixTime),
+        (settings.CMC_data_data_added, (settings.CMC_data_data_added,), settings.CMC_data_data_added_type, isoToUnixTime),
+        (None, (settings.CMC_data_tags,), None, None),
+        (None, (settings.CMC_data_platform,), None, None),
+        (settings.CMC_data_quote_price, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_quote_price), settings.CMC_data_quote_price_type, None),
+        (settings.CMC_data_quote_volume_24h, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_quote_volume_24h), settings.CMC_data_quote_volume_24h_type, None),
+        (settings.CMC_data_quote_market_cap, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_quote_market_cap), settings.CMC_data_quote_market_cap_type, None),
+        (settings.CMC_data_percent_change_1h, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_percent_change_1h), settings.CMC_data_percent_change_1h_type, None),
+        (settings.CMC_data_percent_change_24h, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_percent_change_24h), settings.CMC_data_percent_change_24h_type, None),
+        (settings.CMC_data_percent_change_7d, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_percent_change_7d), settings.CMC_data_percent_change_7d_type, None),
+        (None, (settings.CMC_data_quote,quoteCurrency,settings.CMC_data_last_updated), None, None)]
+
+extractErrorMissing = 'missing'
+extractErrorInvalid = 'invalid'
+
+
+def makeStoredColumns():
+    """ Stored columns of an entry and their sqlite3 types, in schema order."""
+    return [(column,columnType) for column,path,columnType,conversion in entrySchema if column is not None]
+
+
+class RowExtractor():
+    """ Checks API data entries against the schema and flattens them into rows, in one pass.
+
+    The row starts as a copy of the entry, its fields are checked with operator.itemgetter
+    lookups over the schema and the quote fields are added, so a good entry costs one lookup per
+    field. Where the error is in a bad entry is only worked out once the entry has failed.
+
+    Parameters:
+    currency (str): Conversion currency of the quote, None takes the entry's only quote.
+    """
+
+    def __init__(self,currency=None):
+        self.__currency = currency
+        self.__extract = self.__makeExtract()
+
+    def __makeExtract(self):
+        # Entry fields are stored under their own names
+        entryFields = [field for field in entrySchema if len(field[1]) == 1]
+        entryColumns = tuple(column for column,path,columnType,conversion in entryFields if column is not None)
+        checkedKeys = tuple(path[0] for column,path,columnType,conversion in entryFields if column is None)
+        getEntry = itemgetter(*entryColumns)
+        # Unstored quote fields come last, zip() stops at the last column but they are still read
+        quoteFields = [field for field in entrySchema if len(field[1]) > 1]
+        quoteFields = [field for field in quoteFields if field[0] is not None] + [field for field in quoteFields if field[0] is None]
+        quoteColumns = tuple(column for column,path,columnType,conversion in quoteFields if column is not None)
+        getQuote = itemgetter(*[path[-1] for column,path,columnType,conversion in quoteFields])
+        conversions = tuple((column,conversion) for column,path,columnType,conversion in entrySchema
+                            if column is not None and conversion is not None)
+        quoteKey = settings.CMC_data_quote
+        currency = self.__currency
+
+        def extract(entry,timestamp):
+            row = entry.copy()
+            quotes = row.pop(quoteKey)
+            quote = quotes[currency] if currency is not None else next(iter(quotes.values()))
+            for key in checkedKeys:
+                del row[key]
+            values = getEntry(row)
+            if len(row) != len(entryColumns):
+                # Fields the schema doesn't know about aren't kept
+                row = dict(zip(entryColumns,values))
+            row.update(zip(quoteColumns,getQuote(quote)))
+            for column,conversion in conversions:
+                row[column] = conversion(row[column])
+            row['timestamp'] = timestamp
+            return row
+        return extract
+
+    def extract(self,entry,timestamp):
+        """ Flatten an API data entry into a row.
+
+        Parameters:
+        entry (dict): Data entry from the API.
+        timestamp (int): Unix time the data was fetched, stored with the row.
+
+        Returns:
+        (row, None) for a good entry, otherwise (None, (field, reason)) where field is the dotted
+        path of the first bad field and reason is extractErrorMissing or extractErrorInvalid.
+        """
+        try:
+            return self.__extract(entry,timestamp),None
+        except (KeyError,TypeError,ValueError,AttributeError,StopIteration,OverflowError):
+            return None,self.findError(entry) or ('entry',extractErrorInvalid)
+
+    def findError(self,entry):
+        """ The first field of an entry which doesn't match the schema, None if there isn't one."""
+        for column,path,columnType,conversion in entrySchema:
+            value = entry
+            name = []
+            for key in path:
+                parent = ".".join(name) or 'entry'
+                try:
+                    if key is quoteCurrency:
+                        key = self.__currency if self.__currency is not None else next(iter(value),'*')
+                    name.append(str(key))
+                    value = value[key]
+                except (KeyError,IndexError):
+                    return ".".join(name),extractErrorMissing
+                except TypeError:
+                    return parent,extractErrorInvalid
+            if conversion is not None:
+                try:
+                    conversion(value)
+                except (TypeError,ValueError,AttributeError,OverflowError):
+                    return ".".join(name),extractErrorInvalid
+        return None
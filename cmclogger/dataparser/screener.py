@@ -0,0 +1,94 @@
+import cmclogger.settings as settings
+from cmclogger.dataparser.layout import makeDataBaseTableColumns
+from cmclogger.dataparser.latest import LatestTable
+import logging
+import re
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+screenOperators = ['>=', '<=', '!=', '>', '<', '=']
+filterPattern = re.compile(r'^\s*(\w+)\s*({})\s*([^\s<>=!]+)\s*$'.format("|".join(re.escape(operator) for operator in screenOperators)))
+
+
+def parseFilter(expression):
+    """ Split a filter such as 'market_cap>1e9' into (column, operator, value).
+
+    Returns:
+    The filter, None if it isn't valid.
+    """
+    match = filterPattern.match(expression)
+    if match is None:
+        return None
+    column,operator,value = match.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    return column,operator,value
+
+
+class Screener():
+    """ Sorts and filters the newest row of every coin by any stored column.
+
+    Current screens read the latest table, which has an index on the commonly screened columns. Screens
+    of a past time read the storage layout's cross section, the newest row of every coin within
+    settings.screen_lookback_seconds before it. The sort, filters and limit run in SQLite either way,
+    so only the selected rows are returned.
+
+    Parameters:
+    database (dbops.SQHelper): The database to read.
+    layout: The storage layout, read for past times and when there is no latest table yet.
+    latest (LatestTable): The latest table, created for database if None.
+    """
+
+    def __init__(self,database,layout,latest=None):
+        self.__database = database
+        self.__layout = layout
+        self.__latest = latest if latest is not None else LatestTable(database)
+
+    def screen(self,sortColumn,descending=True,limit=settings.screen_default_limit,filters=(),asOf=None):
+        """ Get the newest rows of the coins matching every filter, ordered by sortColumn.
+
+        Parameters:
+        sortColumn (str): The stored column to sort by, coins without a value are left out.
+        descending (bool): Sort from the highest value.
+        limit (int): Most rows to return, 0 for all of them.
+        filters (list): (column, operator, value) tuples, operator one of screenOperators.
+        asOf (int): Screen the rows stored at or before this unix time, the newest rows if None.
+
+        Returns:
+        A pandas.DataFrame of the rows in order, None if the sort column or a filter isn't valid.
+        """
+        columns = makeDataBaseTableColumns()
+        if sortColumn not in columns:
+            log.warning("Cannot screen by '{}', it is not a stored column".format(sortColumn))
+            return None
+        # Also lets the sort walk an index of the latest table
+        conditions = ["{} IS NOT NULL".format(sortColumn)]
+        parameters = []
+        for screenFilter in filters:
+            if screenFilter is None or screenFilter[0] not in columns or screenFilter[1] not in screenOperators:
+                log.warning("Screen filter '{}' not valid".format(screenFilter))
+                return None
+            conditions.append("{} {} ?".format(screenFilter[0],screenFilter[1]))
+            parameters.append(screenFilter[2])
+        source = self.__source(asOf)
+        if source is None:
+            return pd.DataFrame(columns=sorted(columns))
+        statement = "SELECT * FROM ({}) AS screen WHERE {} ORDER BY {} {}".format(
+            source," AND ".join(conditions),sortColumn,"DESC" if descending else "ASC")
+        if limit > 0:
+            statement = statement + " LIMIT ?"
+            parameters.append(int(limit))
+        try:
+            cursor = self.__database.con.execute(statement,parameters)
+        except Exception as e:
+            log.error("Screen query failed. Exception: {}".format(e))
+            return pd.DataFrame(columns=sorted(columns))
+        return pd.DataFrame(cursor.fetchall(),columns=[column[0] for column in cursor.description])
+
+    def __source(self,asOf):
+        if asOf is None and self.__latest.exists():
+            return "SELECT * FROM {}".format(settings.database_latest_table_name)
+        return self.__layout.crossSection(asOf)
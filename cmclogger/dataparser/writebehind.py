@@ -0,0 +1,215 @@
+import cmclogger.settings as settings
+from cmclogger.dataparser.publisher import StagedData
+import logging
+import threading
+import queue
+import json
+import time
+import os
+
+allowedPolicies = [
+        settings.write_queue_policy_block,
+        settings.write_queue_policy_drop_oldest,
+        settings.write_queue_policy_drop_newest,
+        settings.write_queue_policy_spill]
+log = logging.getLogger(__name__)
+
+
+class SharedStatus():
+    """ A status ConfigChecker used by both the daemon and the writer thread.
+
+    Every method call holds lock, so the file is never written while the other thread is changing
+    a value. Hold lock around updates made of several calls to keep them together in the file.
+
+    Parameters:
+    status (ConfigChecker): The status to share.
+    """
+
+    def __init__(self,status):
+        self.__status = status
+        self.lock = threading.RLock()
+
+    def __getattr__(self,name):
+        attribute = getattr(self.__status,name)
+        if not callable(attribute):
+            return attribute
+
+        def locked(*args,**kwargs):
+            with self.lock:
+                return attribute(*args,**kwargs)
+        return locked
+
+
+class WriteBehindQueue():
+    """ Bounded queue of API results written to storage by a dedicated writer thread.
+
+    The publisher is created by the writer thread through makePublisher, sqlite3 connections
+    can only be used by the thread which created them. A status it shares with other threads
+    should be wrapped in SharedStatus.
+
+    Policies applied when the queue is full:
+    block: Wait up to timeout seconds for space, then drop the new result.
+    drop_oldest: Discard the oldest queued result to make space.
+    drop_newest: Discard the new result.
+    spill: Append the new result to spillFile, it is written once the queue has drained.
+    """
+
+    def __init__(self,makePublisher,maxSize,policy=settings.write_queue_policy_block,timeout=0,spillFile=None):
+        if policy not in allowedPolicies:
+            log.warning("Write queue policy '{}' not valid, using default of {}".format(
+                policy,settings.database_option_write_queue_policy_default))
+            policy = settings.database_option_write_queue_policy_default
+        if policy == settings.write_queue_policy_spill and spillFile is None:
+            log.warning("Write queue policy '{}' needs a spill file, using {}".format(
+                policy,settings.write_queue_policy_block))
+            policy = settings.write_queue_policy_block
+        self.__makePublisher = makePublisher
+        self.__policy = policy
+        self.__timeout = timeout
+        self.__spillFile = spillFile
+        self.__spillLock = threading.Lock()
+        self.__spillPending = False
+        self.__queue = queue.Queue(maxsize=max(maxSize,1))
+        self.__dropped = 0
+        self.__spilled = 0
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__run,name='CMCLoggerWriter',daemon=True)
+        self.__thread.start()
+        log.debug("Write queue started with size {} and policy '{}'".format(maxSize,policy))
+
+    def getDroppedCount(self):
+        return self.__dropped
+
+    def getSpilledCount(self):
+        return self.__spilled
+
+    def pending(self):
+        return self.__queue.qsize()
+
+    def submit(self,status,data=None,timestamp=None):
+        """ Queue an API status and (optionally) its data for writing.
+
+        Parameters:
+        status (dict): The status of the API call.
+        data (list): The data returned by the API call (or StagedData), None if the call failed.
+        timestamp (int): Unix time the data was fetched, defaults to now.
+
+        Returns:
+        True if the result was queued or spilled, False if it was dropped.
+        """
+        if self.__closed:
+            log.error("Trying to submit to a closed write queue, result dropped")
+            return False
+        item = (status,data,int(time.time()) if timestamp is None else timestamp)
+        if self.__spillPending:
+            # Keep results in order until the spill file has been written
+            return self.__spill(item)
+        if self.__policy == settings.write_queue_policy_block:
+            try:
+                self.__queue.put(item,timeout=self.__timeout)
+                return True
+            except queue.Full:
+                return self.__drop("Write queue full after waiting {} seconds".format(self.__timeout))
+        try:
+            self.__queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        if self.__policy == settings.write_queue_policy_drop_newest:
+            return self.__drop("Write queue full, dropping newest result")
+        if self.__policy == settings.write_queue_policy_spill:
+            return self.__spill(item)
+        while True:
+            try:
+                self.__queue.get_nowait()
+                self.__queue.task_done()
+                self.__drop("Write queue full, dropping oldest result")
+            except queue.Empty:
+                pass
+            try:
+                self.__queue.put_nowait(item)
+                return True
+            except queue.Full:
+                continue
+
+    def close(self,timeout=None):
+        """ Stop accepting results and wait for everything queued (and spilled) to be written.
+
+        Returns:
+        True if the writer finished within timeout.
+        """
+        if self.__closed:
+            return not self.__thread.is_alive()
+        self.__closed = True
+        self.__queue.put(None)
+        self.__thread.join(timeout)
+        if self.__thread.is_alive():
+            log.error("Write queue did not drain within {} seconds, {} results pending".format(timeout,self.pending()))
+            return False
+        log.info("Write queue drained, {} results dropped, {} spilled".format(self.__dropped,self.__spilled))
+        return True
+
+    def __drop(self,message):
+        self.__dropped = self.__dropped + 1
+        log.warning("{} ({} dropped)".format(message,self.__dropped))
+        return False
+
+    def __spill(self,item):
+        try:
+            with self.__spillLock:
+                with open(self.__spillFile,'a') as f:
+                    f.write(json.dumps(item + (isinstance(item[1],StagedData),)) + '\n')
+                self.__spillPending = True
+        except (OSError,TypeError,ValueError) as e:
+            return self.__drop("Write queue full and spill failed with exception '{}'".format(e))
+        self.__spilled = self.__spilled + 1
+        log.warning("Write queue full, result spilled to '{}'".format(self.__spillFile))
+        return True
+
+    def __run(self):
+        publisher = self.__makePublisher()
+        self.__replaySpill(publisher)
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                self.__replaySpill(publisher)
+                self.__queue.task_done()
+                return
+            self.__write(publisher,item)
+            self.__queue.task_done()
+            if self.__queue.empty():
+                self.__replaySpill(publisher)
+
+    def __write(self,publisher,item):
+        status,data,timestamp = item
+        try:
+            publisher.writeStatus(status)
+            if data is not None:
+                publisher.writeData(data,timestamp)
+        except Exception as e:
+            log.error("Write queue failed to store result, exception '{}'".format(e))
+
+    def __replaySpill(self,publisher):
+        if self.__spillFile is None:
+            return
+        replayFile = self.__spillFile + '.replay'
+        with self.__spillLock:
+            self.__spillPending = False
+            if not os.path.exists(self.__spillFile):
+                return
+            os.replace(self.__spillFile,replayFile)
+        replayed = 0
+        with open(replayFile,'r') as f:
+            for line in f:
+                try:
+                    fields = json.loads(line)
+                    # Results spilled before staged data existed have no staged flag
+                    status,data,timestamp,staged = fields if len(fields) == 4 else fields + [False]
+                except ValueError as e:
+                    log.error("Skipping unreadable spilled result, exception '{}'".format(e))
+                    continue
+                item = (status,StagedData(timestamp,data) if staged else data,timestamp)
+                self.__write(publisher,item)
+                replayed = replayed + 1
+        os.remove(replayFile)
+        log.info("Wrote {} spilled results from '{}'".format(replayed,self.__spillFile))
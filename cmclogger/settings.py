@@ -6,6 +6,13 @@ status_file_directory = data_file_directory
 log_file_name = "log"
 database_file_name = 'cryptoData.db'
 status_file_name = 'status.ini'
+write_queue_spill_file_name = 'spill.jsonl'
+write_queue_drain_timeout_seconds = 60
+retention_archive_file_name = 'archive.db'
+parquet_archive_directory = 'parquet'
+parquet_archive_file_name = 'data.parquet'
+parquet_archive_compression = 'zstd'
+capture_file_name = 'capture.jsonl.gz'
 appNameDirectory = 'CMCLogger'
 
 # Configuration file section and option names
@@ -22,14 +29,106 @@ API_option_end_index = 'rank_end_index'
 API_option_end_index_default = 200
 API_option_interval = 'request_interval'
 API_option_interval_default = 5
+API_option_page_size = 'page_size'
+API_option_page_size_default = 0
+API_option_fetch_workers = 'fetch_workers'
+API_option_fetch_workers_default = 4
+API_option_extra_keys = 'api_extra_keys'
+API_option_extra_keys_default = ''
+API_option_key_requests_per_minute = 'key_requests_per_minute'
+API_option_key_requests_per_minute_default = 0
+API_option_watchlist = 'watchlist'
+API_option_watchlist_default = ''
 
 general_section_name = "General"
 general_option_status_file_format = 'status_file_format'
 general_option_status_file_format_default = 'ini'
+general_option_capture_responses = 'capture_responses'
+general_option_capture_responses_default = False
+
+database_section_name = "Database"
+database_option_layout = 'storage_layout'
+database_layout_symbol = 'symbol'
+database_layout_quotes = 'quotes'
+database_option_layout_default = database_layout_symbol
+database_option_write_queue_size = 'write_queue_size'
+database_option_write_queue_size_default = 0
+database_option_write_queue_policy = 'write_queue_policy'
+write_queue_policy_block = 'block'
+write_queue_policy_drop_oldest = 'drop_oldest'
+write_queue_policy_drop_newest = 'drop_newest'
+write_queue_policy_spill = 'spill'
+database_option_write_queue_policy_default = write_queue_policy_block
+database_option_write_queue_timeout = 'write_queue_timeout'
+database_option_write_queue_timeout_default = 30
+database_option_change_only = 'change_only'
+database_option_change_only_default = False
+database_option_journal_mode = 'journal_mode'
+database_journal_modes = ['wal', 'delete', 'truncate', 'persist']
+database_option_journal_mode_default = 'wal'
+database_option_synchronous = 'synchronous'
+database_synchronous_modes = ['off', 'normal', 'full', 'extra']
+database_option_synchronous_default = 'normal'
+database_option_cache_size_kb = 'cache_size_kb'
+database_option_cache_size_kb_default = 8192
+database_option_mmap_size_mb = 'mmap_size_mb'
+database_option_mmap_size_mb_default = 64
+database_option_busy_timeout_ms = 'busy_timeout_ms'
+database_option_busy_timeout_ms_default = 5000
+
+retention_section_name = "Retention"
+retention_option_full_resolution_days = 'full_resolution_days'
+retention_option_full_resolution_days_default = 0
+retention_option_hourly_days = 'hourly_days'
+retention_option_hourly_days_default = 90
+retention_option_daily_days = 'daily_days'
+retention_option_daily_days_default = 0
+retention_option_expired_action = 'expired_action'
+retention_expired_action_drop = 'drop'
+retention_expired_action_archive = 'archive'
+retention_option_expired_action_default = retention_expired_action_archive
+retention_option_run_seconds = 'run_seconds'
+retention_option_run_seconds_default = 2
+retention_option_parquet_after_days = 'parquet_after_days'
+retention_option_parquet_after_days_default = 0
+
+scheduler_section_name = "Scheduler"
+scheduler_option_jobs = 'jobs'
+scheduler_option_jobs_default = ''
+scheduler_job_section_prefix = "Job "
+scheduler_job_option_priority = 'priority'
+scheduler_job_option_priority_default = 0
+scheduler_default_job_name = 'default'
+
+credits_section_name = "Credits"
+credits_option_daily_limit = 'daily_credit_limit'
+credits_option_daily_limit_default = 0
+credits_option_monthly_limit = 'monthly_credit_limit'
+credits_option_monthly_limit_default = 0
+credits_option_billing_day = 'billing_day'
+credits_option_billing_day_default = 1
+credits_option_min_interval_scale = 'min_interval_scale'
+credits_option_min_interval_scale_default = 1.0
+
+# Database table names which are not cryptocurrency symbols
+database_quotes_table_name = 'quotes'
+database_hourly_table_name = 'ohlc_1h'
+database_daily_table_name = 'ohlc_1d'
+database_latest_table_name = 'latest'
+database_reserved_tables = [database_quotes_table_name, database_hourly_table_name, database_daily_table_name,
+                            database_latest_table_name]
+# Columns of the latest table indexed for screener queries
+database_latest_indexed_columns = ['cmc_rank', 'market_cap', 'volume_24h', 'percent_change_24h']
+# A screener query of a past time covers the coins with a row in this many seconds before it
+screen_lookback_seconds = 86400
+screen_default_limit = 20
+# Symbols read per statement by a batch query, below SQLite's limits on compound selects and parameters
+database_batch_query_size = 250
 
 # Data output json infomration
 output_json_last_call = "last_call"
 output_json_health = "health"
+output_json_error = "error"
 
 # Coinmarketcap API information
 getLatest_Url = 'https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest'
@@ -43,14 +142,31 @@ getLatest_Headers = {
         'Accepts'           : 'application/json',
         'X-CMC_PRO_API_KEY' : 'default'
         }
+getLatest_key_header = 'X-CMC_PRO_API_KEY'
+quotes_Url = 'https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest'
+# Coins asked for per quotes request, each 100 coins use a credit
+quotes_batch_size = 100
 API_call_timeout_seconds = 5
+# Seconds a key is left out of the key pool after the server rejects it
+key_pool_rate_limited_seconds = 60
+key_pool_unauthorized_seconds = 3600
+getLatest_stream_chunk_size = 65536
 API_callRetriesOnFailure = 3
+# Backoff between retries, and the circuit breaker skipping calls while the API is unreachable
+API_retry_base_seconds = 1
+API_retry_max_seconds = 8
+API_circuit_failure_threshold = 3
+API_circuit_reset_seconds = 60
+API_circuit_max_reset_seconds = 900
 
 CMC_status_timestamp = 'timestamp'
 CMC_status_error_code = 'error_code'
 CMC_status_error_message = 'error_message'
 CMC_status_elapsed = 'elapsed'
 CMC_status_credit_count = 'credit_count'
+CMC_coins_per_credit = 200
+CMC_quotes_per_credit = 100
+CMC_max_limit = 5000
 
 CMC_data_id = "id"
 CMC_data_id_type = "INTEGER"
@@ -92,6 +208,9 @@ CMC_data_percent_change_24h_type = "REAL"
 CMC_data_percent_change_7d = "percent_change_7d"
 CMC_data_percent_change_7d_type = "REAL"
 
+# Number of distinct ISO 8601 timestamps kept by the unix time conversion cache
+iso_time_cache_size = 16384
+
 # Status file section and option names
 status_file_last_call_section_name = 'Last Successful Call'
 status_file_option_timeStamp = CMC_status_timestamp
@@ -105,19 +224,47 @@ status_file_current_session_section_name = 'Current Session'
 status_file_option_successful_calls = 'successful_calls'
 status_file_option_failed_calls = 'failed_calls'
 status_file_option_success_rate = 'success_rate'
+status_file_option_suppressed_rows = 'suppressed_rows'
 
 status_file_all_time_section_name = 'All Time'
 
 status_file_last_failed_secion_name = 'Last Failed Call'
+status_file_credit_usage_section_name = 'Credit Usage'
+status_file_option_credits_day = 'day'
+status_file_option_credits_today = 'credits_today'
+status_file_option_credits_period = 'billing_period'
+status_file_option_credits_this_period = 'credits_this_period'
+status_file_retries_section_name = 'Retries'
+status_file_option_last_call_retries = 'last_call_retries'
+status_file_option_last_call_retry_seconds = 'last_call_retry_seconds'
+status_file_option_skipped_calls = 'skipped_calls'
+status_file_option_circuit_state = 'circuit_state'
 
 # Data query information
 data_query_type = "query_type"
 data_query_type_price = "query_type_price"
 data_query_type_status = "query_type_status"
+data_query_type_batch = "query_type_batch"
+data_query_type_range = "query_type_range"
+data_query_type_screen = "query_type_screen"
 data_query_tag = "query_tag"
+data_query_tags = "query_tags"
+data_query_as_of = "query_as_of"
+data_query_start = "query_start"
+data_query_end = "query_end"
+data_query_columns = "query_columns"
+data_query_interval = "query_interval"
+data_query_sort = "query_sort"
+data_query_ascending = "query_ascending"
+data_query_limit = "query_limit"
+data_query_filters = "query_filters"
 data_query_format = "output_format"
 data_query_format_stdout = "output_format_stdout"
 data_query_format_json = "output_format_json"
 data_query_detail = "output_detail"
 data_query_detail_short = "output_detail_short"
 data_query_detail_long = "output_detail_long"
+
+# Cross-asset analytics, returns are measured against the benchmark and annualised over a year of constant trading
+analytics_benchmark_symbol = 'BTC'
+analytics_seconds_per_year = 365 * 86400
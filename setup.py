@@ -37,4 +37,7 @@ setuptools.setup(
         'jdcal',
         'openpyxl'
     ],
+    extras_require={
+        'parquet': ['pyarrow']
+    },
     )
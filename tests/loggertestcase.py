@@ -0,0 +1,31 @@
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import cmclogger.settings as settings
+from cmclogger.cmclogger import CMCLogger
+
+
+class LoggerTestCase(unittest.TestCase):
+    """ Runs each test with a CMCLogger set up in its own temporary working directory.
+
+    The directory is removed after the test, so suites never share status, configuration or
+    database files. Set configuration to the text of a config.ini written before the logger starts.
+    """
+
+    configuration = None
+
+    def setUp(self):
+        self.workingDirectory = tempfile.mkdtemp()
+        if self.configuration is not None:
+            with open(os.path.join(self.workingDirectory,settings.input_configuation_filename),'w') as f:
+                f.write(self.configuration)
+        self.logger = CMCLogger(self.workingDirectory,logging.CRITICAL)
+        self.status = self.logger.get_status_file()
+        self.config = self.logger.get_config_file()
+        self.database = self.logger.get_database()
+
+    def tearDown(self):
+        self.database.con.close()
+        shutil.rmtree(self.workingDirectory,ignore_errors=True)
@@ -0,0 +1,70 @@
+import unittest
+import logging
+import numpy as np
+import pandas as pd
+from cmclogger.analytics import measures
+logging.disable(logging.CRITICAL)
+
+nan = np.nan
+
+def makePrices():
+    random = np.random.RandomState(1)
+    prices = 100 * np.exp(np.cumsum(random.normal(0,0.01,(200,4)),axis=0))
+    # A coin listed late and one with gaps
+    prices[:50,2] = nan
+    prices[[60,61,120],3] = nan
+    return prices
+
+class Vectorised_measures(unittest.TestCase):
+
+    def test_forward_fill_keeps_leading_and_trailing_gaps(self):
+        values = np.array([[nan,1.0],[2.0,nan],[nan,nan],[3.0,4.0],[nan,nan]])
+        filled = measures.forwardFill(values)
+        np.testing.assert_array_equal(filled[:,0],[nan,2.0,2.0,3.0,nan])
+        np.testing.assert_array_equal(filled[:,1],[1.0,1.0,1.0,4.0,nan])
+
+    def test_returns_over_several_periods(self):
+        prices = np.array([[1.0],[2.0],[4.0],[2.0]])
+        np.testing.assert_array_equal(measures.simpleReturns(prices)[:,0],[nan,1.0,1.0,-0.5])
+        np.testing.assert_array_equal(measures.simpleReturns(prices,2)[:,0],[nan,nan,3.0,0.0])
+        np.testing.assert_allclose(measures.logReturns(prices)[1:,0],np.log([2.0,2.0,0.5]))
+        self.assertTrue(np.isnan(measures.simpleReturns(prices,5)).all())
+
+    def test_returns_from_a_zero_price_are_nan(self):
+        prices = np.array([[1.0],[0.0],[2.0],[0.0]])
+        with np.errstate(all='raise'):
+            simple = measures.simpleReturns(prices)
+            logarithmic = measures.logReturns(prices)
+        np.testing.assert_array_equal(simple[:,0],[nan,-1.0,nan,-1.0])
+        self.assertTrue(np.isnan(logarithmic).all())
+
+    def test_rolling_volatility_matches_pandas(self):
+        returns = measures.logReturns(makePrices())
+        expected = pd.DataFrame(returns).rolling(20).std().to_numpy()
+        np.testing.assert_allclose(measures.rollingVolatility(returns,20),expected,equal_nan=True,atol=1e-12)
+
+    def test_drawdowns_from_previous_high(self):
+        prices = np.array([[nan],[10.0],[5.0],[12.0],[9.0]])
+        np.testing.assert_allclose(measures.drawdowns(prices)[:,0],[nan,0.0,-0.5,0.0,-0.25])
+
+    def test_covariance_and_correlation_match_pandas_pairwise(self):
+        returns = pd.DataFrame(measures.simpleReturns(makePrices()))
+        np.testing.assert_allclose(measures.covarianceMatrix(returns.to_numpy()),returns.cov().to_numpy(),atol=1e-15)
+        np.testing.assert_allclose(measures.correlationMatrix(returns.to_numpy()),returns.corr().to_numpy(),atol=1e-12)
+
+    def test_betas_against_benchmark_column(self):
+        returns = measures.simpleReturns(makePrices())
+        beta = measures.betas(returns,0)
+        for coin in range(returns.shape[1]):
+            shared = ~np.isnan(returns[:,coin]) & ~np.isnan(returns[:,0])
+            x,y = returns[shared,coin],returns[shared,0]
+            self.assertAlmostEqual(beta[coin],np.cov(x,y)[0,1] / np.var(y,ddof=1))
+        self.assertAlmostEqual(beta[0],1.0)
+
+    def test_pairs_sharing_too_few_rows_are_nan(self):
+        returns = np.array([[0.1,nan],[0.2,nan],[0.3,0.1],[0.1,nan]])
+        self.assertTrue(np.isnan(measures.correlationMatrix(returns)[0,1]))
+        self.assertTrue(np.isnan(measures.covarianceMatrix(returns)[1,1]))
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,58 @@
+import unittest
+import logging
+import numpy as np
+import pandas as pd
+from cmclogger.analytics.pricematrix import makePriceMatrix
+from cmclogger.cmclogger import CMCLogger
+import cmclogger.settings as settings
+logging.disable(logging.CRITICAL)
+
+def makeFrame(rows):
+    return pd.DataFrame(rows,columns=[settings.CMC_data_symbol,'timestamp',settings.CMC_data_quote_price])
+
+class Price_matrix(unittest.TestCase):
+
+    def test_rows_are_aligned_by_coin_and_timestamp(self):
+        matrix = makePriceMatrix(makeFrame([('ETH',100,2.0),('BTC',100,10.0),('BTC',200,11.0),('ETH',300,3.0),('BTC',300,12.0)]))
+        self.assertEqual(matrix.symbols,['BTC','ETH'])
+        np.testing.assert_array_equal(matrix.timestamps,[100,200,300])
+        np.testing.assert_array_equal(matrix.prices,[[10.0,2.0],[11.0,2.0],[12.0,3.0]])
+        self.assertEqual(matrix.interval,100)
+
+    def test_interval_aligns_calls_a_few_seconds_apart(self):
+        matrix = makePriceMatrix(makeFrame([('BTC',300,10.0),('BTC',305,11.0),('ETH',302,2.0),('BTC',601,12.0)]),interval=300)
+        np.testing.assert_array_equal(matrix.timestamps,[300,600])
+        np.testing.assert_array_equal(matrix.prices,[[11.0,2.0],[12.0,np.nan]])
+
+    def test_gaps_can_be_left_unfilled(self):
+        matrix = makePriceMatrix(makeFrame([('BTC',100,10.0),('BTC',200,11.0),('ETH',100,2.0),('ETH',300,3.0),('BTC',300,12.0)]),fill=False)
+        self.assertTrue(np.isnan(matrix.prices[1,1]))
+
+    def test_beta_needs_the_benchmark(self):
+        matrix = makePriceMatrix(makeFrame([('ETH',100,2.0),('ETH',200,3.0),('ETH',300,2.0)]))
+        self.assertIs(matrix.beta(),None)
+        self.assertEqual(matrix.beta('ETH')[0],1.0)
+
+    def test_empty_matrix(self):
+        matrix = makePriceMatrix(makeFrame([]))
+        self.assertIs(len(matrix),0)
+        self.assertEqual(matrix.correlation().shape,(0,0))
+        self.assertEqual(len(matrix.maxDrawdowns()),0)
+
+    def test_measures_of_stored_quotes(self):
+        logger = CMCLogger('tests/mockData',logging.CRITICAL)
+        matrix = logger.get_price_matrix(['BTC','ETH','XRP'],interval=300)
+        self.assertEqual(matrix.symbols,['BTC','ETH','XRP'])
+        self.assertEqual(matrix.prices.shape,(len(matrix),3))
+        self.assertFalse(np.isnan(matrix.prices).any())
+        beta = matrix.toDataFrame(matrix.beta())
+        self.assertAlmostEqual(beta['BTC'],1.0)
+        correlation = matrix.toDataFrame(matrix.correlation(),byCoin=True)
+        np.testing.assert_allclose(np.diag(correlation),1.0)
+        self.assertTrue((matrix.maxDrawdowns() <= 0).all())
+        volatility = matrix.volatility(12)
+        self.assertTrue(np.isnan(volatility[:12]).all())
+        self.assertTrue((volatility[12:] > 0).all())
+
+if __name__ == '__main__':
+    unittest.main();
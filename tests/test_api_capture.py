@@ -0,0 +1,125 @@
+import unittest
+from unittest import mock
+import logging
+import os
+import gzip
+import io
+import json
+import copy
+from configchecker import ConfigChecker
+from cmclogger.api.capture import ResponseCapture, readCapture, groupCalls
+from cmclogger.api.getlatest import CMCGetLatest
+from tests.loggertestcase import LoggerTestCase
+from cmclogger.dataparser.publisher import StagedData
+import cmclogger.settings as settings
+from tests.test_api_getlatest import makePageResponse, response_200, StreamedResponse
+logging.disable(logging.CRITICAL)
+
+captureFile = os.path.join('tests','capture.jsonl.gz')
+
+def makeConfig(endIndex=25,pageSize=10):
+    config = ConfigChecker()
+    config.set_expectation(settings.API_section_name,settings.API_option_private_key,str,settings.API_option_privatate_key_default)
+    config.set_expectation(settings.API_section_name,settings.API_option_conversion_currency,str,'AUD')
+    config.set_expectation(settings.API_section_name,settings.API_option_start_index,int,1)
+    config.set_expectation(settings.API_section_name,settings.API_option_end_index,int,endIndex)
+    config.set_expectation(settings.API_section_name,settings.API_option_interval,int,settings.API_option_interval_default)
+    config.set_expectation(settings.API_section_name,settings.API_option_page_size,int,pageSize)
+    config.set_configuration_file('');
+    return config
+
+def removeCapture():
+    if os.path.exists(captureFile):
+        os.remove(captureFile)
+
+def readWholeBody(response):
+    raise AssertionError("The whole body of a streamed response was read")
+
+class UnreadableTextResponse(StreamedResponse):
+    text = property(readWholeBody)
+
+class Capturing_responses(unittest.TestCase):
+
+    def setUp(self):
+        removeCapture()
+        self.capture = ResponseCapture(captureFile)
+
+    def tearDown(self):
+        removeCapture()
+
+    def test_responses_are_read_back_in_order(self):
+        for call in [1,1,2]:
+            self.capture.record(1585000000 + call,call,{'start' : call},200,'{"call": %d}' % call)
+        records = list(readCapture(captureFile))
+        self.assertEqual([record['call'] for record in records],[1,1,2])
+        self.assertEqual(records[2],{'timestamp' : 1585000002,'call' : 2,'parameters' : {'start' : 2},'status_code' : 200,'body' : '{"call": 2}'})
+        self.assertEqual([len(call) for call in groupCalls(records)],[2,1])
+
+    def test_incomplete_last_response_is_skipped(self):
+        self.capture.record(1585000000,1,{},200,'complete')
+        with open(captureFile,'ab') as f:
+            f.write(gzip.compress(b'{"timestamp": 1585000001, "call": 2, "bo')[:-8])
+        self.assertEqual([record['body'] for record in readCapture(captureFile)],['complete'])
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_captured_pages_replay_to_same_rows(self,session_mock):
+        session_mock.side_effect = lambda url,params,timeout: makePageResponse(params)
+        api = CMCGetLatest(makeConfig())
+        api.setCapture(self.capture)
+        live = StagedData(1585000000)
+        self.assertIs(api.getLatest(stage=live),True)
+        calls = list(groupCalls(readCapture(captureFile)))
+        self.assertEqual(len(calls),1)
+        self.assertEqual(sorted(record['parameters']['start'] for record in calls[0]),[1,11,21])
+        replayed = StagedData(calls[0][0]['timestamp'])
+        self.assertIs(CMCGetLatest(makeConfig(1,0)).replayCall(calls[0],replayed),True)
+        self.assertEqual(sorted(replayed,key=lambda row: row[settings.CMC_data_cmc_rank]),
+                         sorted(live,key=lambda row: row[settings.CMC_data_cmc_rank]))
+
+    @mock.patch('cmclogger.api.getlatest.settings.getLatest_stream_chunk_size',7)
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_streamed_response_is_captured_without_reading_text(self,session_mock):
+        body = copy.deepcopy(response_200)
+        body['data'][0]['name'] = 'Bitcoin \u20ac'
+        response = UnreadableTextResponse()
+        response.status_code = 200
+        response.raw = io.BytesIO(json.dumps(body,ensure_ascii=False).encode('utf-8'))
+        session_mock.return_value = response
+        api = CMCGetLatest(makeConfig(1,0))
+        api.setCapture(self.capture)
+        live = StagedData(1585000000)
+        self.assertIs(api.getLatest(stage=live),True)
+        records = list(readCapture(captureFile))
+        self.assertEqual(len(records),1)
+        self.assertEqual(json.loads(records[0]['body']),body)
+        replayed = StagedData(records[0]['timestamp'])
+        self.assertIs(CMCGetLatest(makeConfig(1,0)).replayCall(records,replayed),True)
+        self.assertEqual(replayed,live)
+
+    def test_failed_response_replays_as_failed_call(self):
+        self.capture.record(1585000000,1,{'start' : 1,'limit' : 1,'convert' : 'AUD'},500,json.dumps({'status' : response_200['status']}))
+        api = CMCGetLatest(makeConfig())
+        self.assertIs(api.replayCall(next(groupCalls(readCapture(captureFile)))),False)
+        self.assertEqual(api.getLatestStatus(),response_200['status'])
+
+class Replaying_captures(LoggerTestCase):
+
+    def setUp(self):
+        LoggerTestCase.setUp(self)
+        self.captureFile = os.path.join(self.workingDirectory,'capture.jsonl.gz')
+        capture = ResponseCapture(self.captureFile)
+        for call,timestamp in enumerate([1585000000,1585000300]):
+            capture.record(timestamp,call,{'start' : 1,'limit' : 1,'convert' : 'AUD'},200,json.dumps(response_200))
+
+    def test_captured_calls_are_stored_with_their_timestamps(self):
+        self.assertEqual(self.logger.replay_capture(self.captureFile),(2,2))
+        history = self.logger.get_history('BTC')
+        self.assertEqual(list(history['timestamp']),[1585000000,1585000300])
+
+    @mock.patch('cmclogger.cmclogger.time.sleep')
+    def test_replay_is_paced_by_speed(self,sleep_mock):
+        self.logger.replay_capture(self.captureFile,10)
+        sleep_mock.assert_called_once_with(30)
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,112 @@
+import unittest
+import logging
+import calendar
+from configchecker import ConfigChecker
+from cmclogger.api.creditbudget import CreditBudget, expectedCredits, expectedQuoteCredits, billingPeriodBounds
+from cmclogger.api.scheduler import Scheduler
+import cmclogger.settings as settings
+logging.disable(logging.CRITICAL)
+
+# 2020-03-16 00:00 UTC, 16 days (of 31) into the month
+midMonth = calendar.timegm((2020,3,16,0,0,0))
+
+class FakeClock():
+
+    def __init__(self,now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def makeStatus():
+    status = ConfigChecker()
+    status.set_expectation(settings.status_file_credit_usage_section_name,settings.status_file_option_credits_day,str,'')
+    status.set_expectation(settings.status_file_credit_usage_section_name,settings.status_file_option_credits_today,int,0)
+    status.set_expectation(settings.status_file_credit_usage_section_name,settings.status_file_option_credits_period,str,'')
+    status.set_expectation(settings.status_file_credit_usage_section_name,settings.status_file_option_credits_this_period,int,0)
+    status.set_configuration_file('')
+    return status
+
+class Credit_budget(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(midMonth + 12 * 3600)
+        self.status = makeStatus()
+
+    def test_expected_credits_per_call(self):
+        self.assertIs(expectedCredits(200),1)
+        self.assertIs(expectedCredits(201),2)
+        self.assertIs(expectedCredits(1000,100),10)
+        self.assertIs(expectedCredits(1000,200),5)
+        self.assertIs(expectedCredits(250,200),2)
+
+    def test_expected_credits_per_watchlist_call(self):
+        self.assertIs(expectedQuoteCredits(30),1)
+        self.assertIs(expectedQuoteCredits(101),2)
+        self.assertIs(expectedQuoteCredits(200),2)
+
+    def test_billing_period_starts_on_billing_day(self):
+        self.assertEqual(billingPeriodBounds(midMonth,1),(calendar.timegm((2020,3,1,0,0,0)),calendar.timegm((2020,4,1,0,0,0))))
+        self.assertEqual(billingPeriodBounds(midMonth,20),(calendar.timegm((2020,2,20,0,0,0)),calendar.timegm((2020,3,20,0,0,0))))
+        self.assertEqual(billingPeriodBounds(calendar.timegm((2020,12,25,0,0,0)),20)[1],calendar.timegm((2021,1,20,0,0,0)))
+
+    def test_no_limits_keeps_intervals(self):
+        budget = CreditBudget(self.status,clock=self.clock)
+        budget.addJob('job',60,1)
+        self.assertEqual(budget.intervalFor(60),60)
+        self.assertIs(budget.isConstrained(),False)
+
+    def test_interval_is_stretched_to_last_the_month(self):
+        budget = CreditBudget(self.status,monthlyLimit=10000,clock=self.clock)
+        budget.addJob('job',60,1)
+        # 15.5 days left at one credit a minute is 22320 credits
+        self.assertAlmostEqual(budget.intervalFor(60),60 * 22320 / 10000)
+        budget.record('other',5000)
+        self.assertAlmostEqual(budget.intervalFor(60),60 * 22320 / 5000)
+        self.assertIs(budget.isConstrained(),True)
+
+    def test_interval_is_compressed_down_to_minimum_scale(self):
+        budget = CreditBudget(self.status,monthlyLimit=1000000,minScale=0.5,clock=self.clock)
+        budget.addJob('job',60,1)
+        self.assertEqual(budget.intervalFor(60),30)
+        self.assertIs(budget.isConstrained(),False)
+
+    def test_most_constrained_limit_is_used(self):
+        budget = CreditBudget(self.status,dailyLimit=360,monthlyLimit=1000000,clock=self.clock)
+        budget.addJob('job',60,1)
+        # Half a day left is 720 credits at the configured interval
+        self.assertAlmostEqual(budget.intervalFor(60),120)
+
+    def test_exhausted_limit_waits_for_reset(self):
+        budget = CreditBudget(self.status,dailyLimit=100,clock=self.clock)
+        budget.addJob('job',60,1)
+        budget.record('other',100)
+        self.assertEqual(budget.intervalFor(60),12 * 3600 + 60)
+        self.clock.now = self.clock.now + 12 * 3600
+        self.assertEqual(budget.getUsage(),(0,100))
+        # A full day at one credit a minute is 1440 credits
+        self.assertAlmostEqual(budget.intervalFor(60),60 * 1440 / 100)
+
+    def test_usage_is_kept_in_status(self):
+        CreditBudget(self.status,monthlyLimit=100,clock=self.clock).record('job',7)
+        budget = CreditBudget(self.status,monthlyLimit=100,clock=self.clock)
+        self.assertEqual(budget.getUsage(),(7,7))
+        self.assertEqual(self.status.get_value(settings.status_file_credit_usage_section_name,settings.status_file_option_credits_period),'2020-03-01')
+
+    def test_page_size_is_credit_aligned_when_constrained(self):
+        budget = CreditBudget(self.status,monthlyLimit=10,clock=self.clock)
+        budget.addJob('job',60,1)
+        self.assertIs(budget.pageSize(150),200)
+        self.assertIs(budget.pageSize(0),0)
+        self.assertIs(CreditBudget(self.status,clock=self.clock).pageSize(150),150)
+
+    def test_scheduler_uses_stretched_intervals(self):
+        budget = CreditBudget(self.status,dailyLimit=360,clock=self.clock)
+        budget.addJob('job',60,1)
+        scheduler = Scheduler(FakeClock(0),budget.intervalFor)
+        scheduler.addJob('job',lambda: budget.record('job',1),60)
+        scheduler.runDue()
+        self.assertAlmostEqual(scheduler.secondsToNextRun(),60 * 720 / 359)
+
+if __name__ == '__main__':
+    unittest.main();
@@ -1,13 +1,16 @@
 import unittest
 from unittest import mock
 import logging
-from cmclogger.api.getlatest import CMCGetLatest
+from cmclogger.api.getlatest import CMCGetLatest, skippedCallErrorCode, stoppedCallErrorCode
+from cmclogger.api.retrypolicy import RetryPolicy, CircuitBreaker
 from configchecker import ConfigChecker
 from requests.models import Response
 from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
 import cmclogger.settings as settings
+from cmclogger.dataparser.publisher import StagedData
 import json
 import datetime
+import io
 
 logging.disable(logging.CRITICAL)
 
@@ -142,7 +145,7 @@ class API_getting_requests(unittest.TestCase):
 
         self.api = CMCGetLatest(self.config)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_correctly_formed_api_call(self,session_mock):
         expectedUrl = 'https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest'
         expectedParameters = {
@@ -161,7 +164,7 @@ class API_getting_requests(unittest.TestCase):
         session_mock.assert_called_with(expectedUrl,params=expectedParameters,timeout=settings.API_call_timeout_seconds)
 
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_status_200_results_in_true_return(self,session_mock):
 
         mock_response = Response()
@@ -172,7 +175,7 @@ class API_getting_requests(unittest.TestCase):
         success = self.api.getLatest();
         self.assertIs(success,True)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_bad_keys_in_json_response_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 200
@@ -188,7 +191,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_bad_keys_in_json_response_not_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 401
@@ -205,7 +208,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_cannot_parse_json_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 200
@@ -222,7 +225,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_cannot_parse_json_not_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 401
@@ -240,8 +243,8 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
 
-    @mock.patch('cmclogger.api.getlatest.time.sleep')
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.retrypolicy.time.sleep')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_connection_error_occurs(self,session_mock,sleep_mock):
         session_mock.side_effect = ConnectionError()
 
@@ -257,7 +260,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_timeout_error_occurs(self,session_mock):
         session_mock.side_effect = Timeout()
 
@@ -272,7 +275,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_redirecty_error_occurs(self,session_mock):
         session_mock.side_effect = TooManyRedirects()
 
@@ -287,7 +290,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_bad_status_keys_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 200
@@ -305,7 +308,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_data_length_isnt_correct(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 200
@@ -323,7 +326,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_custom_status_and_false_returned_if_bad_status_keys_not_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 403
@@ -341,7 +344,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_api_status_and_false_if_code_is_not_200(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 401
@@ -359,7 +362,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],10)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_false_and_custom_status_if_json_data_is_bad(self,session_mock):
         mock_response = Response()
         mock_response.status_code = 200
@@ -377,7 +380,7 @@ class API_getting_requests(unittest.TestCase):
         self.assertIs(status[settings.CMC_status_elapsed],0)
         self.assertIs(status[settings.CMC_status_credit_count],0)
 
-    @mock.patch('cmclogger.api.getlatest.Session.get')
+    @mock.patch('cmclogger.api.keypool.Session.get')
     def test_API_call_increments_next_call_time_based_on_configuration(self,session_mock):
 
         mock_response = Response()
@@ -399,5 +402,400 @@ class API_getting_requests(unittest.TestCase):
         apiNextCall = self.api.secondsToNextAPICall()
         self.assertIs(apiNextCall,0)
 
+def makePageResponse(params,statusCode=200):
+    entry = response_200['data'][0]
+    data = [dict(entry,id=rank,cmc_rank=rank,symbol='C{}'.format(rank)) for rank in range(params['start'],params['start'] + params['limit'])]
+    response = mock.Mock()
+    response.status_code = statusCode
+    response.text = json.dumps({"status" : response_200['status'], "data" : data})
+    return response
+
+class API_getting_requests_in_pages(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ConfigChecker()
+        self.config.set_expectation(settings.API_section_name,settings.API_option_private_key,str,settings.API_option_privatate_key_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_conversion_currency,str,'AUD')
+        self.config.set_expectation(settings.API_section_name,settings.API_option_start_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_end_index,int,25)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_interval,int,settings.API_option_interval_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_page_size,int,10)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_fetch_workers,int,3)
+        self.config.set_configuration_file('');
+        self.api = CMCGetLatest(self.config)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_range_is_fetched_in_pages_and_merged_in_rank_order(self,session_mock):
+        session_mock.side_effect = lambda url,params,timeout: makePageResponse(params)
+        self.assertIs(self.api.getLatest(),True)
+        self.assertEqual(sorted((call.kwargs['params']['start'],call.kwargs['params']['limit']) for call in session_mock.call_args_list),
+                         [(1,10),(11,10),(21,5)])
+        self.assertEqual([entry['cmc_rank'] for entry in self.api.getLatestData()],list(range(1,26)))
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_credit_count],3)
+
+    @mock.patch('cmclogger.api.retrypolicy.time.sleep')
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_failed_page_is_retried(self,session_mock,sleep_mock):
+        attempts = []
+        def get(url,params,timeout):
+            attempts.append(params['start'])
+            if params['start'] == 11 and attempts.count(11) == 1:
+                raise Timeout()
+            return makePageResponse(params)
+        session_mock.side_effect = get
+        retries = settings.API_callRetriesOnFailure
+        settings.API_callRetriesOnFailure = 1
+        try:
+            self.assertIs(self.api.getLatest(),True)
+        finally:
+            settings.API_callRetriesOnFailure = retries
+        self.assertIs(len(self.api.getLatestData()),25)
+        self.assertIs(attempts.count(11),2)
+
+    @mock.patch('cmclogger.api.retrypolicy.time.sleep')
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_bad_page_keeps_other_pages(self,session_mock,sleep_mock):
+        session_mock.side_effect = lambda url,params,timeout: makePageResponse(params,500 if params['start'] == 11 else 200)
+        self.assertIs(self.api.getLatest(),True)
+        self.assertEqual([entry['cmc_rank'] for entry in self.api.getLatestData()],list(range(1,11)) + list(range(21,26)))
+        status = self.api.getLatestStatus()
+        self.assertIs(status[settings.CMC_status_error_code],0)
+        self.assertIn('11',status[settings.CMC_status_error_message])
+
+    @mock.patch('cmclogger.api.retrypolicy.time.sleep')
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_all_pages_failing_fails_call(self,session_mock,sleep_mock):
+        session_mock.side_effect = ConnectionError()
+        self.assertIs(self.api.getLatest(),False)
+        self.assertIs(self.api.getLatestData(),None)
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],3)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_pages_are_extracted_into_stage(self,session_mock):
+        session_mock.side_effect = lambda url,params,timeout: makePageResponse(params)
+        stage = StagedData(1585000000)
+        self.assertIs(self.api.getLatest(stage=stage),True)
+        self.assertIs(self.api.getLatestData(),None)
+        self.assertEqual([row[settings.CMC_data_cmc_rank] for row in stage],list(range(1,26)))
+        self.assertEqual(stage[0]['timestamp'],1585000000)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_small_range_is_fetched_in_one_request(self,session_mock):
+        self.config.set_value(settings.API_section_name,settings.API_option_end_index,10)
+        self.api = CMCGetLatest(self.config)
+        session_mock.side_effect = lambda url,params,timeout: makePageResponse(params)
+        self.assertIs(self.api.getLatest(),True)
+        self.assertIs(session_mock.call_count,1)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_default_request_parameters_are_not_changed(self,session_mock):
+        defaults = dict(settings.getLatest_Parameters)
+        session_mock.side_effect = lambda url,params,timeout: makePageResponse(params)
+        self.api.getLatest()
+        self.assertEqual(settings.getLatest_Parameters,defaults)
+
+class StreamedResponse(Response):
+    # Other tests replace Response.text with a mock, read the body from raw instead
+    text = property(lambda self: self.content.decode('utf-8'))
+
+def makeStreamedResponse(body,statusCode=200):
+    response = StreamedResponse()
+    response.status_code = statusCode
+    response.raw = io.BytesIO(json.dumps(body).encode('utf-8'))
+    return response
+
+class API_getting_streamed_requests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ConfigChecker()
+        self.config.set_expectation(settings.API_section_name,settings.API_option_private_key,str,settings.API_option_privatate_key_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_conversion_currency,str,'AUD')
+        self.config.set_expectation(settings.API_section_name,settings.API_option_start_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_end_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_interval,int,settings.API_option_interval_default)
+        self.config.set_configuration_file('');
+        self.api = CMCGetLatest(self.config)
+        self.stage = StagedData(1585000000)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_entries_are_staged_as_rows(self,session_mock):
+        session_mock.return_value = makeStreamedResponse(response_200)
+        self.assertIs(self.api.getLatest(stage=self.stage),True)
+        self.assertIs(session_mock.call_args.kwargs['stream'],True)
+        self.assertIs(self.api.getLatestData(),None)
+        self.assertEqual(self.api.getLatestStatus(),response_200['status'])
+        self.assertIs(len(self.stage),1)
+        self.assertEqual(self.stage[0][settings.CMC_data_quote_price],10349.875293052113)
+        self.assertEqual(self.stage[0]['timestamp'],1585000000)
+        self.assertNotIn(settings.CMC_data_quote,self.stage[0])
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_bad_data_key_empties_stage(self,session_mock):
+        self.stage.append({'left' : 'over'})
+        session_mock.return_value = makeStreamedResponse(response_200_bad_data_key)
+        self.assertIs(self.api.getLatest(stage=self.stage),False)
+        self.assertIs(len(self.stage),0)
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],7)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_truncated_response_fails(self,session_mock):
+        response = makeStreamedResponse(response_200)
+        response.raw = io.BytesIO(response.raw.read()[:-20])
+        session_mock.return_value = response
+        self.assertIs(self.api.getLatest(stage=self.stage),False)
+        self.assertIs(len(self.stage),0)
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],2)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_invalid_data_value_empties_stage(self,session_mock):
+        body = json.loads(json.dumps(response_200))
+        body['data'][0][settings.CMC_data_last_updated] = 'yesterday'
+        session_mock.return_value = makeStreamedResponse(body)
+        self.assertIs(self.api.getLatest(stage=self.stage),False)
+        self.assertIs(len(self.stage),0)
+        status = self.api.getLatestStatus()
+        self.assertIs(status[settings.CMC_status_error_code],9)
+        self.assertIn(settings.CMC_data_last_updated,status[settings.CMC_status_error_message])
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_streamed_status_and_count_are_checked(self,session_mock):
+        for body,errorCode in [(response_200_no_data,8),(response_200_bad_status_key,6),(response_200_bad_main_key,1)]:
+            session_mock.return_value = makeStreamedResponse(body)
+            self.assertIs(self.api.getLatest(stage=self.stage),False)
+            self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],errorCode)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_streamed_failed_call_returns_api_status(self,session_mock):
+        session_mock.return_value = makeStreamedResponse(response_status_401,401)
+        self.assertIs(self.api.getLatest(stage=self.stage),False)
+        self.assertEqual(self.api.getLatestStatus(),response_status_401['status'])
+
+class API_using_several_keys(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ConfigChecker()
+        self.config.set_expectation(settings.API_section_name,settings.API_option_private_key,str,'key-one')
+        self.config.set_expectation(settings.API_section_name,settings.API_option_conversion_currency,str,'AUD')
+        self.config.set_expectation(settings.API_section_name,settings.API_option_start_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_end_index,int,25)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_interval,int,settings.API_option_interval_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_page_size,int,10)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_fetch_workers,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_extra_keys,str,'key-two, key-three')
+        self.config.set_configuration_file('');
+        self.api = CMCGetLatest(self.config)
+        self.keysUsed = []
+
+    def __get(self,rejectedKey=None):
+        def get(session,url,params,timeout):
+            key = session.headers[settings.getLatest_key_header]
+            self.keysUsed.append(key)
+            return makePageResponse(params,429 if key == rejectedKey else 200)
+        return get
+
+    @mock.patch('cmclogger.api.keypool.Session.get',autospec=True)
+    def test_pages_are_spread_over_keys(self,session_mock):
+        session_mock.side_effect = self.__get()
+        self.assertIs(self.api.getLatest(),True)
+        self.assertEqual(sorted(self.keysUsed),['key-one','key-three','key-two'])
+
+    @mock.patch('cmclogger.api.keypool.Session.get',autospec=True)
+    def test_rate_limited_key_is_replaced_and_left_out(self,session_mock):
+        session_mock.side_effect = self.__get('key-one')
+        self.assertIs(self.api.getLatest(),True)
+        self.assertIs(len(self.api.getLatestData()),25)
+        self.keysUsed = []
+        self.assertIs(self.api.getLatest(),True)
+        self.assertNotIn('key-one',self.keysUsed)
+        stats = self.api.getKeyPool().getStats()
+        self.assertIs(stats[0]['rate_limited'],1)
+        self.assertIs(stats[0]['sidelined'],True)
+
+    @mock.patch('cmclogger.api.keypool.Session.get',autospec=True)
+    def test_shared_headers_are_not_changed(self,session_mock):
+        headers = dict(settings.getLatest_Headers)
+        session_mock.side_effect = self.__get()
+        self.api.getLatest(apiKey='key-four')
+        self.assertEqual(self.keysUsed,['key-four'] * 3)
+        self.assertEqual(settings.getLatest_Headers,headers)
+        self.api.getLatest()
+        self.assertNotIn('key-four',self.keysUsed[3:])
+
+    @mock.patch('cmclogger.api.keypool.Session.get',autospec=True)
+    def test_key_limits_carry_over_and_waits_can_be_stopped(self,session_mock):
+        self.config.set_expectation(settings.API_section_name,settings.API_option_key_requests_per_minute,int,3)
+        self.config.set_configuration_file('');
+        api = CMCGetLatest(self.config,retryPolicy=RetryPolicy(wait=lambda seconds: True))
+        session_mock.side_effect = self.__get()
+        self.assertIs(api.getLatest(apiKey='key-four'),True)
+        # The key made three requests this minute, the wait for it is interrupted
+        self.assertIs(api.getLatest(apiKey='key-four'),False)
+        self.assertIs(api.getLatestStatus()[settings.CMC_status_error_code],stoppedCallErrorCode)
+        self.assertEqual(self.keysUsed,['key-four'] * 3)
+
+    def test_jobs_can_share_a_key_pool(self):
+        self.assertIs(CMCGetLatest(self.config,keyPool=self.api.getKeyPool()).getKeyPool(),self.api.getKeyPool())
+        self.assertIs(len(self.api.getKeyPool()),3)
+
+class API_retrying_and_skipping_calls(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ConfigChecker()
+        self.config.set_expectation(settings.API_section_name,settings.API_option_private_key,str,settings.API_option_privatate_key_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_conversion_currency,str,'AUD')
+        self.config.set_expectation(settings.API_section_name,settings.API_option_start_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_end_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_interval,int,settings.API_option_interval_default)
+        self.config.set_configuration_file('');
+        self.waits = []
+        self.stop = False
+        def wait(seconds):
+            self.waits.append(seconds)
+            return self.stop
+        self.api = CMCGetLatest(self.config,retryPolicy=RetryPolicy(1,8,wait,lambda: 1),circuitBreaker=CircuitBreaker(2,60))
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_retry_timings_are_recorded(self,session_mock):
+        session_mock.side_effect = Timeout()
+        self.assertIs(self.api.getLatest(),False)
+        self.assertEqual(self.waits,[1,2,4][:settings.API_callRetriesOnFailure])
+        self.assertEqual(self.api.getRetryTimings(),self.waits)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_interrupted_wait_stops_retrying(self,session_mock):
+        session_mock.side_effect = ConnectionError()
+        self.stop = True
+        self.assertIs(self.api.getLatest(),False)
+        self.assertIs(session_mock.call_count,1)
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],3)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_calls_are_skipped_while_api_is_unreachable(self,session_mock):
+        session_mock.side_effect = ConnectionError()
+        self.api.getLatest()
+        self.api.getLatest()
+        calls = session_mock.call_count
+        stage = StagedData(1585000000)
+        self.assertIs(self.api.getLatest(stage=stage),False)
+        self.assertIs(session_mock.call_count,calls)
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],skippedCallErrorCode)
+        self.assertEqual(self.api.getRetryTimings(),[])
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_api_errors_do_not_open_circuit(self,session_mock):
+        mock_response = mock.Mock()
+        mock_response.status_code = 401
+        mock_response.text = json.dumps(response_status_401)
+        session_mock.return_value = mock_response
+        for _ in range(3):
+            self.assertIs(self.api.getLatest(),False)
+        self.assertEqual(self.api.getCircuitBreaker().getState(),'closed')
+
+    @mock.patch.object(settings,'API_callRetriesOnFailure',3)
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_deferred_retries_are_left_to_the_caller(self,session_mock):
+        api = CMCGetLatest(self.config,retryPolicy=self.api.getRetryPolicy(),circuitBreaker=CircuitBreaker(1,60),deferRetries=True)
+        session_mock.side_effect = ConnectionError()
+        for delay in [1,2,4]:
+            self.assertIs(api.getLatest(),False)
+            self.assertEqual(api.getRetryDelay(),delay)
+            self.assertEqual(api.getCircuitBreaker().getState(),'closed')
+        self.assertEqual(self.waits,[])
+        self.assertIs(session_mock.call_count,3)
+        self.assertIs(api.getLatest(),False)
+        self.assertIs(api.getRetryDelay(),None)
+        self.assertEqual(api.getRetryTimings(),[1,2,4])
+        self.assertEqual(api.getCircuitBreaker().getState(),'open')
+
+    @mock.patch.object(settings,'API_callRetriesOnFailure',3)
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_deferred_retry_is_cleared_by_success(self,session_mock):
+        api = CMCGetLatest(self.config,retryPolicy=self.api.getRetryPolicy(),deferRetries=True)
+        mock_response = mock.Mock()
+        mock_response.status_code = 200
+        mock_response.text = json.dumps(response_200)
+        session_mock.side_effect = [ConnectionError(),mock_response]
+        self.assertIs(api.getLatest(),False)
+        self.assertEqual(api.getRetryDelay(),1)
+        self.assertIs(api.getLatest(),True)
+        self.assertIs(api.getRetryDelay(),None)
+        self.assertEqual(api.getRetryTimings(),[1])
+
+def makeQuotesResponse(params,listed=True):
+    entry = response_200['data'][0]
+    key = 'id' if 'id' in params else 'symbol'
+    data = dict()
+    for item in params[key].split(','):
+        rank = int(item) if key == 'id' else int(item[1:])
+        quote = dict(entry,id=rank,cmc_rank=rank,symbol='C{}'.format(rank))
+        data[item] = quote if listed else [quote]
+    response = mock.Mock()
+    response.status_code = 200
+    response.text = json.dumps({"status" : response_200['status'], "data" : data})
+    return response
+
+class API_fetching_watchlist(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ConfigChecker()
+        self.config.set_expectation(settings.API_section_name,settings.API_option_private_key,str,settings.API_option_privatate_key_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_conversion_currency,str,'AUD')
+        self.config.set_expectation(settings.API_section_name,settings.API_option_start_index,int,1)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_end_index,int,800)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_interval,int,settings.API_option_interval_default)
+        self.config.set_expectation(settings.API_section_name,settings.API_option_watchlist,str,'1, 52, c7, 800')
+        self.config.set_configuration_file('');
+        self.api = CMCGetLatest(self.config)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_ids_and_symbols_are_requested_from_quotes(self,session_mock):
+        session_mock.side_effect = lambda url,params,timeout: makeQuotesResponse(params)
+        stage = StagedData(1585000000)
+        self.assertIs(self.api.getLatest(stage=stage),True)
+        self.assertEqual(sorted(call.args[0] for call in session_mock.call_args_list),[settings.quotes_Url] * 2)
+        self.assertEqual(sorted(sorted(call.kwargs['params'].items()) for call in session_mock.call_args_list),
+                         [[('convert','AUD'),('id','1,52,800')],[('convert','AUD'),('symbol','C7')]])
+        self.assertEqual(sorted(row[settings.CMC_data_cmc_rank] for row in stage),[1,7,52,800])
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_watchlist_is_requested_in_batches(self,session_mock):
+        session_mock.side_effect = lambda url,params,timeout: makeQuotesResponse(params,False)
+        batchSize = settings.quotes_batch_size
+        settings.quotes_batch_size = 2
+        try:
+            self.assertIs(self.api.getLatest(),True)
+        finally:
+            settings.quotes_batch_size = batchSize
+        self.assertIs(session_mock.call_count,3)
+        self.assertEqual(sorted(entry['cmc_rank'] for entry in self.api.getLatestData()),[1,7,52,800])
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_missing_coin_is_flagged(self,session_mock):
+        def get(url,params,timeout):
+            response = makeQuotesResponse(params)
+            if 'symbol' in params:
+                response.text = json.dumps({"status" : response_200['status'], "data" : {}})
+            return response
+        session_mock.side_effect = get
+        self.assertIs(self.api.getLatest(),True)
+        self.assertEqual(sorted(entry['cmc_rank'] for entry in self.api.getLatestData()),[1,52,800])
+        self.assertIn('C7',self.api.getLatestStatus()[settings.CMC_status_error_message])
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_code],0)
+
+    @mock.patch('cmclogger.api.keypool.Session.get')
+    def test_symbol_of_several_coins_keeps_them_all(self,session_mock):
+        def get(url,params,timeout):
+            response = makeQuotesResponse(params,False)
+            if 'symbol' in params:
+                entry = response_200['data'][0]
+                coins = [dict(entry,id=rank,cmc_rank=rank,symbol='C7') for rank in [7,900]]
+                response.text = json.dumps({"status" : response_200['status'], "data" : {'C7' : coins}})
+            return response
+        session_mock.side_effect = get
+        stage = StagedData(1585000000)
+        self.assertIs(self.api.getLatest(stage=stage),True)
+        self.assertEqual(sorted(row[settings.CMC_data_cmc_rank] for row in stage),[1,7,52,800,900])
+        self.assertIs(self.api.getLatestStatus()[settings.CMC_status_error_message],None)
+
 if __name__ == '__main__':
     unittest.main();
@@ -0,0 +1,85 @@
+import unittest
+import logging
+from cmclogger.api.keypool import KeyPool
+import cmclogger.settings as settings
+logging.disable(logging.CRITICAL)
+
+class FakeClock():
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self,seconds):
+        self.now = self.now + seconds
+
+def keyOf(pooledKey):
+    return pooledKey.key
+
+class Key_pool(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def __pool(self,keys,requestsPerMinute=0):
+        return KeyPool(keys,requestsPerMinute,clock=self.clock,wait=self.clock.sleep)
+
+    def test_keys_are_used_in_turn(self):
+        pool = self.__pool(['a','b','c'])
+        self.assertEqual([keyOf(pool.acquire()) for _ in range(4)],['a','b','c','a'])
+
+    def test_duplicate_keys_are_ignored(self):
+        self.assertIs(len(self.__pool(['a','b','a'])),2)
+
+    def test_each_key_has_its_own_session_headers(self):
+        pool = self.__pool(['a','b'])
+        first,second = pool.acquire(),pool.acquire()
+        self.assertIsNot(first.session,second.session)
+        self.assertEqual(first.session.headers[settings.getLatest_key_header],'a')
+        self.assertEqual(second.session.headers[settings.getLatest_key_header],'b')
+        self.assertNotIn(settings.getLatest_Headers[settings.getLatest_key_header],['a','b'])
+
+    def test_rejected_key_is_sidelined_until_it_expires(self):
+        pool = self.__pool(['a','b'])
+        pool.release(pool.acquire(),429)
+        self.assertEqual([keyOf(pool.acquire()) for _ in range(2)],['b','b'])
+        self.clock.now = self.clock.now + settings.key_pool_rate_limited_seconds
+        self.assertEqual(sorted(keyOf(pool.acquire()) for _ in range(2)),['a','b'])
+
+    def test_unauthorised_key_is_sidelined_for_longer(self):
+        pool = self.__pool(['a','b'])
+        pool.release(pool.acquire(),401)
+        self.clock.now = self.clock.now + settings.key_pool_rate_limited_seconds
+        self.assertEqual([keyOf(pool.acquire()) for _ in range(2)],['b','b'])
+        self.assertIs(pool.getStats()[0]['unauthorized'],1)
+
+    def test_single_sidelined_key_is_still_used(self):
+        pool = self.__pool(['a'])
+        pool.release(pool.acquire(),429)
+        self.assertIs(pool.hasAvailableKey(),False)
+        self.assertEqual(keyOf(pool.acquire()),'a')
+
+    def test_key_at_its_limit_is_skipped(self):
+        pool = self.__pool(['a','b'],2)
+        self.assertEqual([keyOf(pool.acquire()) for _ in range(4)],['a','b','a','b'])
+        start = self.clock.now
+        self.assertEqual(keyOf(pool.acquire()),'a')
+        self.assertEqual(self.clock.now,start + 60)
+
+    def test_interrupted_wait_returns_no_key(self):
+        pool = KeyPool(['a'],1,clock=self.clock,wait=lambda seconds: True)
+        self.assertEqual(keyOf(pool.acquire()),'a')
+        self.assertIs(pool.acquire(),None)
+
+    def test_errors_are_counted_per_key(self):
+        pool = self.__pool(['a','b'])
+        pool.release(pool.acquire(),200)
+        pool.release(pool.acquire())
+        stats = pool.getStats()
+        self.assertEqual([(entry['requests'],entry['failures']) for entry in stats],[(1,0),(1,1)])
+        self.assertEqual(stats[0]['key'],'...a')
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,72 @@
+import unittest
+import logging
+import threading
+from cmclogger.api.retrypolicy import RetryPolicy, CircuitBreaker, circuitClosed, circuitOpen, circuitHalfOpen
+logging.disable(logging.CRITICAL)
+
+class FakeClock():
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class Retry_policy(unittest.TestCase):
+
+    def test_delay_grows_exponentially_with_jitter(self):
+        lowest = RetryPolicy(1,8,random=lambda: 0)
+        highest = RetryPolicy(1,8,random=lambda: 1)
+        self.assertEqual([lowest.delay(attempt) for attempt in range(1,5)],[0.5,1,2,4])
+        self.assertEqual([highest.delay(attempt) for attempt in range(1,5)],[1,2,4,8])
+
+    def test_delay_is_capped(self):
+        self.assertEqual(RetryPolicy(1,8,random=lambda: 1).delay(10),8)
+
+    def test_pause_reports_interruption(self):
+        stop = threading.Event()
+        policy = RetryPolicy(wait=stop.wait)
+        self.assertIs(policy.pause(0),False)
+        stop.set()
+        self.assertIs(policy.pause(60),True)
+
+class Circuit_breaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(3,60,240,self.clock)
+
+    def __fail(self,times):
+        for _ in range(times):
+            self.breaker.allowRequest()
+            self.breaker.recordFailure()
+
+    def test_circuit_opens_after_failures_in_a_row(self):
+        self.__fail(2)
+        self.breaker.recordSuccess()
+        self.__fail(2)
+        self.assertEqual(self.breaker.getState(),circuitClosed)
+        self.__fail(1)
+        self.assertEqual(self.breaker.getState(),circuitOpen)
+        self.assertIs(self.breaker.allowRequest(),False)
+        self.assertEqual(self.breaker.secondsUntilRetry(),60)
+
+    def test_one_trial_call_is_made_after_reset_time(self):
+        self.__fail(3)
+        self.clock.now = self.clock.now + 60
+        self.assertIs(self.breaker.allowRequest(),True)
+        self.assertEqual(self.breaker.getState(),circuitHalfOpen)
+        self.assertIs(self.breaker.allowRequest(),False)
+        self.breaker.recordSuccess()
+        self.assertEqual(self.breaker.getState(),circuitClosed)
+        self.assertIs(self.breaker.allowRequest(),True)
+
+    def test_failed_trial_call_doubles_skip_time_up_to_limit(self):
+        self.__fail(3)
+        for expected in [120,240,240]:
+            self.clock.now = self.clock.now + self.breaker.secondsUntilRetry()
+            self.__fail(1)
+            self.assertEqual(self.breaker.secondsUntilRetry(),expected)
+
+if __name__ == '__main__':
+    unittest.main();
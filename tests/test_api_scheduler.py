@@ -0,0 +1,114 @@
+import unittest
+import logging
+from cmclogger.api.scheduler import Scheduler
+from cmclogger.api.getlatest import CMCGetLatest
+from tests.loggertestcase import LoggerTestCase
+import cmclogger.settings as settings
+logging.disable(logging.CRITICAL)
+
+class FakeClock():
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class Scheduling_jobs(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(self.clock)
+        self.runs = []
+
+    def __task(self,name,duration=0):
+        def task():
+            self.runs.append(name)
+            self.clock.now = self.clock.now + duration
+        return task
+
+    def test_jobs_run_at_their_own_intervals(self):
+        self.scheduler.addJob('fast',self.__task('fast'),60)
+        self.scheduler.addJob('slow',self.__task('slow'),1800)
+        for minute in range(31):
+            self.scheduler.runDue()
+            self.clock.now = self.clock.now + 60
+        self.assertEqual(self.runs.count('fast'),31)
+        self.assertEqual(self.runs.count('slow'),2)
+
+    def test_higher_priority_runs_first(self):
+        self.scheduler.addJob('tail',self.__task('tail'),60,0)
+        self.scheduler.addJob('top',self.__task('top'),60,10)
+        self.assertEqual(self.scheduler.runDue(),['top','tail'])
+
+    def test_slow_run_does_not_shift_schedule(self):
+        self.scheduler.addJob('job',self.__task('job',20),60)
+        self.scheduler.runDue()
+        self.assertEqual(self.scheduler.secondsToNextRun(),40)
+
+    def test_missed_ticks_are_caught_up_with_one_run(self):
+        job = self.scheduler.addJob('job',self.__task('job',210),60)
+        self.assertEqual(self.scheduler.runDue(),['job'])
+        self.assertIs(job.missedRuns,2)
+        self.assertEqual(job.nextRun,1180)
+        self.assertEqual(self.scheduler.secondsToNextRun(),0)
+        job.task = self.__task('job')
+        self.assertEqual(self.scheduler.runDue(),['job'])
+        self.assertEqual(self.scheduler.secondsToNextRun(),30)
+
+    def test_running_job_is_not_started_again(self):
+        self.scheduler.addJob('job',lambda: self.runs.append(self.scheduler.runDue()),60)
+        self.scheduler.runDue()
+        self.assertEqual(self.runs,[[]])
+
+    def test_failing_job_does_not_stop_others(self):
+        def fail():
+            raise ValueError()
+        self.scheduler.addJob('broken',fail,60,1)
+        self.scheduler.addJob('job',self.__task('job'),60)
+        self.assertEqual(self.scheduler.runDue(),['broken','job'])
+        self.assertEqual(self.scheduler.secondsToNextRun(),60)
+
+    def test_retried_job_runs_again_after_backoff_and_keeps_its_grid(self):
+        retries = [5,None]
+        def task():
+            self.runs.append('job')
+            return retries.pop(0)
+        job = self.scheduler.addJob('job',task,60)
+        self.scheduler.addJob('other',self.__task('other'),30)
+        self.scheduler.runDue()
+        self.assertEqual(self.scheduler.secondsToNextRun(),5)
+        self.clock.now = self.clock.now + 5
+        self.assertEqual(self.scheduler.runDue(),['job'])
+        self.assertIs(job.retryAt,None)
+        self.assertEqual(job.nextRun,1060)
+        self.assertEqual(self.runs,['job','other','job'])
+
+    def test_no_jobs_has_no_next_run(self):
+        self.assertIs(self.scheduler.secondsToNextRun(),None)
+
+class Scheduling_configured_jobs(LoggerTestCase):
+
+    configuration = "[{}]\n{} = top, tail\n\n[{}top]\n{} = 20\n{} = 1\n{} = 10\n\n[{}tail]\n{} = EUR\n".format(
+        settings.scheduler_section_name,settings.scheduler_option_jobs,settings.scheduler_job_section_prefix,
+        settings.API_option_end_index,settings.API_option_interval,settings.scheduler_job_option_priority,
+        settings.scheduler_job_section_prefix,settings.API_option_conversion_currency)
+
+    def test_job_sections_are_read(self):
+        api = CMCGetLatest(self.config,settings.scheduler_job_section_prefix + 'top')
+        self.assertEqual(api.getConfiguration()['endIndex'],20)
+        self.assertEqual(api.getConfiguration()['callInterval'],1)
+        self.assertEqual(self.config.get_value(settings.scheduler_job_section_prefix + 'top',settings.scheduler_job_option_priority),10)
+
+    def test_job_options_default_to_api_section(self):
+        api = CMCGetLatest(self.config,settings.scheduler_job_section_prefix + 'tail')
+        self.assertEqual(api.getConfiguration()['endIndex'],settings.API_option_end_index_default)
+        self.assertEqual(api.getConfiguration()['conversionCurrency'],settings.API_option_conversion_currency_default)
+
+    def test_job_currency_other_than_api_section_is_rejected(self):
+        section = settings.scheduler_job_section_prefix + 'tail'
+        self.assertEqual(self.config.get_value(section,settings.API_option_conversion_currency),settings.API_option_conversion_currency_default)
+        self.assertEqual(CMCGetLatest(self.config,section).getConfiguration()['conversionCurrency'],settings.API_option_conversion_currency_default)
+
+if __name__ == '__main__':
+    unittest.main();
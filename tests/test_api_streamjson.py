@@ -0,0 +1,44 @@
+import unittest
+import json
+from cmclogger.api.streamjson import iterMembers
+
+document = {"status" : {"error_code" : 0, "notice" : None}, "data" : [{"id" : 1, "name" : "Bitcoin €", "price" : 10349.875293052113},
+            {"id" : 1027, "tags" : [], "quote" : {"AUD" : {"price" : -1.5e-05}}}], "extra" : [1,2]}
+
+def chunked(text,size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0,len(data),size)]
+
+class Stream_json_decoding(unittest.TestCase):
+
+    def test_members_match_json_loads_for_any_chunk_size(self):
+        text = json.dumps(document,ensure_ascii=False)
+        for size in [1,2,7,64,len(text) * 4]:
+            members = list(iterMembers(chunked(text,size),'data'))
+            self.assertEqual(members[0],('status',document['status']))
+            self.assertEqual([value for key,value in members if key == 'data'],document['data'])
+            self.assertEqual(members[-1],('extra',[1,2]))
+
+    def test_data_elements_are_yielded_before_document_ends(self):
+        def chunks():
+            yield b'{"data" : [{"id" : 1}, '
+            raise AssertionError("Read past the first element")
+        self.assertEqual(next(iterMembers(chunks(),'data')),('data',{'id' : 1}))
+
+    def test_empty_array_and_object(self):
+        self.assertEqual(list(iterMembers([b'{"data" : [ ], "status" : {}}'],'data')),[('status',{})])
+        self.assertEqual(list(iterMembers([b' { } '],'data')),[])
+
+    def test_number_split_across_chunks(self):
+        self.assertEqual(list(iterMembers([b'{"data" : [12',b'34]}'],'data')),[('data',1234)])
+
+    def test_str_chunks(self):
+        self.assertEqual(list(iterMembers(['{"a" : 1}'],'data')),[('a',1)])
+
+    def test_invalid_documents_raise_value_error(self):
+        for text in ['asdfa {sdf}','{"data" : [{"id" : 1}','{"data" : [1 2]}','{"a" : 1','[1, 2]','']:
+            with self.assertRaises(ValueError):
+                list(iterMembers([text.encode('utf-8')],'data'))
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,113 @@
+import unittest
+import logging
+import shutil
+from cmclogger.dataparser.publisher import Publisher
+from cmclogger.dataparser.reader import Reader
+from cmclogger.dataparser.layout import QuotesTableLayout, SymbolTableLayout
+from cmclogger.dataparser.archive import ParquetArchive, ArchivedLayout, parquetAvailable
+import cmclogger.settings as settings
+from tests.loggertestcase import LoggerTestCase
+from tests.test_dataparser_publisher import goodData
+from tests.test_dataparser_layout import priceRequest
+import os
+logging.disable(logging.CRITICAL)
+
+day = 86400
+now = 1585000000 - 1585000000 % day + 12 * 3600
+
+@unittest.skipUnless(parquetAvailable,"pyarrow is not installed")
+class Parquet_archive(LoggerTestCase):
+
+    def setUp(self):
+        LoggerTestCase.setUp(self)
+        self.directory = os.path.join(self.workingDirectory,settings.data_file_directory,settings.parquet_archive_directory)
+
+    def test_closed_days_are_moved_to_partitioned_files(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            publisher = Publisher(self.status,self.database,layout)
+            publisher.writeData(goodData,now - 3 * day)
+            publisher.writeData(goodData,now)
+            self.assertIs(ParquetArchive(self.database,layout,self.directory,1).run(10,now),1)
+            self.assertTrue(os.path.exists(os.path.join(self.directory,'date=2020-03-20','symbol=BCH',settings.parquet_archive_file_name)))
+            self.assertEqual(list(layout.rangeToDataFrame(0,2 * now)['timestamp']),[now,now])
+            shutil.rmtree(self.directory)
+
+    def test_day_past_budget_is_finished_on_next_run(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            Publisher(self.status,self.database,layout).writeData(goodData,now - 3 * day)
+            archive = ParquetArchive(self.database,layout,self.directory,1)
+            self.assertIs(archive.run(0,now),0)
+            self.assertIs(len(layout.rangeToDataFrame(0,now)),1)
+            self.assertEqual(len(archive.getSymbols()),1)
+            self.assertIs(archive.run(0,now),1)
+            self.assertIs(len(layout.rangeToDataFrame(0,now)),0)
+            self.assertEqual(archive.getSymbols(),['BCH','USDT'])
+            shutil.rmtree(self.directory)
+
+    def test_archiving_disabled_keeps_rows(self):
+        layout = QuotesTableLayout(self.database)
+        Publisher(self.status,self.database,layout).writeData(goodData,now - 3 * day)
+        self.assertIs(ParquetArchive(self.database,layout,self.directory,0).run(10,now),0)
+        self.assertIs(len(layout.rangeToDataFrame(0,now)),2)
+
+    def test_late_rows_are_merged_into_archived_day(self):
+        layout = QuotesTableLayout(self.database)
+        publisher = Publisher(self.status,self.database,layout)
+        archive = ParquetArchive(self.database,layout,self.directory,1)
+        publisher.writeData(goodData,now - 3 * day)
+        archive.run(10,now)
+        publisher.writeData(goodData,now - 3 * day + 60)
+        archive.run(10,now)
+        self.assertEqual(list(archive.symbolToDataFrame('BCH')['timestamp']),[now - 3 * day,now - 3 * day + 60])
+
+    def test_reads_cover_database_and_archive(self):
+        layout = SymbolTableLayout(self.database)
+        publisher = Publisher(self.status,self.database,layout)
+        archive = ParquetArchive(self.database,layout,self.directory,1)
+        publisher.writeData(goodData,now - 3 * day)
+        publisher.writeData(goodData,now)
+        archive.run(10,now)
+        archived = ArchivedLayout(layout,archive)
+        self.assertEqual(list(archived.symbolToDataFrame('BCH')['timestamp']),[now - 3 * day,now])
+        self.assertEqual(list(archived.symbolToDataFrame('BCH',now - day)['timestamp']),[now])
+        self.assertEqual(archived.getSymbols(),['BCH','USDT'])
+
+    def test_reader_falls_back_to_archive(self):
+        layout = QuotesTableLayout(self.database)
+        archive = ParquetArchive(self.database,layout,self.directory,1)
+        Publisher(self.status,self.database,layout).writeData(goodData,now - 3 * day)
+        archive.run(10,now)
+        reader = Reader(self.status,self.database,self.config,ArchivedLayout(layout,archive))
+        self.assertEqual(reader.processRequest(priceRequest),"BCH: $368.82 (-2.96%)")
+        request = dict(priceRequest)
+        request[settings.data_query_as_of] = now - 4 * day
+        self.assertEqual(reader.processRequest(request),"BCH not a valid stored cryptocurreny symbol.")
+
+    def test_batch_reads_fall_back_to_archive(self):
+        layout = QuotesTableLayout(self.database)
+        archive = ParquetArchive(self.database,layout,self.directory,1)
+        publisher = Publisher(self.status,self.database,layout)
+        publisher.writeData(goodData,now - 3 * day)
+        archive.run(10,now)
+        publisher.writeData(goodData[:1],now)
+        entries = ArchivedLayout(layout,archive).getLastEntries(['BCH','USDT'])
+        self.assertEqual(entries['USDT']['timestamp'],now)
+        self.assertEqual(entries['BCH']['timestamp'],now - 3 * day)
+
+    def test_range_query_covers_database_and_archive(self):
+        layout = SymbolTableLayout(self.database)
+        publisher = Publisher(self.status,self.database,layout)
+        archive = ParquetArchive(self.database,layout,self.directory,1)
+        publisher.writeData(goodData,now - 3 * day)
+        publisher.writeData(goodData,now - 3 * day + 60)
+        publisher.writeData(goodData,now)
+        archive.run(10,now)
+        archived = ArchivedLayout(layout,archive)
+        frame = archived.queryRange(['BCH'],0,float('inf'),[settings.CMC_data_quote_price])
+        self.assertEqual(list(frame['timestamp']),[now - 3 * day,now - 3 * day + 60,now])
+        daily = archived.queryRange(None,0,float('inf'),[settings.CMC_data_quote_price],day)
+        self.assertEqual(list(daily[settings.CMC_data_symbol]),['BCH','BCH','USDT','USDT'])
+        self.assertEqual(list(daily['timestamp'])[:2],[now - 3 * day - (now - 3 * day) % day,now - now % day])
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,71 @@
+import unittest
+import logging
+import sqlite3
+from cmclogger.dataparser.database import Database
+import cmclogger.settings as settings
+import os
+logging.disable(logging.CRITICAL)
+
+class Database_connection_pragmas(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = os.path.join('tests',settings.data_file_directory)
+        os.makedirs(self.directory,exist_ok=True)
+        self.fileLocation = os.path.join(self.directory,settings.database_file_name)
+
+    def tearDown(self):
+        for suffix in ['-wal','-shm','']:
+            if os.path.exists(self.fileLocation + suffix):
+                os.remove(self.fileLocation + suffix)
+        try:
+            os.removedirs(self.directory)
+        except:
+            pass
+
+    def test_database_uses_wal_mode_by_default(self):
+        self.assertEqual(Database(self.fileLocation).getJournalMode(),'wal')
+
+    def test_pragmas_are_applied(self):
+        database = Database(self.fileLocation,'delete','full',1024,0,100)
+        self.assertEqual(database.getJournalMode(),'delete')
+        self.assertEqual(database.con.execute("PRAGMA synchronous").fetchone()[0],2)
+        self.assertEqual(database.con.execute("PRAGMA cache_size").fetchone()[0],-1024)
+        self.assertEqual(database.con.execute("PRAGMA busy_timeout").fetchone()[0],100)
+
+    def test_invalid_modes_use_defaults(self):
+        database = Database(self.fileLocation,'unknown','unknown')
+        self.assertEqual(database.getJournalMode(),'wal')
+        self.assertEqual(database.con.execute("PRAGMA synchronous").fetchone()[0],1)
+
+    def test_pragmas_are_applied_on_reconnect(self):
+        database = Database(self.fileLocation,synchronous='off')
+        database.con.close()
+        database.create_database()
+        self.assertEqual(database.con.execute("PRAGMA synchronous").fetchone()[0],0)
+
+    def test_open_reader_does_not_block_writer(self):
+        writer = Database(self.fileLocation,busyTimeoutMs=0)
+        writer.create_table('BTC',{'timestamp' : 'INTEGER'})
+        writer.insert('BTC',[1])
+        reader = Database(self.fileLocation,busyTimeoutMs=0)
+        reader.con.execute("BEGIN")
+        self.assertEqual(reader.con.execute("SELECT COUNT(*) FROM BTC").fetchone()[0],1)
+        writer.con.execute("INSERT INTO BTC VALUES (2)")
+        writer.con.commit()
+        self.assertEqual(reader.con.execute("SELECT COUNT(*) FROM BTC").fetchone()[0],1)
+        reader.con.rollback()
+        self.assertEqual(reader.con.execute("SELECT COUNT(*) FROM BTC").fetchone()[0],2)
+
+    def test_open_reader_blocks_writer_in_rollback_mode(self):
+        writer = Database(self.fileLocation,'delete',busyTimeoutMs=0)
+        writer.create_table('BTC',{'timestamp' : 'INTEGER'})
+        reader = Database(self.fileLocation,'delete',busyTimeoutMs=0)
+        reader.con.execute("BEGIN")
+        reader.con.execute("SELECT COUNT(*) FROM BTC").fetchone()
+        writer.con.execute("INSERT INTO BTC VALUES (2)")
+        with self.assertRaises(sqlite3.OperationalError):
+            writer.con.commit()
+        reader.con.rollback()
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,39 @@
+import unittest
+import logging
+import datetime
+from dateutil import parser, tz
+from cmclogger.dataparser.isotime import isoToUnixTime, isoToLocalTime
+
+logging.disable(logging.CRITICAL)
+
+class ISO_time_conversion(unittest.TestCase):
+
+    def test_cmc_timestamp_converted_as_utc(self):
+        self.assertEqual(isoToUnixTime("2020-03-25T19:28:25.000Z"),1585164505)
+
+    def test_cmc_timestamp_matches_dateutil(self):
+        iso8601 = "2013-04-28T00:00:00.000Z"
+        self.assertEqual(isoToUnixTime(iso8601),int(parser.parse(iso8601).timestamp()))
+
+    def test_other_formats_fall_back_to_dateutil(self):
+        self.assertEqual(isoToUnixTime("2020-03-25T21:28:25+02:00"),1585164505)
+
+    def test_timestamp_without_timezone_is_utc(self):
+        self.assertEqual(isoToUnixTime("2020-03-25T19:28:25"),1585164505)
+
+    def test_conversions_are_cached(self):
+        isoToUnixTime.cache_clear()
+        isoToUnixTime("2017-07-23T00:00:00.000Z")
+        isoToUnixTime("2017-07-23T00:00:00.000Z")
+        self.assertIs(isoToUnixTime.cache_info().hits,1)
+
+    def test_local_time_matches_dateutil(self):
+        iso8601 = "2020-03-24T18:28:37.355Z"
+        self.assertEqual(isoToLocalTime(iso8601),str(parser.parse(iso8601).astimezone(tz.tzlocal())))
+
+    def test_local_time_of_custom_status_timestamp(self):
+        iso8601 = datetime.datetime.now().isoformat()
+        self.assertEqual(isoToLocalTime(iso8601),str(parser.parse(iso8601).astimezone(tz.tzlocal())))
+
+if __name__ == '__main__':
+    unittest.main();
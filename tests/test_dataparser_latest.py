@@ -0,0 +1,93 @@
+import unittest
+import logging
+import copy
+from cmclogger.dataparser.publisher import Publisher
+from cmclogger.dataparser.reader import Reader
+from cmclogger.dataparser.latest import LatestTable
+from cmclogger.dataparser.layout import QuotesTableLayout, SymbolTableLayout
+import cmclogger.settings as settings
+from tests.loggertestcase import LoggerTestCase
+from tests.test_dataparser_publisher import goodData
+from tests.test_dataparser_layout import priceRequest
+logging.disable(logging.CRITICAL)
+
+def latestRows(database):
+    return database.con.execute("SELECT {},timestamp FROM {} ORDER BY {}".format(
+        settings.CMC_data_symbol,settings.database_latest_table_name,settings.CMC_data_symbol)).fetchall()
+
+class Latest_table(LoggerTestCase):
+
+    def test_one_row_per_coin_is_kept_for_both_layouts(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            publisher = Publisher(self.status,self.database,layout)
+            publisher.writeData(goodData,1585000000)
+            publisher.writeData(goodData,1585000300)
+            self.assertEqual(latestRows(self.database),[('BCH',1585000300),('USDT',1585000300)])
+
+    def test_older_rows_do_not_replace_newer(self):
+        publisher = Publisher(self.status,self.database)
+        publisher.writeData(goodData,1585000300)
+        publisher.writeData(goodData,1585000000)
+        self.assertEqual(latestRows(self.database),[('BCH',1585000300),('USDT',1585000300)])
+        self.assertIs(len(self.database.table_to_df('BCH')),2)
+
+    def test_table_is_filled_from_history_when_created(self):
+        publisher = Publisher(self.status,self.database)
+        publisher.writeData(goodData,1585000000)
+        self.database.con.execute("DROP TABLE {}".format(settings.database_latest_table_name))
+        LatestTable(self.database).prepare(SymbolTableLayout(self.database))
+        self.assertEqual(latestRows(self.database),[('BCH',1585000000),('USDT',1585000000)])
+
+    def test_table_dropped_while_logging_is_recreated(self):
+        publisher = Publisher(self.status,self.database)
+        publisher.writeData(goodData,1585000000)
+        self.database.con.execute("DROP TABLE {}".format(settings.database_latest_table_name))
+        publisher.writeData(goodData,1585000300)
+        self.assertEqual(latestRows(self.database),[('BCH',1585000300),('USDT',1585000300)])
+        self.assertIs(len(self.database.table_to_df('BCH')),2)
+
+    def test_failed_table_write_keeps_history(self):
+        publisher = Publisher(self.status,self.database)
+        publisher.writeData(goodData,1585000000)
+        # A table without the stored columns makes every upsert fail
+        self.database.con.execute("DROP TABLE {}".format(settings.database_latest_table_name))
+        self.database.con.execute("CREATE TABLE {}(value INTEGER)".format(settings.database_latest_table_name))
+        self.database.con.commit()
+        publisher.writeData(goodData,1585000300)
+        self.assertIs(len(self.database.table_to_df('BCH')),2)
+        self.assertIs(len(self.database.table_to_df('USDT')),2)
+
+    def test_symbols_named_as_reserved_tables_are_not_stored(self):
+        layout = SymbolTableLayout(self.database)
+        data = copy.deepcopy(goodData)
+        for symbol in ['LATEST','Quotes','OHLC_1D']:
+            data.append(dict(copy.deepcopy(goodData[0]),symbol=symbol,id=len(data)))
+        Publisher(self.status,self.database,layout).writeData(data,1585000000)
+        self.assertEqual(latestRows(self.database),[('BCH',1585000000),('USDT',1585000000)])
+        self.assertEqual(sorted(layout.getSymbols()),['BCH','USDT'])
+        self.assertIs(layout.getLastEntry('LATEST'),None)
+        self.assertIs(len(layout.symbolToDataFrame('latest')),0)
+
+    def test_reader_serves_current_prices_from_table(self):
+        Publisher(self.status,self.database).writeData(goodData,1585000000)
+        self.database.con.execute("UPDATE {} SET {} = 1.0".format(settings.database_latest_table_name,settings.CMC_data_quote_price))
+        self.database.con.commit()
+        reader = Reader(self.status,self.database,self.config)
+        self.assertEqual(reader.processRequest(priceRequest),"BCH: $1.0 (-2.96%)")
+        request = dict(priceRequest)
+        request[settings.data_query_type] = settings.data_query_type_batch
+        request[settings.data_query_tags] = ['BCH','USDT']
+        self.assertIn("$1.0",reader.processRequest(request).split('\n')[1])
+        # Queries of a past time still read the history
+        request = dict(priceRequest)
+        request[settings.data_query_as_of] = 1585000000
+        self.assertEqual(reader.processRequest(request),"BCH: $368.82 (-2.96%)")
+
+    def test_reader_falls_back_to_history_without_table(self):
+        Publisher(self.status,self.database).writeData(goodData,1585000000)
+        self.database.con.execute("DROP TABLE {}".format(settings.database_latest_table_name))
+        reader = Reader(self.status,self.database,self.config)
+        self.assertEqual(reader.processRequest(priceRequest),"BCH: $368.82 (-2.96%)")
+
+if __name__ == '__main__':
+    unittest.main();
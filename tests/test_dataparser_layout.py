@@ -0,0 +1,130 @@
+import unittest
+import logging
+from cmclogger.dataparser.publisher import Publisher
+from cmclogger.dataparser.reader import Reader
+from cmclogger.dataparser.layout import QuotesTableLayout, SymbolTableLayout, makeLayout, migrateToQuotesLayout
+import cmclogger.settings as settings
+from tests.loggertestcase import LoggerTestCase
+from tests.test_dataparser_publisher import goodData
+logging.disable(logging.CRITICAL)
+
+priceRequest = {
+        settings.data_query_type     : settings.data_query_type_price,
+        settings.data_query_tag      : 'BCH',
+        settings.data_query_format   : settings.data_query_format_stdout,
+        settings.data_query_detail   : settings.data_query_detail_short,
+        }
+
+class Storage_layouts(LoggerTestCase):
+
+    def test_unknown_layout_name_uses_symbol_layout(self):
+        self.assertIsInstance(makeLayout('unknown',self.database),SymbolTableLayout)
+
+    def test_quotes_layout_writes_all_symbols_to_one_table(self):
+        publisher = Publisher(self.status,self.database,QuotesTableLayout(self.database))
+        publisher.writeData(goodData)
+        publisher.writeData(goodData)
+        self.assertEqual(sorted(self.database.get_table_names()),[settings.database_latest_table_name,settings.database_quotes_table_name])
+        self.assertIs(len(self.database.table_to_df(settings.database_quotes_table_name)),2)
+
+    def test_quotes_layout_lists_symbols(self):
+        layout = QuotesTableLayout(self.database)
+        Publisher(self.status,self.database,layout).writeData(goodData)
+        self.assertEqual(layout.getSymbols(),['BCH','USDT'])
+        self.assertIs(len(layout.symbolToDataFrame('BCH')),1)
+
+    def test_reader_returns_same_output_for_both_layouts(self):
+        symbolLayout = SymbolTableLayout(self.database)
+        quotesLayout = QuotesTableLayout(self.database)
+        Publisher(self.status,self.database,symbolLayout).writeData(goodData)
+        Publisher(self.status,self.database,quotesLayout).writeData(goodData)
+        symbolOutput = Reader(self.status,self.database,self.config,symbolLayout).processRequest(priceRequest)
+        quotesOutput = Reader(self.status,self.database,self.config,quotesLayout).processRequest(priceRequest)
+        self.assertEqual(symbolOutput,"BCH: $368.82 (-2.96%)")
+        self.assertEqual(symbolOutput,quotesOutput)
+
+    def test_quotes_layout_unknown_symbol_returns_none(self):
+        layout = QuotesTableLayout(self.database)
+        Publisher(self.status,self.database,layout).writeData(goodData)
+        self.assertIs(layout.getLastEntry('BTC'),None)
+
+    def test_reader_as_of_request_for_both_layouts(self):
+        request = dict(priceRequest)
+        request[settings.data_query_as_of] = 1585000100
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            publisher = Publisher(self.status,self.database,layout)
+            publisher.writeData(goodData,1585000000)
+            newer = [dict(entry) for entry in goodData]
+            newer[1][settings.CMC_data_quote] = {'AUD' : dict(goodData[1][settings.CMC_data_quote]['AUD'],price=400.0)}
+            publisher.writeData(newer,1585000200)
+            reader = Reader(self.status,self.database,self.config,layout)
+            self.assertEqual(reader.processRequest(request),"BCH: $368.82 (-2.96%)")
+            self.assertEqual(reader.processRequest(priceRequest),"BCH: $400.0 (-2.96%)")
+
+    def test_last_entries_of_several_symbols_for_both_layouts(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            publisher = Publisher(self.status,self.database,layout)
+            publisher.writeData(goodData,1585000000)
+            publisher.writeData(goodData,1585000200)
+            entries = layout.getLastEntries(['BCH','USDT','BTC'])
+            self.assertEqual(sorted(entries.keys()),['BCH','USDT'])
+            self.assertEqual(entries['BCH'],layout.getLastEntry('BCH'))
+            self.assertEqual(entries['USDT']['timestamp'],1585000200)
+            self.assertEqual(layout.getLastEntries(['BCH'],1585000100)['BCH']['timestamp'],1585000000)
+            self.assertEqual(layout.getLastEntries(['BCH'],1584000000),dict())
+
+    def test_range_query_for_both_layouts(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            publisher = Publisher(self.status,self.database,layout)
+            for timestamp in [1585000000,1585000100,1585003600,1585003700]:
+                publisher.writeData(goodData,timestamp)
+            frame = layout.queryRange(['BCH','USDT','BTC'],1585000100,1585003700,[settings.CMC_data_quote_price,'unknown'])
+            self.assertEqual(list(frame.columns),[settings.CMC_data_symbol,'timestamp',settings.CMC_data_quote_price])
+            self.assertEqual(list(frame[settings.CMC_data_symbol]),['BCH','BCH','USDT','USDT'])
+            self.assertEqual(list(frame['timestamp']),[1585000100,1585003600,1585000100,1585003600])
+            hourly = layout.queryRange(None,0,float('inf'),[settings.CMC_data_quote_price],3600)
+            self.assertEqual(list(hourly['timestamp']),[1584997200,1585000800] * 2)
+            self.assertEqual(len(layout.queryRange(['BTC'],0,float('inf'))),0)
+
+    def test_last_updated_times_for_both_layouts(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            Publisher(self.status,self.database,layout).writeData(goodData)
+            self.assertEqual(layout.getLastUpdated(),{825 : 1585164505, 1831 : 1585164487})
+
+    def test_symbol_tables_are_created_with_timestamp_index(self):
+        Publisher(self.status,self.database).writeData(goodData)
+        plan = self.database.con.execute("EXPLAIN QUERY PLAN SELECT * FROM BCH ORDER BY timestamp DESC LIMIT 1").fetchall()
+        self.assertIn('BCH_timestamp',str(plan))
+
+    def test_existing_symbol_tables_are_given_timestamp_index(self):
+        self.database.create_table('BTC',{'timestamp' : 'INTEGER', 'price' : 'REAL'})
+        layout = SymbolTableLayout(self.database)
+        self.assertIs(layout.createTimestampIndexes(),1)
+        self.assertIs(layout.createTimestampIndexes(),0)
+
+    def test_existing_symbol_tables_are_indexed_on_first_write(self):
+        self.database.create_table('BTC',{'timestamp' : 'INTEGER', 'price' : 'REAL'})
+        Publisher(self.status,self.database).writeData(goodData)
+        self.assertIs(SymbolTableLayout(self.database).createTimestampIndexes(),0)
+
+    def test_migration_copies_symbol_tables(self):
+        Publisher(self.status,self.database).writeData(goodData)
+        migrated = migrateToQuotesLayout(self.database)
+        self.assertIs(migrated,2)
+        self.assertIn('BCH',self.database.get_table_names())
+        self.assertEqual(QuotesTableLayout(self.database).getLastEntry('BCH')[settings.CMC_data_name],'Bitcoin Cash')
+
+    def test_migration_can_drop_symbol_tables(self):
+        Publisher(self.status,self.database).writeData(goodData)
+        migrateToQuotesLayout(self.database,True)
+        self.assertEqual(sorted(self.database.get_table_names()),[settings.database_latest_table_name,settings.database_quotes_table_name])
+
+    def test_migration_can_be_repeated(self):
+        Publisher(self.status,self.database).writeData(goodData)
+        migrateToQuotesLayout(self.database)
+        migrated = migrateToQuotesLayout(self.database)
+        self.assertIs(migrated,0)
+        self.assertIs(len(self.database.table_to_df(settings.database_quotes_table_name)),2)
+
+if __name__ == '__main__':
+    unittest.main();
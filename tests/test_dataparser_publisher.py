@@ -1,6 +1,8 @@
 import unittest
+from unittest import mock
 import logging
-from cmclogger.dataparser.publisher import Publisher
+from cmclogger.dataparser.publisher import Publisher, StagedData
+from cmclogger.dataparser.schema import RowExtractor
 import cmclogger.settings as settings
 from cmclogger.cmclogger import CMCLogger
 import os
@@ -325,7 +327,8 @@ class CMCAPI_configuration_writeing_output_data(unittest.TestCase):
         self.publisher.writeData(goodData)
         tables = self.database.get_table_names()
         columns = self.database.get_column_names('BCH')
-        self.assertIs(len(tables),2)
+        self.assertIs(len(tables),3)
+        self.assertIn(settings.database_latest_table_name,tables)
         self.assertIn('BCH',tables)
         self.assertIn('USDT',tables)
         self.assertIs(len(columns),18)
@@ -352,10 +355,89 @@ class CMCAPI_configuration_writeing_output_data(unittest.TestCase):
         df = self.database.table_to_df('USDT')
         self.assertIs(len(df), 0)
 
+    def test_bad_entry_does_not_prevent_rest_of_batch_being_written(self):
+        self.publisher.writeData(badData + goodData)
+        self.assertIs(len(self.database.table_to_df('USDT')), 1)
+        self.assertIs(len(self.database.table_to_df('BCH')), 1)
+
+    def test_entries_from_one_call_share_a_timestamp(self):
+        self.publisher.writeData(goodData)
+        usdt = self.database.get_last_time_entry('USDT')
+        bch = self.database.get_last_time_entry('BCH')
+        self.assertEqual(usdt['timestamp'],bch['timestamp'])
+
+    def test_batch_is_committed(self):
+        self.publisher.writeData(goodData)
+        self.assertIs(self.database.con.in_transaction,False)
+
+    def test_table_names_are_not_queried_for_every_entry(self):
+        self.publisher.writeData(goodData)
+        with mock.patch.object(self.database,'get_table_names',wraps=self.database.get_table_names) as tables_mock:
+            self.publisher.writeData(goodData)
+        tables_mock.assert_not_called()
+
+    def test_table_removed_after_catalogue_load_is_recreated(self):
+        self.publisher.writeData(goodData)
+        self.database.remove_table('BCH')
+        self.publisher.writeData(goodData)
+        self.assertIs(len(self.database.table_to_df('BCH')), 1)
+        self.assertIs(len(self.database.table_to_df('USDT')), 2)
+
+    def test_change_only_skips_entries_not_updated(self):
+        publisher = Publisher(self.status,self.database,changeOnly=True)
+        publisher.writeData(goodData)
+        publisher.writeData(goodData)
+        self.assertIs(len(self.database.table_to_df('USDT')), 1)
+        self.assertIs(self.status.get_value(settings.status_file_current_session_section_name,settings.status_file_option_suppressed_rows),2)
+
+    def test_change_only_writes_updated_entries(self):
+        publisher = Publisher(self.status,self.database,changeOnly=True)
+        publisher.writeData(goodData)
+        updated = [dict(entry) for entry in goodData]
+        updated[0][settings.CMC_data_last_updated] = "2020-03-25T19:33:25.000Z"
+        publisher.writeData(updated)
+        self.assertIs(len(self.database.table_to_df('USDT')), 2)
+        self.assertIs(len(self.database.table_to_df('BCH')), 1)
+
+    def test_change_only_is_seeded_from_database(self):
+        self.publisher.writeData(goodData)
+        Publisher(self.status,self.database,changeOnly=True).writeData(goodData)
+        self.assertIs(len(self.database.table_to_df('USDT')), 1)
+
+    def test_change_only_is_seeded_when_publisher_starts(self):
+        self.publisher.writeData(goodData)
+        publisher = Publisher(self.status,self.database,changeOnly=True)
+        self.database.con.execute("DELETE FROM {}".format(settings.database_latest_table_name))
+        self.database.con.commit()
+        publisher.writeData(goodData)
+        self.assertIs(len(self.database.table_to_df('USDT')), 1)
+
+    def test_change_only_remembers_only_written_entries(self):
+        publisher = Publisher(self.status,self.database,changeOnly=True)
+        reserved = [dict(goodData[0],symbol='LATEST')]
+        publisher.writeData(reserved)
+        publisher.writeData(reserved)
+        self.assertIs(self.status.get_value(settings.status_file_current_session_section_name,settings.status_file_option_suppressed_rows),0)
+
+    def test_staged_data_is_written_with_its_timestamp(self):
+        extractor = RowExtractor('AUD')
+        stage = StagedData(1585000000,[extractor.extract(entry,1585000000)[0] for entry in goodData])
+        self.publisher.writeData(stage,1)
+        self.assertEqual(self.database.get_last_time_entry('BCH')['timestamp'],1585000000)
+        self.assertIs(len(self.database.table_to_df('USDT')), 1)
+
+    def test_entries_are_stored_in_the_requested_currency(self):
+        entry = dict(goodData[0])
+        entry['quote'] = {'USD' : dict(goodData[0]['quote']['AUD'],price=1.0),'AUD' : goodData[0]['quote']['AUD']}
+        Publisher(self.status,self.database,currency='AUD').writeData([entry])
+        self.assertEqual(self.database.get_last_time_entry(entry['symbol'])['price'],goodData[0]['quote']['AUD']['price'])
+
     def tearDown(self):
         try:
             os.remove(os.path.join(self.workingDirectory,settings.status_file_directory,settings.status_file_name))
-            os.remove(os.path.join(self.workingDirectory,settings.data_file_directory,settings.database_file_name))
+            for suffix in ['-wal','-shm','']:
+                if os.path.exists(os.path.join(self.workingDirectory,settings.data_file_directory,settings.database_file_name + suffix)):
+                    os.remove(os.path.join(self.workingDirectory,settings.data_file_directory,settings.database_file_name + suffix))
             os.removedirs(os.path.join(self.workingDirectory,settings.status_file_directory))
         except:
             pass
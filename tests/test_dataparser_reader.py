@@ -203,6 +203,68 @@ class CMCAPI_configuration_setting_and_checking(unittest.TestCase):
         expectedOutput = "{} is an invalid output detail request.".format(request[settings.data_query_detail])
         self.assertEqual(output,expectedOutput)
 
+    def test_batch_price_request_short_version_stdout(self):
+        request = dict(requestFormat)
+        request[settings.data_query_type] = settings.data_query_type_batch
+        request[settings.data_query_tags] = ["BTC","BCH","BTC"]
+        request[settings.data_query_format] = settings.data_query_format_stdout
+        request[settings.data_query_detail] = settings.data_query_detail_short
+        lines = self.reader.processRequest(request).split('\n')
+        self.assertEqual(len(lines),3)
+        self.assertEqual(lines[0].split(),['Symbol','Price','24H'])
+        self.assertEqual(lines[1].split(),['BTC','$10857.98','-1.08%'])
+        self.assertEqual(len(set(len(line) for line in lines)),1)
+
+    def test_batch_price_request_long_version_json(self):
+        request = dict(requestFormat)
+        request[settings.data_query_type] = settings.data_query_type_batch
+        request[settings.data_query_tags] = ["BTC","ETH"]
+        request[settings.data_query_format] = settings.data_query_format_json
+        request[settings.data_query_detail] = settings.data_query_detail_long
+        output = json.loads(self.reader.processRequest(request))
+        single = dict(request)
+        single[settings.data_query_type] = settings.data_query_type_price
+        expected = []
+        for symbol in ["BTC","ETH"]:
+            single[settings.data_query_tag] = symbol
+            expected.append(json.loads(self.reader.processRequest(single)))
+        self.assertEqual(output,expected)
+
+    def test_batch_price_request_reports_unknown_symbols(self):
+        request = dict(requestFormat)
+        request[settings.data_query_type] = settings.data_query_type_batch
+        request[settings.data_query_tags] = ["invalid tag","BTC"]
+        request[settings.data_query_format] = settings.data_query_format_json
+        request[settings.data_query_detail] = settings.data_query_detail_short
+        output = json.loads(self.reader.processRequest(request))
+        self.assertEqual(output[0][settings.output_json_error],"invalid tag not a valid stored cryptocurreny symbol.")
+        self.assertEqual(output[1][settings.CMC_data_symbol],"BTC")
+        request[settings.data_query_format] = settings.data_query_format_stdout
+        self.assertEqual(self.reader.processRequest(request).split('\n')[-1],"invalid tag not a valid stored cryptocurreny symbol.")
+
+    def test_range_of_several_symbols_as_arrays(self):
+        arrays = self.reader.getRange(["BTC","ETH"],columns=[settings.CMC_data_quote_price],asArrays=True)
+        self.assertEqual(list(arrays.keys()),[settings.CMC_data_symbol,'timestamp',settings.CMC_data_quote_price])
+        self.assertEqual(arrays[settings.CMC_data_quote_price].dtype.kind,'f')
+        self.assertEqual(set(arrays[settings.CMC_data_symbol]),{"BTC","ETH"})
+        btc = arrays['timestamp'][arrays[settings.CMC_data_symbol] == "BTC"]
+        self.assertTrue((btc[1:] > btc[:-1]).all())
+
+    def test_range_request_json(self):
+        request = dict(requestFormat)
+        request[settings.data_query_type] = settings.data_query_type_range
+        request[settings.data_query_tags] = ["BTC"]
+        request[settings.data_query_interval] = 86400
+        request[settings.data_query_format] = settings.data_query_format_json
+        request[settings.data_query_detail] = settings.data_query_detail_short
+        output = json.loads(self.reader.processRequest(request))
+        self.assertEqual(list(output.keys()),[settings.CMC_data_symbol,'timestamp',settings.CMC_data_quote_price])
+        self.assertEqual(round(output[settings.CMC_data_quote_price][-1],2),10857.98)
+        request[settings.data_query_start] = 0
+        request[settings.data_query_end] = 1
+        request[settings.data_query_format] = settings.data_query_format_stdout
+        self.assertEqual(self.reader.processRequest(request),"No entries stored for BTC in the requested range.")
+
     def setUp(self):
         self.workingDirectory = 'tests/mockData'
         cmcLogger = CMCLogger(self.workingDirectory,logging.CRITICAL)
@@ -0,0 +1,115 @@
+import unittest
+import logging
+import sqlite3
+from cmclogger.dataparser.publisher import Publisher
+from cmclogger.dataparser.layout import QuotesTableLayout, SymbolTableLayout
+from cmclogger.dataparser.retention import Retention, compactSamples, mergeBucket
+import cmclogger.settings as settings
+from tests.loggertestcase import LoggerTestCase
+from tests.test_dataparser_publisher import goodData
+import os
+logging.disable(logging.CRITICAL)
+
+day = 86400
+now = 1585000000 - 1585000000 % day + 12 * 3600
+
+def pricedData(price):
+    data = [dict(entry) for entry in goodData]
+    data[1][settings.CMC_data_quote] = {'AUD' : dict(goodData[1][settings.CMC_data_quote]['AUD'],price=price)}
+    return data
+
+class Retention_engine(LoggerTestCase):
+
+    def setUp(self):
+        LoggerTestCase.setUp(self)
+        self.archiveFile = os.path.join(self.workingDirectory,settings.data_file_directory,settings.retention_archive_file_name)
+
+    def writeHour(self,layout,start,prices):
+        publisher = Publisher(self.status,self.database,layout)
+        for i,price in enumerate(prices):
+            publisher.writeData(pricedData(price),start + i * 600)
+
+    def bucketRows(self,table,symbol='BCH'):
+        return self.database.con.execute("SELECT open,high,low,close,samples FROM {} WHERE symbol = ? ORDER BY bucket".format(
+            table),(symbol,)).fetchall()
+
+    def test_old_rows_are_compacted_into_hourly_buckets(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            self.writeHour(layout,now - 3 * day,[10.0,12.0,9.0,11.0])
+            self.writeHour(layout,now - 3600,[20.0])
+            Retention(self.database,layout,1).run(10,now)
+            self.assertEqual(self.bucketRows(settings.database_hourly_table_name),[(10.0,12.0,9.0,11.0,4)])
+            self.assertEqual(layout.getSamplesBetween(0,now)[-1][2],now - 3600)
+            self.assertIs(len(layout.getSamplesBetween(0,now)),2)
+            self.database.con.execute("DROP TABLE {}".format(settings.database_hourly_table_name))
+            self.database.con.execute("DROP TABLE {}".format(settings.database_daily_table_name))
+
+    def test_hourly_buckets_are_compacted_into_daily_buckets(self):
+        layout = QuotesTableLayout(self.database)
+        self.writeHour(layout,now - 10 * day,[10.0,12.0])
+        self.writeHour(layout,now - 10 * day + 3600,[8.0,9.0])
+        Retention(self.database,layout,1,5).run(10,now)
+        self.assertEqual(self.bucketRows(settings.database_hourly_table_name),[])
+        self.assertEqual(self.bucketRows(settings.database_daily_table_name),[(10.0,12.0,8.0,9.0,4)])
+
+    def test_late_rows_are_merged_into_existing_bucket(self):
+        layout = QuotesTableLayout(self.database)
+        retention = Retention(self.database,layout,1)
+        self.writeHour(layout,now - 3 * day + 600,[10.0])
+        retention.run(10,now)
+        self.writeHour(layout,now - 3 * day,[5.0])
+        self.writeHour(layout,now - 3 * day + 1200,[15.0])
+        retention.run(10,now)
+        self.assertEqual(self.bucketRows(settings.database_hourly_table_name),[(5.0,15.0,5.0,15.0,3)])
+
+    def test_expired_daily_buckets_can_be_dropped(self):
+        layout = QuotesTableLayout(self.database)
+        self.writeHour(layout,now - 30 * day,[10.0])
+        Retention(self.database,layout,1,5,20,settings.retention_expired_action_drop).run(10,now)
+        self.assertEqual(self.bucketRows(settings.database_daily_table_name),[])
+        self.assertFalse(os.path.exists(self.archiveFile))
+
+    def test_expired_daily_buckets_can_be_archived(self):
+        layout = QuotesTableLayout(self.database)
+        self.writeHour(layout,now - 30 * day,[10.0])
+        Retention(self.database,layout,1,5,20,settings.retention_expired_action_archive,self.archiveFile).run(10,now)
+        self.assertEqual(self.bucketRows(settings.database_daily_table_name),[])
+        archive = sqlite3.connect(self.archiveFile)
+        rows = archive.execute("SELECT open,samples FROM {} WHERE symbol = 'BCH'".format(settings.database_daily_table_name))
+        self.assertEqual(rows.fetchall(),[(10.0,1)])
+        archive.close()
+
+    def test_run_stops_when_budget_is_spent(self):
+        layout = QuotesTableLayout(self.database)
+        self.writeHour(layout,now - 5 * day,[10.0])
+        self.writeHour(layout,now - 4 * day,[10.0])
+        retention = Retention(self.database,layout,1)
+        self.assertIs(retention.run(0,now),1)
+        self.assertIs(retention.run(0,now),1)
+        self.assertIs(retention.run(0,now),0)
+
+    def test_retention_disabled_keeps_every_row(self):
+        layout = QuotesTableLayout(self.database)
+        self.writeHour(layout,now - 5 * day,[10.0])
+        self.assertIs(Retention(self.database,layout,0).run(10,now),0)
+        self.assertIs(len(layout.getSamplesBetween(0,now)),2)
+
+    def test_bucket_tables_are_not_symbols(self):
+        layout = SymbolTableLayout(self.database)
+        self.writeHour(layout,now - 5 * day,[10.0])
+        Retention(self.database,layout,1).run(10,now)
+        self.assertEqual(sorted(layout.getSymbols()),['BCH','USDT'])
+
+    def test_compact_samples_ignores_missing_prices(self):
+        samples = [(1,'BTC',0,None,None,None),(1,'BTC',60,2.0,None,5.0),(1,'BTC',3600,3.0,7.0,6.0)]
+        self.assertEqual(compactSamples(samples,3600),
+                         [(1,'BTC',0,2.0,2.0,2.0,2.0,None,5.0,1,60,60),(1,'BTC',3600,3.0,3.0,3.0,3.0,7.0,6.0,1,3600,3600)])
+
+    def test_merge_bucket_keeps_open_and_close_by_time(self):
+        existing = (1,'BTC',0,10.0,12.0,9.0,11.0,4.0,5.0,2,600,1200)
+        late = (1,'BTC',0,8.0,8.0,7.0,7.5,None,6.0,2,60,900)
+        self.assertEqual(mergeBucket(existing,late),(1,'BTC',0,8.0,12.0,7.0,11.0,2.0,5.0,4,60,1200))
+        self.assertEqual(mergeBucket(late,existing),(1,'BTC',0,8.0,12.0,7.0,11.0,2.0,5.0,4,60,1200))
+
+if __name__ == '__main__':
+    unittest.main();
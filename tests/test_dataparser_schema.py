@@ -0,0 +1,54 @@
+import unittest
+import copy
+from cmclogger.dataparser.schema import RowExtractor, makeStoredColumns, extractErrorMissing, extractErrorInvalid
+from cmclogger.dataparser.layout import makeDataBaseTableColumns
+import cmclogger.settings as settings
+from tests.test_dataparser_publisher import goodData, badData
+
+class Row_extractor(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = RowExtractor('AUD')
+        self.entry = copy.deepcopy(goodData[1])
+
+    def test_good_entry_is_flattened(self):
+        row,error = self.extractor.extract(self.entry,1585000000)
+        self.assertIs(error,None)
+        self.assertEqual(sorted(row.keys()),sorted(makeDataBaseTableColumns().keys()))
+        self.assertEqual(row[settings.CMC_data_quote_price],self.entry['quote']['AUD']['price'])
+        self.assertEqual(row[settings.CMC_data_last_updated],1585164487)
+        self.assertEqual(row['timestamp'],1585000000)
+
+    def test_unknown_fields_are_not_kept(self):
+        self.entry['infinite_supply'] = False
+        original = copy.deepcopy(self.entry)
+        row,error = self.extractor.extract(self.entry,0)
+        self.assertEqual(sorted(row.keys()),sorted(makeDataBaseTableColumns().keys()))
+        self.assertEqual(self.entry,original)
+
+    def test_stored_columns_come_from_schema(self):
+        self.assertIs(len(makeStoredColumns()),17)
+        self.assertNotIn(settings.CMC_data_tags,dict(makeStoredColumns()))
+
+    def test_missing_field_is_reported(self):
+        self.assertEqual(self.extractor.extract(badData[0],0),(None,(settings.CMC_data_id,extractErrorMissing)))
+        del self.entry['quote']['AUD']['last_updated']
+        self.assertEqual(self.extractor.extract(self.entry,0)[1],('quote.AUD.last_updated',extractErrorMissing))
+
+    def test_other_currency_is_missing(self):
+        self.assertEqual(RowExtractor('USD').extract(self.entry,0)[1],('quote.USD',extractErrorMissing))
+
+    def test_any_currency_uses_only_quote(self):
+        row,error = RowExtractor().extract(self.entry,0)
+        self.assertEqual(row[settings.CMC_data_quote_price],self.entry['quote']['AUD']['price'])
+
+    def test_invalid_values_are_reported(self):
+        self.entry[settings.CMC_data_data_added] = None
+        self.assertEqual(self.extractor.extract(self.entry,0)[1],(settings.CMC_data_data_added,extractErrorInvalid))
+        self.entry = copy.deepcopy(goodData[1])
+        self.entry['quote'] = []
+        self.assertEqual(self.extractor.extract(self.entry,0)[1],('quote',extractErrorInvalid))
+        self.assertEqual(self.extractor.extract(None,0)[1],('entry',extractErrorInvalid))
+
+if __name__ == '__main__':
+    unittest.main();
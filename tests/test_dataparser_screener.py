@@ -0,0 +1,100 @@
+import unittest
+import logging
+import copy
+import json
+from cmclogger.dataparser.publisher import Publisher
+from cmclogger.dataparser.reader import Reader
+from cmclogger.dataparser.screener import Screener, parseFilter
+from cmclogger.dataparser.layout import QuotesTableLayout, SymbolTableLayout
+import cmclogger.settings as settings
+from tests.loggertestcase import LoggerTestCase
+from tests.test_dataparser_publisher import goodData
+logging.disable(logging.CRITICAL)
+
+def newerData():
+    data = copy.deepcopy(goodData)
+    for coin in data:
+        for quote in coin['quote'].values():
+            quote['price'] = quote['price'] * 2
+    return data
+
+screenRequest = {settings.data_query_type: settings.data_query_type_screen,
+                 settings.data_query_format: settings.data_query_format_stdout,
+                 settings.data_query_sort: settings.CMC_data_percent_change_24h}
+
+class Screener_queries(LoggerTestCase):
+
+    def test_parse_filter(self):
+        self.assertEqual(parseFilter('market_cap>1e9'),('market_cap','>',1e9))
+        self.assertEqual(parseFilter(' cmc_rank <= 100 '),('cmc_rank','<=',100.0))
+        self.assertEqual(parseFilter('symbol=BTC'),('symbol','=','BTC'))
+        self.assertIs(parseFilter('market_cap'),None)
+        self.assertIs(parseFilter('market_cap=>1'),None)
+
+    def test_sort_and_limit_for_both_layouts(self):
+        for layout in [SymbolTableLayout(self.database),QuotesTableLayout(self.database)]:
+            publisher = Publisher(self.status,self.database,layout)
+            publisher.writeData(goodData,1585000000)
+            publisher.writeData(newerData(),1585000300)
+            for source in [layout,None]:
+                screener = Screener(self.database,layout)
+                if source is not None:
+                    # The layout's cross section gives the same rows as the latest table
+                    self.database.con.execute("DROP TABLE IF EXISTS {}".format(settings.database_latest_table_name))
+                frame = screener.screen(settings.CMC_data_cmc_rank,descending=False)
+                self.assertEqual(list(frame[settings.CMC_data_symbol]),['USDT','BCH'])
+                self.assertEqual(list(frame['timestamp']),[1585000300,1585000300])
+                frame = screener.screen(settings.CMC_data_cmc_rank,limit=1)
+                self.assertEqual(list(frame[settings.CMC_data_symbol]),['BCH'])
+
+    def test_filters_and_rank_range(self):
+        Publisher(self.status,self.database).writeData(goodData,1585000000)
+        screener = Screener(self.database,SymbolTableLayout(self.database))
+        frame = screener.screen(settings.CMC_data_quote_market_cap,filters=[parseFilter('cmc_rank>=5'),parseFilter('cmc_rank<=10')])
+        self.assertEqual(list(frame[settings.CMC_data_symbol]),['BCH'])
+        frame = screener.screen(settings.CMC_data_quote_market_cap,filters=[parseFilter('symbol=USDT')])
+        self.assertEqual(list(frame[settings.CMC_data_symbol]),['USDT'])
+        self.assertIs(len(screener.screen(settings.CMC_data_quote_market_cap,filters=[parseFilter('market_cap<0')])),0)
+
+    def test_as_of_screens_a_past_time(self):
+        publisher = Publisher(self.status,self.database)
+        publisher.writeData(goodData,1585000000)
+        publisher.writeData(newerData(),1585000300)
+        screener = Screener(self.database,SymbolTableLayout(self.database))
+        current = screener.screen(settings.CMC_data_cmc_rank)
+        past = screener.screen(settings.CMC_data_cmc_rank,asOf=1585000100)
+        self.assertEqual(list(past['timestamp']),[1585000000,1585000000])
+        self.assertEqual(list(current[settings.CMC_data_quote_price]),list(past[settings.CMC_data_quote_price] * 2))
+        # Rows older than the lookback are not part of the screen
+        self.assertIs(len(screener.screen(settings.CMC_data_cmc_rank,asOf=1585000300 + settings.screen_lookback_seconds)),0)
+        self.assertIs(len(screener.screen(settings.CMC_data_cmc_rank,asOf=1584000000)),0)
+
+    def test_invalid_column_or_filter(self):
+        Publisher(self.status,self.database).writeData(goodData,1585000000)
+        screener = Screener(self.database,SymbolTableLayout(self.database))
+        self.assertIs(screener.screen('price; DROP TABLE BCH'),None)
+        self.assertIs(screener.screen(settings.CMC_data_cmc_rank,filters=[('nothing','>',1)]),None)
+        self.assertIs(screener.screen(settings.CMC_data_cmc_rank,filters=[('cmc_rank','LIKE',1)]),None)
+        self.assertIs(screener.screen(settings.CMC_data_cmc_rank,filters=[None]),None)
+
+    def test_reader_screen_request(self):
+        Publisher(self.status,self.database).writeData(goodData,1585000000)
+        reader = Reader(self.status,self.database,self.config)
+        request = dict(screenRequest)
+        request[settings.data_query_filters] = ['market_cap>1']
+        lines = reader.processRequest(request).split('\n')
+        self.assertEqual(lines[0].split(),['symbol','cmc_rank','price','market_cap',settings.CMC_data_percent_change_24h])
+        self.assertEqual([line.split()[0] for line in lines[1:]],['USDT','BCH'])
+        request[settings.data_query_ascending] = True
+        request[settings.data_query_limit] = 1
+        request[settings.data_query_format] = settings.data_query_format_json
+        rows = json.loads(reader.processRequest(request))
+        self.assertEqual([row[settings.CMC_data_symbol] for row in rows],['BCH'])
+        request[settings.data_query_filters] = ['market_cap<0']
+        request[settings.data_query_format] = settings.data_query_format_stdout
+        self.assertEqual(reader.processRequest(request),"No coins match the screen.")
+        request[settings.data_query_filters] = ['market_cap']
+        self.assertEqual(reader.processRequest(request),"Screen by 'percent_change_24h' with filters ['market_cap'] is not valid.")
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,136 @@
+import unittest
+import logging
+import threading
+import time
+import os
+from cmclogger.dataparser.writebehind import WriteBehindQueue
+from cmclogger.dataparser.publisher import Publisher, StagedData
+from tests.loggertestcase import LoggerTestCase
+from dbops.sqhelper import SQHelper
+import cmclogger.settings as settings
+from tests.test_dataparser_publisher import goodData, goodStatus
+
+logging.disable(logging.CRITICAL)
+
+class RecordingPublisher():
+
+    def __init__(self):
+        self.written = []
+        self.statuses = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def writeStatus(self,status):
+        self.release.wait()
+        self.statuses.append(status)
+
+    def writeData(self,data,timestamp=None):
+        self.written.append((data,timestamp))
+
+class Write_behind_queue(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = RecordingPublisher()
+        self.spillFile = os.path.join('tests','spill.jsonl')
+
+    def tearDown(self):
+        for fileName in [self.spillFile,self.spillFile + '.replay']:
+            if os.path.exists(fileName):
+                os.remove(fileName)
+
+    def __fillQueue(self,policy,size=1):
+        self.publisher.release.clear()
+        writeQueue = WriteBehindQueue(lambda: self.publisher,size,policy,0,self.spillFile)
+        writeQueue.submit({'call' : 0},['first'],1)
+        while writeQueue.pending() > 0:
+            pass
+        for i in range(1,size + 1):
+            writeQueue.submit({'call' : i},['queued'],1)
+        return writeQueue
+
+    def test_results_written_in_order_on_close(self):
+        writeQueue = WriteBehindQueue(lambda: self.publisher,10)
+        for i in range(5):
+            writeQueue.submit({'call' : i},[i],i)
+        self.assertIs(writeQueue.close(5),True)
+        self.assertEqual([status['call'] for status in self.publisher.statuses],[0,1,2,3,4])
+        self.assertEqual(self.publisher.written[4],([4],4))
+
+    def test_failed_call_writes_status_only(self):
+        writeQueue = WriteBehindQueue(lambda: self.publisher,10)
+        writeQueue.submit({'call' : 0})
+        writeQueue.close(5)
+        self.assertIs(len(self.publisher.statuses),1)
+        self.assertIs(len(self.publisher.written),0)
+
+    def test_block_policy_drops_after_timeout(self):
+        writeQueue = self.__fillQueue(settings.write_queue_policy_block)
+        self.assertIs(writeQueue.submit({'call' : 'late'},['late']),False)
+        self.assertIs(writeQueue.getDroppedCount(),1)
+        self.publisher.release.set()
+        writeQueue.close(5)
+
+    def test_drop_newest_policy(self):
+        writeQueue = self.__fillQueue(settings.write_queue_policy_drop_newest)
+        self.assertIs(writeQueue.submit({'call' : 'late'},['late']),False)
+        self.publisher.release.set()
+        writeQueue.close(5)
+        self.assertEqual([status['call'] for status in self.publisher.statuses],[0,1])
+
+    def test_drop_oldest_policy(self):
+        writeQueue = self.__fillQueue(settings.write_queue_policy_drop_oldest)
+        self.assertIs(writeQueue.submit({'call' : 'late'},['late']),True)
+        self.publisher.release.set()
+        writeQueue.close(5)
+        self.assertEqual([status['call'] for status in self.publisher.statuses],[0,'late'])
+        self.assertIs(writeQueue.getDroppedCount(),1)
+
+    def test_spill_policy_writes_spilled_results_in_order(self):
+        writeQueue = self.__fillQueue(settings.write_queue_policy_spill)
+        self.assertIs(writeQueue.submit({'call' : 2},['spilled'],1),True)
+        self.assertIs(writeQueue.submit({'call' : 3},['spilled'],1),True)
+        self.assertIs(writeQueue.getSpilledCount(),2)
+        self.publisher.release.set()
+        writeQueue.close(5)
+        self.assertEqual([status['call'] for status in self.publisher.statuses],[0,1,2,3])
+        self.assertIs(os.path.exists(self.spillFile),False)
+
+    def test_spilled_staged_data_is_replayed_as_staged_data(self):
+        writeQueue = self.__fillQueue(settings.write_queue_policy_spill)
+        writeQueue.submit({'call' : 2},StagedData(5,[{'symbol' : 'BCH'}]),5)
+        self.publisher.release.set()
+        writeQueue.close(5)
+        data,timestamp = self.publisher.written[-1]
+        self.assertIsInstance(data,StagedData)
+        self.assertEqual((data.timestamp,data),(5,[{'symbol' : 'BCH'}]))
+
+    def test_submit_after_close_is_dropped(self):
+        writeQueue = WriteBehindQueue(lambda: self.publisher,10)
+        writeQueue.close(5)
+        self.assertIs(writeQueue.submit({'call' : 0}),False)
+
+class Write_behind_queue_database(LoggerTestCase):
+
+    def setUp(self):
+        LoggerTestCase.setUp(self)
+        self.fileLocation = os.path.join(self.workingDirectory,settings.data_file_directory,settings.database_file_name)
+
+    def test_writer_thread_stores_data_with_fetch_timestamp(self):
+        writeQueue = WriteBehindQueue(lambda: Publisher(self.status,SQHelper(self.fileLocation)),10)
+        writeQueue.submit(goodStatus,goodData,1585000000)
+        writeQueue.close(5)
+        self.assertEqual(self.database.get_last_time_entry('BCH')['timestamp'],1585000000)
+
+    def test_writer_waits_for_status_lock(self):
+        section = settings.status_file_all_time_section_name
+        calls = self.status.get_value(section,settings.status_file_option_successful_calls)
+        writeQueue = WriteBehindQueue(lambda: Publisher(self.status,SQHelper(self.fileLocation)),10)
+        with self.status.lock:
+            writeQueue.submit(goodStatus)
+            time.sleep(0.2)
+            self.assertEqual(self.status.get_value(section,settings.status_file_option_successful_calls),calls)
+        writeQueue.close(5)
+        self.assertEqual(self.status.get_value(section,settings.status_file_option_successful_calls),calls + 1)
+
+if __name__ == '__main__':
+    unittest.main();